@@ -1,64 +1,215 @@
+import concurrent.futures
+import contextvars
 import datetime
+import time
+import uuid
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Any, Callable, Tuple, TypedDict, Optional
 
 from apify_client import ApifyClient
 # Assuming these imports remain correct
-from components.auth import get_api_key
-from .twitter_scraper import ScrapePostsAndComments as ScrapeTwitterPostsAndComments, ScrapePosts as ScrapeTwitterPosts
-from .instagram_scraper import ScrapeUserComentsAndPosts as ScrapeInstagramPostsAndComments, ScrapePosts as ScrapeInstagramPosts
-from .facebook_scraper import ScrapePostsAndComments as ScrapeFacebookPostsAndComments, ScrapePosts as ScrapeFacebookPosts
-from .linkedin_scraper import ScrapePostsAndComments as ScrapeLinkedinPostsAndComments, ScrapePosts as ScrapeLinkedinPosts
+from .twitter_scraper import ScrapePostsAndComments as ScrapeTwitterPostsAndComments, ScrapePosts as ScrapeTwitterPosts, ScrapePostsBatch as ScrapeTwitterPostsBatch
+from .instagram_scraper import ScrapeUserComentsAndPosts as ScrapeInstagramPostsAndComments, ScrapeUserPosts as ScrapeInstagramPosts, ScrapePostsBatch as ScrapeInstagramPostsBatch
+from .facebook_scraper import ScrapePostsAndComments as ScrapeFacebookPostsAndComments, ScrapePosts as ScrapeFacebookPosts, ScrapePostsBatch as ScrapeFacebookPostsBatch
+from .linkedin_scraper import ScrapePostsAndComments as ScrapeLinkedinPostsAndComments, ScrapePosts as ScrapeLinkedinPosts, ScrapePostsBatch as ScrapeLinkedinPostsBatch
+from .storage import StorageBackend, get_storage, DEFAULT_STORAGE_FORMAT
+from .post_index import ScrapedPostIndex, INDEX_FILENAME
+from .comment_store import PartitionedCommentStore
+from .catalog import DataCatalog, CATALOG_FILENAME
+from .batching import chunked
+from .engine import AsyncActorEngine, get_engine
+from .ingest import FieldProjection, concat_frames
+from .result_cache import ResultCache, CACHE_DIRNAME, cache_context
+from .job_journal import JobJournal, JobContext, JOURNAL_FILENAME, job_context
+from .scheduler import run_budget, run_tenant
+from .schema import SchemaMapper, ID_COLUMNS, to_canonical, concat_canonical, to_child_tables, concat_child_tables
 
 # --- Type Hinting for Configuration (Unchanged) ---
 class PlatformConfig(TypedDict):
     posts_scraper: Callable
     posts_and_comments_scraper: Callable
+    posts_batch_scraper: Callable  # One actor run for a list of handles, returns {handle: posts_df}
     path: Path
     handle_arg_name: str
     threads_arg_name: str
     post_id_col: str
     comment_id_col: str
+    post_time_col: str
+    comment_batch_size: int  # Posts per comments actor run; 1 = one run per post
+    posts_batch_size: int  # Handles per posts actor run in batched mode
+    post_fields: FieldProjection | None  # Item fields downloaded from posts datasets; None = full items
+    comment_fields: FieldProjection | None  # Item fields downloaded from comments datasets; None = full items
+    schema: SchemaMapper  # Where the actors keep the columns of the canonical schema
+
+# --- Dataset Field Projections ---
+# Only the fields the scrapers and the analytics views use are downloaded. They must keep every
+# column referenced by the registry below (ids, timestamps) and by the scrapers (urls, text,
+# comment counts, the parent columns used to split batched runs). Nested media arrays and
+# similar payloads are left on Apify. Pass `full_raw=True` to `scrape` to download full items.
+TWITTER_FIELDS = FieldProjection(fields=(
+    "type", "id", "tweetId", "url", "twitterUrl", "text", "createdAt", "lang",
+    "retweetCount", "replyCount", "likeCount", "quoteCount", "viewCount", "bookmarkCount",
+    "isReply", "isRetweet", "isQuote", "conversationId", "inReplyToId",
+    "author",  # Flattened to author.userName, which batched post runs are split by
+    "entities",  # Hashtags and mentions, returned as child tables
+))
+INSTAGRAM_POST_FIELDS = FieldProjection(fields=(
+    "inputUrl", "id", "type", "shortCode", "shortcode", "url", "caption", "hashtags", "mentions",
+    "commentsCount", "likesCount", "videoViewCount", "videoPlayCount", "timestamp",
+    "ownerUsername", "ownerFullName", "ownerId", "productType", "isPinned", "locationName",
+))
+INSTAGRAM_COMMENT_FIELDS = FieldProjection(fields=(
+    "id", "postUrl", "commentUrl", "inputUrl", "parentPostShortcode", "text", "timestamp",
+    "ownerUsername", "likesCount", "repliesCount",
+))
+FACEBOOK_POST_FIELDS = FieldProjection(fields=(
+    "facebookUrl", "inputUrl", "pageUrl", "pageName", "postId", "url", "topLevelUrl", "time", "timestamp",
+    "text", "link", "likes", "comments", "shares", "topReactionsCount", "viewsCount", "isVideo",
+))
+# The LinkedIn actors and the Facebook comments actor return differently shaped items across
+# versions, so only their known-heavy fields are dropped instead of listing the ones to keep.
+FACEBOOK_COMMENT_FIELDS = FieldProjection(omit=("profilePicture", "pageAdLibrary", "feedbackId"))
+LINKEDIN_POST_FIELDS = FieldProjection(omit=("images", "video", "document", "article", "resharedPost"))
+
+# --- Canonical Schema Mappers ---
+# Candidate source columns for each column of the canonical posts and comments schemas
+# (see schema.py), first present wins. "a.b" reads key "b" of the dicts in column "a".
+# The post_* columns of comments are attached by the scrapers (see enrichment.py).
+# `children` are the list columns of posts returned as child tables; media lists are only
+# downloaded with `full_raw=True`.
+POST_ATTRIBUTE_SOURCES = {
+    "post_text": ("post_text",),
+    "post_date": ("post_date",),
+    "post_likes": ("post_likes",),
+    "post_comments": ("post_comments",),
+    "post_shares": ("post_shares",),
+}
+FACEBOOK_SCHEMA = SchemaMapper(
+    posts={
+        "post_id": ("postId", "url"), "post_url": ("url", "topLevelUrl"), "text": ("text",),
+        "created_at": ("time", "timestamp"), "author": ("pageName", "user.name"),
+        "likes": ("likes",), "comments": ("comments",), "shares": ("shares",), "views": ("viewsCount",),
+    },
+    comments={
+        "comment_id": ("id", "commentId", "commentUrl"), "post_url": ("post_url", "facebookUrl"), "text": ("text",),
+        "created_at": ("date",), "author": ("profileName",), "likes": ("likesCount",), "replies": ("commentsCount",),
+        **POST_ATTRIBUTE_SOURCES,
+    },
+    children={"media": ("media",)},
+)
+INSTAGRAM_SCHEMA = SchemaMapper(
+    posts={
+        "post_id": ("shortCode", "shortcode", "id"), "post_url": ("url",), "text": ("caption",),
+        "created_at": ("timestamp",), "author": ("ownerUsername",),
+        "likes": ("likesCount",), "comments": ("commentsCount",), "views": ("videoViewCount", "videoPlayCount"),
+    },
+    comments={
+        "comment_id": ("id",), "post_url": ("post_url", "postUrl"), "text": ("text",),
+        "created_at": ("timestamp",), "author": ("ownerUsername",), "likes": ("likesCount",), "replies": ("repliesCount",),
+        **POST_ATTRIBUTE_SOURCES,
+    },
+    children={"media": ("images",), "hashtags": ("hashtags",), "mentions": ("mentions",)},
+)
+TWITTER_SCHEMA = SchemaMapper(
+    posts={
+        "post_id": ("tweetId", "id"), "post_url": ("url", "twitterUrl"), "text": ("text",),
+        "created_at": ("parsed_date", "createdAt"), "author": ("author.userName",),
+        "likes": ("likeCount",), "comments": ("replyCount",), "shares": ("retweetCount",), "views": ("viewCount",),
+    },
+    comments={
+        "comment_id": ("id", "tweetId"), "post_url": ("post_url",), "text": ("text",),
+        "created_at": ("createdAt",), "author": ("author.userName",), "likes": ("likeCount",), "replies": ("replyCount",),
+        **POST_ATTRIBUTE_SOURCES,
+        "post_text": ("post_text", "tweet_text"), # Replies stored before post_text only have tweet_text
+    },
+    children={
+        "media": ("extendedEntities.media", "entities.media"),
+        "hashtags": ("entities.hashtags",),
+        "mentions": ("entities.user_mentions",),
+    },
+)
+LINKEDIN_SCHEMA = SchemaMapper(
+    posts={
+        "post_id": ("url",), "post_url": ("url",), "text": ("text",),
+        "created_at": ("parsed_date", "timestamp"), "author": ("authorName", "author.name"),
+        "likes": ("numLikes",), "comments": ("numComments",), "shares": ("numShares",),
+    },
+    comments={
+        "comment_id": ("comment_id", "id"), "post_url": ("post_url", "post_input"), "text": ("text",),
+        "created_at": ("posted_at.timestamp", "timestamp"), "author": ("author.name",),
+        **POST_ATTRIBUTE_SOURCES,
+    },
+    children={"media": ("images",)},
+)
 
 # --- Central Configuration Registry (Unchanged) ---
 DEFAULT_PATH = Path("scraped_data")
+DEFAULT_PARALLEL_HANDLES = 4  # Handles of one platform scraped at the same time
 PLATFORM_REGISTRY: Dict[str, PlatformConfig] = {
     "Facebook": {
         "posts_scraper": ScrapeFacebookPosts,
         "posts_and_comments_scraper": ScrapeFacebookPostsAndComments,
+        "posts_batch_scraper": ScrapeFacebookPostsBatch,
         "path": DEFAULT_PATH / "facebook",
         "handle_arg_name": "facebook_handle",
         "threads_arg_name": "max_threads",
         "post_id_col": "url",
         "comment_id_col": "id",
+        "post_time_col": "time",
+        "comment_batch_size": 1,  # The Facebook comments actor takes a single post URL per run
+        "posts_batch_size": 20,
+        "post_fields": FACEBOOK_POST_FIELDS,
+        "comment_fields": FACEBOOK_COMMENT_FIELDS,
+        "schema": FACEBOOK_SCHEMA,
     },
     "Instagram": {
         "posts_scraper": ScrapeInstagramPosts,
         "posts_and_comments_scraper": ScrapeInstagramPostsAndComments,
+        "posts_batch_scraper": ScrapeInstagramPostsBatch,
         "path": DEFAULT_PATH / "instagram",
         "handle_arg_name": "username",
         "threads_arg_name": "max_threads",
         "post_id_col": "shortcode",
         "comment_id_col": "id",
+        "post_time_col": "timestamp",
+        "comment_batch_size": 10,
+        "posts_batch_size": 20,
+        "post_fields": INSTAGRAM_POST_FIELDS,
+        "comment_fields": INSTAGRAM_COMMENT_FIELDS,
+        "schema": INSTAGRAM_SCHEMA,
     },
     "Twitter": {
         "posts_scraper": ScrapeTwitterPosts,
         "posts_and_comments_scraper": ScrapeTwitterPostsAndComments,
+        "posts_batch_scraper": ScrapeTwitterPostsBatch,
         "path": DEFAULT_PATH / "twitter",
         "handle_arg_name": "username",
         "threads_arg_name": "max_threads",
         "post_id_col": "tweetId",
         "comment_id_col": "id",
+        "post_time_col": "parsed_date",
+        "comment_batch_size": 10,
+        "posts_batch_size": 50,
+        "post_fields": TWITTER_FIELDS,
+        "comment_fields": TWITTER_FIELDS,
+        "schema": TWITTER_SCHEMA,
     },
     "LinkedIn": {
         "posts_scraper": ScrapeLinkedinPosts,
         "posts_and_comments_scraper": ScrapeLinkedinPostsAndComments,
+        "posts_batch_scraper": ScrapeLinkedinPostsBatch,
         "path": DEFAULT_PATH / "linkedin",
         "handle_arg_name": "username",
         "threads_arg_name": "max_threads",
         "post_id_col": "url",
         "comment_id_col": "comment_id",
+        "post_time_col": "parsed_date",
+        "comment_batch_size": 10,
+        "posts_batch_size": 20,
+        "post_fields": LINKEDIN_POST_FIELDS,
+        "comment_fields": None,  # Downloaded in full, see the projections above
+        "schema": LINKEDIN_SCHEMA,
     },
 }
 
@@ -68,16 +219,36 @@ class PlatformScraper:
     and capable of scraping one or all platforms on demand.
     """
 
-    def __init__(self, api_key: str, **default_thread_counts: int):
+    def __init__(self, api_key: str, storage_format: str = DEFAULT_STORAGE_FORMAT, use_result_cache: bool = False, api_url: Optional[str] = None, parallel_handles: int = DEFAULT_PARALLEL_HANDLES, session_id: Optional[str] = None, **default_thread_counts: int):
         """
         Initializes the scraper with the Apify client and default thread counts.
 
         Args:
             api_key: Your Apify API key.
+            storage_format: On-disk format for scraped files, "parquet" (default) or "excel".
+            use_result_cache: Re-use the results of identical actor calls made within the
+                              cache TTL (stored in scraped_data/cache) instead of paying for new runs.
+                              Off by default, since cached results can be hours old.
+            api_url: Apify API address, e.g. a local stand-in for benchmarks (defaults to the public API).
+            parallel_handles: Default number of handles of a platform scraped at the same time.
+            session_id: Identifies this scraper's actor runs in the engine's run scheduler, which
+                        shares the account's run budget fairly between sessions (random by default).
             **default_thread_counts: Set default threads, e.g.,
                                      facebook_max_threads=10, twitter_max_threads=15
         """
-        self.client = ApifyClient(api_key)
+        self.client = ApifyClient(api_key, api_url=api_url)
+        self.storage: StorageBackend = get_storage(storage_format)
+        # Shared by all platforms: records which posts already have their comments fetched
+        self.post_index = ScrapedPostIndex(DEFAULT_PATH / INDEX_FILENAME)
+        # Records every file written, so history loaders open only the files they need
+        self.catalog = DataCatalog(DEFAULT_PATH / CATALOG_FILENAME)
+        # One event loop runs the actor runs of every platform, handle and session on this account
+        self.engine: AsyncActorEngine = get_engine(self.client)
+        self.session_id = session_id or uuid.uuid4().hex[:8]
+        # Used by this scraper's actor calls and dataset reads only (see cache_context in scrape)
+        self.result_cache: ResultCache | None = ResultCache(DEFAULT_PATH / CACHE_DIRNAME) if use_result_cache else None
+        # Records finished handles and started actor runs, so interrupted scrapes can resume
+        self.journal = JobJournal(DEFAULT_PATH / JOURNAL_FILENAME)
         print("api key set:", api_key)
         
         # Store default thread counts in a structured way
@@ -87,8 +258,12 @@ class PlatformScraper:
             "Twitter": default_thread_counts.get("twitter_max_threads", 15),
             "LinkedIn": default_thread_counts.get("linkedin_max_threads", 15),
         }
+        self.parallel_handles = max(1, int(parallel_handles))
         print("--- Scraper Initialized ---")
         print(f"Default Thread Counts: {self.thread_counts}")
+        print(f"Parallel Handles: {self.parallel_handles}")
+        print(f"Scheduler Session: {self.session_id}")
+        print(f"Storage Format: {self.storage.name}")
 
     def _setup_directories(self, platform_name: str):
         """Creates necessary directories for a single, specified platform."""
@@ -105,12 +280,143 @@ class PlatformScraper:
             return df
         
         initial_count = len(df)
-        df.drop_duplicates(subset=[id_col], inplace=True, ignore_index=True)
+        # Rows without an id are kept, they cannot be told apart
+        duplicated = df.duplicated(subset=[id_col]) & df[id_col].notna()
+        if duplicated.any():
+            df = df[~duplicated.to_numpy()].reset_index(drop=True)
         removed_count = initial_count - len(df)
         if removed_count > 0:
             print(f"Removed {removed_count} duplicate {item_type} for {platform} based on '{id_col}'.")
         return df
 
+    def _incremental_start(self, platform: str, handle: str, start: datetime.datetime, end: datetime.datetime):
+        """
+        Narrows `start` to the handle's watermark (newest post already ingested).
+        Returns None if the whole start-end window has already been ingested.
+        """
+        watermark = self.catalog.get_watermark(platform.lower(), handle)
+        if watermark is None:
+            return start
+
+        # Compare in the caller's type: the UI passes dates, scheduled jobs pass datetimes
+        if isinstance(start, datetime.datetime):
+            watermark_value = watermark.to_pydatetime() if start.tzinfo else watermark.tz_convert(None).to_pydatetime()
+            if watermark_value >= end:
+                return None
+        else:
+            # Dates cover the whole day, so the watermark's day is fetched again
+            watermark_value = watermark.date()
+            if watermark_value > end:
+                return None
+        return max(start, watermark_value)
+
+    def _scrape_posts_batched(self, config: PlatformConfig, handle_starts: Dict[str, Any], end, max_posts: int, post_fields: Optional[FieldProjection]) -> Dict[str, pd.DataFrame]:
+        """
+        Fetches posts for groups of handles in shared actor runs. Only handles with the same
+        start date are grouped. Handles whose run failed are left out and scraped one by one.
+        """
+        handles_by_start: Dict[Any, List[str]] = {}
+        for handle, handle_start in handle_starts.items():
+            handles_by_start.setdefault(handle_start, []).append(handle)
+
+        prefetched_posts = {}
+        for handle_start, group in handles_by_start.items():
+            for batch in chunked(group, config['posts_batch_size']):
+                if len(batch) < 2:
+                    continue # A single handle gains nothing from batching
+                posts_by_handle = config['posts_batch_scraper'](
+                    self.client, batch, handle_start, end, config['path'],
+                    max_posts=max_posts, storage=self.storage, catalog=self.catalog, post_fields=post_fields,
+                )
+                if posts_by_handle is None:
+                    print(f"Batched posts run for {len(batch)} handles failed. Falling back to one run per handle.")
+                    continue
+                prefetched_posts.update(posts_by_handle)
+        return prefetched_posts
+
+    def _scrape_handle(
+        self,
+        platform: str,
+        config: PlatformConfig,
+        handle: str,
+        handle_start,
+        end,
+        max_posts: int,
+        max_comments: int,
+        scrape_comments: bool,
+        thread_count: int,
+        post_fields: Optional[FieldProjection],
+        comment_fields: Optional[FieldProjection],
+        prefetched_posts: Optional[pd.DataFrame],
+        pipeline: bool = False,
+    ) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Scrapes one handle. Returns (posts_df, comments_df), or None if the handle failed."""
+        print(f"\n--- Processing Handle: {handle} ---")
+
+        scraper_func = config['posts_and_comments_scraper'] if scrape_comments else config['posts_scraper']
+        
+        scraper_args = {
+            "client": self.client,
+            config['handle_arg_name']: handle,
+            "start_time": handle_start, "end_time": end, "max_posts": max_posts, "path": config['path'],
+            "storage": self.storage,
+            "catalog": self.catalog,
+            "post_fields": post_fields,
+        }
+
+        if scrape_comments:
+            scraper_args["max_comments"] = max_comments
+            scraper_args[config['threads_arg_name']] = thread_count
+            scraper_args["post_index"] = self.post_index
+            scraper_args["comment_fields"] = comment_fields
+            if config['comment_batch_size'] > 1:
+                scraper_args["comment_batch_size"] = config['comment_batch_size']
+            print(f"Using {thread_count} concurrent tasks for comments.")
+            if prefetched_posts is not None:
+                scraper_args["posts_df"] = prefetched_posts
+            elif pipeline:
+                scraper_args["pipeline"] = True
+
+        # --- Execute Scraper ---
+        try:
+            if not scrape_comments and prefetched_posts is not None:
+                scraped_data = prefetched_posts # Already fetched and saved by the batched run
+            else:
+                # The handle's actor runs take turns with other handles and sessions in the run scheduler
+                with run_tenant(self.session_id, f"{platform}/{handle}"):
+                    scraped_data = scraper_func(**scraper_args)
+            
+            posts_df, comments_df = (None, None)
+            if scrape_comments:
+                if isinstance(scraped_data, tuple) and len(scraped_data) == 2:
+                    posts_df, comments_df = scraped_data
+                else:
+                    print(f"Error: Scraper for {platform} (with comments) did not return a valid result tuple.")
+                    return None
+            else:
+                posts_df = scraped_data
+
+            if posts_df is None:
+                print(f"Critical error during scrape for {handle}. Skipping this handle.")
+                return None
+
+            if not posts_df.empty:
+                print(f"Received {len(posts_df)} new posts from {handle}.")
+                if config['post_time_col'] in posts_df.columns:
+                    self.catalog.advance_watermark(platform.lower(), handle, posts_df[config['post_time_col']])
+
+            if comments_df is None:
+                comments_df = pd.DataFrame()
+            if not comments_df.empty:
+                print(f"Received {len(comments_df)} comments from {handle}.")
+            return posts_df, comments_df
+
+        except Exception as e:
+            import traceback
+            print(f"An error occurred while scraping handle '{handle}' on '{platform}': {e}")
+            traceback.print_exc()
+            return None
+
     def scrape(
         self,
         platform: str,
@@ -120,7 +426,14 @@ class PlatformScraper:
         max_posts: int,
         max_comments: int,
         scrape_comments: bool,
-        max_threads: Optional[int] = None
+        max_threads: Optional[int] = None,
+        incremental: bool = False,
+        batch_posts: bool = False,
+        full_raw: bool = False,
+        resume: bool = True,
+        max_parallel_handles: Optional[int] = None,
+        pipeline: bool = False,
+        canonical: bool = False
     ) -> Dict[str, pd.DataFrame]:
         """
         Scrapes data for a single specified platform.
@@ -133,10 +446,34 @@ class PlatformScraper:
             max_posts: Max posts to scrape per handle.
             max_comments: Max comments to scrape per post.
             scrape_comments: Whether to scrape comments.
-            max_threads: Optionally override the default thread count for this run.
+            max_threads: Optionally override the default number of comment runs each handle has in
+                         flight at once (from starting a run until its dataset has been read).
+            incremental: Only ask the actors for posts newer than each handle's watermark
+                         (the newest post ingested by earlier runs).
+            batch_posts: Fetch posts for groups of handles (up to the platform's
+                         `posts_batch_size`) in one actor run each, instead of one run per handle.
+            full_raw: Download and store full actor items instead of the platform's
+                      `post_fields` / `comment_fields` projection.
+            resume: Journal the scrape as a job. If an identical scrape was interrupted, finished
+                    handles are read back from the files they wrote, its finished actor runs are
+                    re-used and its still-running runs are re-attached to. Jobs older than the
+                    journal's maximum resume age (24h by default) start over.
+            max_parallel_handles: Optionally override the default number of handles scraped at the
+                                  same time. Each handle still runs its own comment runs concurrently.
+            pipeline: Start each handle's comment runs while its posts dataset is still being read,
+                      instead of after all of its posts are downloaded and saved. Has no effect
+                      with `batch_posts`, where posts are fetched before any handle starts.
+            canonical: Return posts and comments in the canonical schema (schema.POST_SCHEMA /
+                       COMMENT_SCHEMA, the same columns and dtypes for every platform) instead
+                       of the actors' own columns. Off by default, since the Streamlit scraper
+                       and analytics pages read the actors' columns. Stored files always keep them.
 
         Returns:
-            A dictionary containing 'posts' and 'comments' DataFrames for the platform.
+            A dictionary containing 'posts' and 'comments' DataFrames for the platform. 'comments'
+            only holds the comments scraped by this call; earlier ones stay in each handle's
+            comment store (see `load_comments`). With `canonical`, it
+            also holds one child table per list field of the platform's posts (e.g. 'media',
+            'mentions'), one row per element, keyed by post_id.
         """
         config = PLATFORM_REGISTRY.get(platform)
         if not config:
@@ -152,68 +489,132 @@ class PlatformScraper:
         print(f"\n---== Processing Platform: {platform.upper()} ==---")
         print(f"Handles: {handles}")
 
-        cumulative_posts_df = pd.DataFrame()
-        cumulative_comments_df = pd.DataFrame()
+        # Per-handle results, merged once in handle order after every handle is done
+        posts_by_handle: Dict[str, pd.DataFrame] = {}
+        comments_by_handle: Dict[str, pd.DataFrame] = {}
 
-        for handle in handles:
-            print(f"\n--- Processing Handle: {handle} ---")
-            
-            scraper_func = config['posts_and_comments_scraper'] if scrape_comments else config['posts_scraper']
-            
-            scraper_args = {
-                "client": self.client,
-                config['handle_arg_name']: handle,
-                "start_time": start, "end_time": end, "max_posts": max_posts, "path": config['path'],
-            }
+        # A journaled job resumes where an interrupted identical scrape stopped
+        job = None
+        completed_handles = {}
+        if resume:
+            job_id, resumed = self.journal.start_job({
+                "platform": platform, "handles": handles, "start": start, "end": end,
+                "max_posts": max_posts, "max_comments": max_comments, "scrape_comments": scrape_comments,
+                "incremental": incremental, "batch_posts": batch_posts, "full_raw": full_raw,
+            })
+            job = JobContext(self.journal, job_id)
+            completed_handles = self.journal.completed_handles(job_id)
+            if resumed:
+                print(f"Resuming job {job_id}: {len(completed_handles)} of {len(handles)} handles already done.")
 
-            if scrape_comments:
-                # Use override `max_threads` if provided, otherwise use class default
-                thread_count = max_threads if max_threads is not None else self.thread_counts.get(platform, 10)
-                scraper_args["max_comments"] = max_comments
-                scraper_args[config['threads_arg_name']] = thread_count
-                print(f"Using {thread_count} concurrent tasks for comments.")
-
-            # --- Execute Scraper ---
-            try:
-                scraped_data = scraper_func(**scraper_args)
-                
-                posts_df, comments_df = (None, None)
-                if scrape_comments:
-                    if isinstance(scraped_data, tuple) and len(scraped_data) == 2:
-                        posts_df, comments_df = scraped_data
-                    else:
-                        print(f"Error: Scraper for {platform} (with comments) did not return a valid result tuple.")
-                        continue
-                else:
-                    posts_df = scraped_data
+        for handle in handles:
+            if handle in completed_handles:
+                posts_df, comments_df = self.journal.load_handle(completed_handles[handle], self.catalog, platform.lower(), config['post_id_col'], config['comment_id_col'])
+                print(f"Loaded {len(posts_df)} posts and {len(comments_df)} comments for {handle} written earlier in this job.")
+                posts_by_handle[handle], comments_by_handle[handle] = posts_df, comments_df
 
-                if posts_df is None:
-                    print(f"Critical error during scrape for {handle}. Skipping this handle.")
+        # Resolve each handle's start date up front, so batched runs can group handles that share one
+        handle_starts = {}
+        for handle in handles:
+            if handle in completed_handles:
+                continue
+            handle_start = start
+            if incremental:
+                handle_start = self._incremental_start(platform, handle, start, end)
+                if handle_start is None:
+                    print(f"All posts up to {end} were already ingested for {handle}. Skipping.")
                     continue
+                if handle_start != start:
+                    print(f"Incremental mode: only fetching posts newer than {handle_start} for {handle}.")
+            handle_starts[handle] = handle_start
 
-                if not posts_df.empty:
-                    print(f"Received {len(posts_df)} new posts from {handle}.")
-                    cumulative_posts_df = pd.concat([cumulative_posts_df, posts_df], ignore_index=True)
+        post_fields = None if full_raw else config['post_fields']
+        comment_fields = None if full_raw else config['comment_fields']
+        # Use override `max_threads` if provided, otherwise use class default
+        thread_count = max_threads if max_threads is not None else self.thread_counts.get(platform, 10)
+        parallel_handles = max(1, max_parallel_handles if max_parallel_handles is not None else self.parallel_handles)
 
-                if comments_df is not None and not comments_df.empty:
-                    print(f"Received {len(comments_df)} comments from {handle}.")
-                    cumulative_comments_df = pd.concat([cumulative_comments_df, comments_df], ignore_index=True)
+        failed_handles = []
+        with job_context(job), cache_context(self.result_cache):
+            prefetched_posts = {}
+            if batch_posts:
+                with run_tenant(self.session_id, f"{platform}/batch"):
+                    prefetched_posts = self._scrape_posts_batched(config, handle_starts, end, max_posts, post_fields)
 
-            except Exception as e:
-                import traceback
-                print(f"An error occurred while scraping handle '{handle}' on '{platform}': {e}")
-                traceback.print_exc()
-                continue
+            if handle_starts:
+                print(f"Scraping up to {min(parallel_handles, len(handle_starts))} handles at a time.")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=parallel_handles, thread_name_prefix=f"scrape-{platform.lower()}") as executor:
+                # Each handle runs in a copy of this context, so its actor calls belong to the job and use this scraper's cache
+                future_to_handle = {
+                    executor.submit(
+                        contextvars.copy_context().run, self._scrape_handle,
+                        platform, config, handle, handle_start, end, max_posts, max_comments, scrape_comments,
+                        thread_count, post_fields, comment_fields, prefetched_posts.get(handle), pipeline,
+                    ): handle
+                    for handle, handle_start in handle_starts.items()
+                }
+                for future in concurrent.futures.as_completed(future_to_handle):
+                    handle = future_to_handle[future]
+                    result = future.result() # _scrape_handle reports its own errors and returns None
+                    if result is None:
+                        failed_handles.append(handle)
+                        continue
+                    posts_df, comments_df = result
+                    if job is not None:
+                        self.journal.complete_handle(job.job_id, handle, posts_df, comments_df, config['post_id_col'], config['comment_id_col'])
+                    posts_by_handle[handle], comments_by_handle[handle] = posts_df, comments_df
+
+        if job is not None:
+            if failed_handles:
+                print(f"Job {job.job_id} left open: {len(failed_handles)} handle(s) failed and will be retried when this scrape is run again.")
+            else:
+                self.journal.finish_job(job.job_id)
         
+        # One concat per platform instead of one per handle on a growing frame
+        handle_order = [h for h in dict.fromkeys(handles) if h in posts_by_handle]
+        if canonical:
+            # Each handle's frames are mapped on their own, the handle is not a column of every actor's items
+            cumulative_posts_df = concat_canonical([to_canonical(posts_by_handle[h], config['schema'], "posts", platform, h) for h in handle_order], "posts")
+            cumulative_comments_df = concat_canonical([to_canonical(comments_by_handle[h], config['schema'], "comments", platform, h) for h in handle_order], "comments")
+            post_id_col, comment_id_col = ID_COLUMNS["posts"], ID_COLUMNS["comments"]
+            children_by_handle = [to_child_tables(posts_by_handle[h], config['schema'], platform, h) for h in handle_order]
+            child_tables = {name: concat_child_tables([tables[name] for tables in children_by_handle]) for name in config['schema'].children}
+        else:
+            cumulative_posts_df = concat_frames([posts_by_handle[h] for h in handle_order])
+            cumulative_comments_df = concat_frames([comments_by_handle[h] for h in handle_order])
+            post_id_col, comment_id_col = config['post_id_col'], config['comment_id_col']
+            child_tables = {}
+
         # --- Final Deduplication and Summary for the Platform ---
-        final_posts = self._deduplicate_df(cumulative_posts_df, config['post_id_col'], 'posts', platform)
-        final_comments = self._deduplicate_df(cumulative_comments_df, config['comment_id_col'], 'comments', platform)
+        final_posts = self._deduplicate_df(cumulative_posts_df, post_id_col, 'posts', platform)
+        final_comments = self._deduplicate_df(cumulative_comments_df, comment_id_col, 'comments', platform)
         
         print(f"\n--- {platform.upper()} Scrape Complete ---")
         print(f"Total unique posts collected: {len(final_posts)}")
         print(f"Total unique comments collected: {len(final_comments)}")
+        print(f"Concurrent actor run limit: {self.engine.concurrency.limit} (error rate {self.engine.concurrency.error_rate():.0%})")
+
+        return {"posts": final_posts, "comments": final_comments, **child_tables}
+
+    def load_comments(self, platform: str, handles: List[str]) -> pd.DataFrame:
+        """
+        Returns every comment stored for the handles, from all partitions of their comment
+        stores. Unlike `scrape`, which only returns the comments a call fetched, this includes
+        comments of posts that were skipped because they had been scraped before.
+        """
+        config = PLATFORM_REGISTRY.get(platform)
+        if not config:
+            print(f"Error: Platform '{platform}' is not supported.")
+            return pd.DataFrame()
 
-        return {"posts": final_posts, "comments": final_comments}
+        frames = []
+        for handle in dict.fromkeys(handles):
+            comment_store = PartitionedCommentStore(config['path'], handle, platform.lower(), self.storage, self.catalog)
+            try:
+                frames.append(comment_store.read(id_col=config['comment_id_col']))
+            except Exception as e:
+                print(f"Warning: Could not load stored comments for {handle} from {comment_store.root}: {e}")
+        return self._deduplicate_df(concat_frames(frames), config['comment_id_col'], 'comments', platform)
 
     def scrape_all(
         self,
@@ -222,13 +623,27 @@ class PlatformScraper:
         end: datetime.datetime,
         max_posts: int,
         max_comments: int,
-        scrape_comments: bool
+        scrape_comments: bool,
+        incremental: bool = False,
+        batch_posts: bool = False,
+        full_raw: bool = False,
+        resume: bool = True,
+        max_parallel_handles: Optional[int] = None,
+        max_parallel_platforms: Optional[int] = None,
+        max_concurrent_runs: Optional[int] = None,
+        pipeline: bool = False,
+        canonical: bool = False
     ) -> Dict[str, Dict[str, pd.DataFrame]]:
         """
         A convenience method to scrape all platforms defined in the user_handles dictionary.
+        The platforms are scraped at the same time; they use different actors with their own quotas.
 
         Args:
             user_handles: A dictionary mapping platform names to lists of user handles.
+            max_parallel_platforms: Optionally limit how many platforms are scraped at the same time
+                                    (all of them by default).
+            max_concurrent_runs: Optionally cap the actor runs in flight across all platforms of this
+                                 call. Other sessions sharing the engine keep their own limits.
             (Other arguments are the same as the scrape method)
 
         Returns:
@@ -236,18 +651,46 @@ class PlatformScraper:
             { "PlatformName": {"posts": pd.DataFrame, "comments": pd.DataFrame} }
         """
         print("\n---### Starting Full Scrape for All Provided Platforms ###---")
-        all_results = {}
-        for platform, handles in user_handles.items():
-            # This method will call the main 'scrape' method for each platform
-            platform_result = self.scrape(
-                platform=platform,
-                handles=handles,
-                start=start,
-                end=end,
-                max_posts=max_posts,
-                max_comments=max_comments,
-                scrape_comments=scrape_comments
-            )
-            all_results[platform] = platform_result
-        print("\n---### Full Scrape Finished ###---")
+        started = time.monotonic()
+        parallel_platforms = max(1, max_parallel_platforms or len(user_handles) or 1)
+        if max_concurrent_runs is not None:
+            print(f"Run budget: at most {max_concurrent_runs} actor runs in flight across all platforms.")
+
+        results = {}
+        # The platforms' threads start from a copy of this context, so their runs count against the budget
+        with run_budget(max_concurrent_runs):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=parallel_platforms, thread_name_prefix="scrape-platform") as executor:
+                # This method will call the main 'scrape' method for each platform
+                future_to_platform = {
+                    executor.submit(
+                        contextvars.copy_context().run, self.scrape,
+                        platform=platform,
+                        handles=handles,
+                        start=start,
+                        end=end,
+                        max_posts=max_posts,
+                        max_comments=max_comments,
+                        scrape_comments=scrape_comments,
+                        incremental=incremental,
+                        batch_posts=batch_posts,
+                        full_raw=full_raw,
+                        resume=resume,
+                        max_parallel_handles=max_parallel_handles,
+                        pipeline=pipeline,
+                        canonical=canonical
+                    ): platform
+                    for platform, handles in user_handles.items()
+                }
+                for future in concurrent.futures.as_completed(future_to_platform):
+                    platform = future_to_platform[future]
+                    try:
+                        results[platform] = future.result()
+                    except Exception as e:
+                        import traceback
+                        print(f"An error occurred while scraping '{platform}': {e}")
+                        traceback.print_exc()
+                        results[platform] = {"posts": pd.DataFrame(), "comments": pd.DataFrame()}
+
+        all_results = {platform: results[platform] for platform in user_handles}
+        print(f"\n---### Full Scrape Finished in {time.monotonic() - started:.1f}s ###---")
         return all_results
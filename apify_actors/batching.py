@@ -0,0 +1,112 @@
+import re
+from typing import Callable, Iterable, Iterator, Sequence
+
+import pandas as pd
+
+# --- Batching Helpers ---
+# Shared by the scrapers that pack several posts (or handles) into one actor run and
+# then split the run's dataset back out by the item's parent key.
+
+_URL_ID_PATTERN = re.compile(r"/(?:p|reel|tv|status|posts|activity)/([^/?#]+)")
+
+
+def chunked(items: Sequence, size: int) -> Iterator[list]:
+    """Yields consecutive lists of at most `size` items."""
+    size = max(1, int(size or 1))
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+def url_key(value) -> str | None:
+    """
+    Normalizes a post URL or ID to a comparable key: the shortcode / status ID when the URL
+    has one, otherwise the URL without scheme, query and trailing slash.
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    value = str(value).strip()
+    match = _URL_ID_PATTERN.search(value)
+    if match:
+        return match.group(1)
+    value = re.sub(r"^https?://(www\.)?", "", value).split("?")[0].split("#")[0]
+    return value.rstrip("/")
+
+
+def split_by_parent(
+    df: pd.DataFrame,
+    requested: Iterable[str],
+    parent_cols: Sequence[str],
+    key_fn: Callable = url_key,
+) -> tuple[dict[str, pd.DataFrame], int]:
+    """
+    Splits one batched dataset back into a DataFrame per requested post.
+
+    Args:
+        df: All items of the batched run.
+        requested: The post URLs/IDs that were sent to the actor.
+        parent_cols: Item columns that may hold the parent post, tried in order.
+        key_fn: Normalizes both requested values and parent values to comparable keys.
+
+    Returns:
+        ({requested_value: DataFrame}, number of items that could not be attributed).
+        Every requested value is present; posts without items map to an empty DataFrame.
+    """
+    requested = list(requested)
+    key_to_requested = {key_fn(value): value for value in requested}
+    result = {value: pd.DataFrame() for value in requested}
+    if df.empty:
+        return result, 0
+
+    parent_keys = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for col in parent_cols:
+        if col in df.columns:
+            missing = parent_keys.isna()
+            parent_keys[missing] = df.loc[missing, col].map(key_fn)
+    # Older actors may omit the parent key entirely; a single-post batch can still be attributed
+    if len(requested) == 1:
+        parent_keys = parent_keys.fillna(key_fn(requested[0]))
+
+    owners = parent_keys.map(key_to_requested)
+    for value, group in df.groupby(owners, sort=False):
+        result[value] = group.reset_index(drop=True)
+    return result, int(owners.isna().sum())
+
+
+def drop_unresolved(by_post: dict[str, pd.DataFrame], unattributed_count: int) -> dict[str, pd.DataFrame]:
+    """
+    Leaves out the posts a batched run cannot vouch for: when some items could not be
+    attributed, any post left without items may be the one they belonged to.
+    """
+    if not unattributed_count:
+        return by_post
+    return {value: df for value, df in by_post.items() if not df.empty}
+
+
+async def rerun_per_post(by_post: dict[str, pd.DataFrame], requested: Sequence[str], run_one: Callable) -> dict[str, pd.DataFrame]:
+    """
+    Re-runs every requested post missing from a batched result as its own single-post run,
+    where all items belong to that post. Posts whose re-run fails stay missing. The re-runs
+    go one after another, inside the slot the batch already holds.
+    """
+    missing = [value for value in requested if value not in by_post]
+    if missing:
+        print(f"\nRe-running {len(missing)} post(s) one per run to attribute their items.")
+        for value in missing:
+            by_post.update(await run_one([value]))
+    return by_post
+
+
+def profile_key(value) -> str | None:
+    """
+    Normalizes a handle, @handle or profile URL to a lower-case handle, e.g.
+    'https://www.instagram.com/Foo/', 'linkedin.com/in/foo' and '@foo' all become 'foo'.
+    Post URLs reduce to their author ('x.com/foo/status/1' -> 'foo').
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    value = str(value).strip().lower()
+    value = re.sub(r"^https?://", "", value)
+    value = re.sub(r"^(www\.|m\.)?[a-z0-9-]+\.com/", "", value)
+    value = re.sub(r"^(in|company|pg)/", "", value)
+    value = value.split("#")[0].lstrip("@").strip("/")
+    return value.split("/")[0] or None
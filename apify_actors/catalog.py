@@ -0,0 +1,179 @@
+import contextlib
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from .storage import KNOWN_SUFFIXES
+
+# --- Data Catalog ---
+# Every file the scrapers write (post files, comment partitions) is registered here with
+# its platform, exact handle, date range, row count and schema. Loaders ask the catalog
+# for the files of one handle instead of globbing `*{handle}*` and opening every match.
+# The catalog also keeps a per-handle watermark: the newest post timestamp ingested so far.
+
+CATALOG_FILENAME = "catalog.sqlite"
+_WATERMARK_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"  # Fixed width UTC, so SQLite can compare the strings
+
+
+def _schema_of(df: pd.DataFrame) -> str:
+    return json.dumps({str(col): str(dtype) for col, dtype in df.dtypes.items()})
+
+
+def _iso(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class DataCatalog:
+    """SQLite-backed catalog of scraped data files. Paths are stored relative to the catalog's directory."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.root = self.db_path.parent
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._adopted_dirs = set()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    platform TEXT NOT NULL,
+                    handle TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    date_start TEXT,
+                    date_end TEXT,
+                    row_count INTEGER,
+                    schema TEXT,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_by_handle ON files (platform, handle, kind)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    platform TEXT NOT NULL,
+                    handle TEXT NOT NULL,
+                    newest_post_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (platform, handle)
+                )
+                """
+            )
+
+    @classmethod
+    def for_path(cls, path: Path) -> "DataCatalog":
+        """Returns the shared catalog for a platform data directory (stored one level up, in scraped_data/)."""
+        return cls(Path(path).parent / CATALOG_FILENAME)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _relative(self, path: Path) -> str:
+        return Path(os.path.relpath(Path(path).resolve(), self.root.resolve())).as_posix()
+
+    def register(
+        self,
+        path: Path,
+        platform: str,
+        handle: str,
+        kind: str,
+        df: pd.DataFrame | None = None,
+        date_start=None,
+        date_end=None,
+    ):
+        """Records a written file. `kind` is "posts" or "comments"."""
+        row = (
+            self._relative(path), platform, handle, kind, _iso(date_start), _iso(date_end),
+            len(df) if df is not None else None,
+            _schema_of(df) if df is not None else None,
+            datetime.datetime.now().isoformat(),
+        )
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def entries(self, platform: str, handle: str, kind: str) -> list[dict]:
+        """Returns the catalog rows for one exact handle, oldest first."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM files WHERE platform = ? AND handle = ? AND kind = ? ORDER BY created_at",
+                (platform, handle, kind),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def files(self, platform: str, handle: str, kind: str) -> list[Path]:
+        """Returns the existing files recorded for one exact handle."""
+        paths = [self.root / entry["path"] for entry in self.entries(platform, handle, kind)]
+        return [p for p in paths if p.exists()]
+
+    def adopt_untracked(self, directory: Path, platform: str, kind: str) -> int:
+        """
+        Registers files written before the catalog existed, parsing the exact handle from the
+        `{handle}_{platform}_{kind}_...` file name. Runs once per directory per catalog instance.
+        """
+        directory = Path(directory)
+        if directory in self._adopted_dirs or not directory.exists():
+            return 0
+        self._adopted_dirs.add(directory)
+
+        name_pattern = re.compile(rf"^(?P<handle>.+)_{re.escape(platform)}_{re.escape(kind)}_")
+        with self._connect() as conn:
+            known = {row[0] for row in conn.execute("SELECT path FROM files WHERE platform = ? AND kind = ?", (platform, kind))}
+
+        adopted = 0
+        for f in directory.iterdir():
+            if f.suffix not in KNOWN_SUFFIXES or self._relative(f) in known:
+                continue
+            match = name_pattern.match(f.name)
+            if match:
+                self.register(f, platform, match.group("handle"), kind)
+                adopted += 1
+        return adopted
+
+    # --- Watermarks ---
+
+    def get_watermark(self, platform: str, handle: str) -> pd.Timestamp | None:
+        """Returns the newest post timestamp (UTC) ingested for a handle, or None if it was never scraped."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT newest_post_at FROM watermarks WHERE platform = ? AND handle = ?",
+                (platform, handle),
+            ).fetchone()
+        return pd.Timestamp(row[0]) if row else None
+
+    def advance_watermark(self, platform: str, handle: str, timestamps: pd.Series) -> pd.Timestamp | None:
+        """
+        Moves the handle's watermark up to the newest value in `timestamps` (never backwards).
+        Returns the newest parsed timestamp, or None if none could be parsed.
+        """
+        newest = pd.to_datetime(timestamps, utc=True, errors="coerce").max()
+        if pd.isna(newest):
+            return None
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO watermarks (platform, handle, newest_post_at, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (platform, handle) DO UPDATE SET
+                    newest_post_at = MAX(newest_post_at, excluded.newest_post_at),
+                    updated_at = excluded.updated_at
+                """,
+                (platform, handle, newest.strftime(_WATERMARK_FORMAT), datetime.datetime.now().isoformat()),
+            )
+        return newest
@@ -0,0 +1,135 @@
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from .storage import StorageBackend, get_storage, read_frame, find_file
+from .catalog import DataCatalog
+
+# --- Append-only Comment Store ---
+# Comments for a handle live under
+#   {path}/comments/{handle}/date=YYYY-MM-DD/part-NNNNN.<suffix>
+# plus a `_manifest.json` listing every part. A run only writes its own delta as a new,
+# immutable part; readers merge the parts (and any legacy combined file) on demand.
+
+MANIFEST_NAME = "_manifest.json"
+_manifest_lock = threading.Lock()
+
+
+def _clean_handle(handle: str) -> str:
+    return handle.replace("/", "_").replace("?", "_").replace("&", "_").replace("=", "_")
+
+
+class PartitionedCommentStore:
+    """Append-only, partitioned comment storage for a single handle on a single platform."""
+
+    def __init__(self, path: Path, handle: str, platform: str, storage: StorageBackend | None = None, catalog: DataCatalog | None = None):
+        """
+        Args:
+            path: The platform's data directory (e.g. scraped_data/twitter).
+            handle: The handle the comments belong to.
+            platform: Lower-case platform name, used to find legacy combined files.
+            storage: Backend used for new parts. Defaults to Parquet.
+            catalog: If given, every new part is registered in it.
+        """
+        self.handle = handle
+        self.platform = platform
+        self.storage = storage or get_storage()
+        self.catalog = catalog
+        self.comments_dir = path / "comments"
+        self.root = self.comments_dir / _clean_handle(handle)
+        self.manifest_path = self.root / MANIFEST_NAME
+
+    # --- Manifest ---
+
+    def _read_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        manifest = {"handle": self.handle, "platform": self.platform, "parts": []}
+        # Adopt the combined file written by older versions as the first (legacy) part
+        legacy_file = find_file(self.comments_dir / f"{self.handle}_{self.platform}_comments_combined")
+        if legacy_file is not None:
+            manifest["parts"].append({
+                "path": os.path.relpath(legacy_file, self.root),
+                "rows": None,
+                "created_at": None,
+                "legacy": True,
+            })
+        return manifest
+
+    def _write_manifest(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def partitions(self) -> list[dict]:
+        """Returns the manifest entries for every stored part, oldest first."""
+        return self._read_manifest()["parts"]
+
+    # --- Writing ---
+
+    def append(self, df: pd.DataFrame) -> Path | None:
+        """Writes `df` as a new immutable part and records it in the manifest."""
+        if df is None or df.empty:
+            return None
+
+        with _manifest_lock:
+            manifest = self._read_manifest()
+            now = datetime.datetime.now()
+            partition_dir = self.root / f"date={now.strftime('%Y-%m-%d')}"
+            part_stem = partition_dir / f"part-{len(manifest['parts']):05d}"
+            part_path = self.storage.write(df, part_stem)
+
+            manifest["parts"].append({
+                "path": part_path.relative_to(self.root).as_posix(),
+                "rows": len(df),
+                "created_at": now.isoformat(),
+                "columns": [str(c) for c in df.columns],
+            })
+            self._write_manifest(manifest)
+
+        if self.catalog is not None:
+            self.catalog.register(part_path, self.platform, self.handle, "comments", df)
+        return part_path
+
+    # --- Reading ---
+
+    def iter_partitions(self, columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+        """Yields each stored part as a DataFrame, reading one part at a time."""
+        for part in self.partitions():
+            part_path = (self.root / part["path"]).resolve()
+            if not part_path.exists():
+                print(f"Warning: Comment partition {part_path} listed in manifest is missing. Skipping.")
+                continue
+            try:
+                yield read_frame(part_path, columns=columns)
+            except Exception as e:
+                print(f"Warning: Could not load comment partition {part_path}: {e}")
+
+    def read(self, columns: list[str] | None = None, id_col: str | None = "id") -> pd.DataFrame:
+        """Merges all parts into one DataFrame, dropping duplicate comments by `id_col` (newest wins)."""
+        frames = [df for df in self.iter_partitions(columns=columns) if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        combined_df = pd.concat(frames, ignore_index=True)
+        if id_col and id_col in combined_df.columns:
+            combined_df.drop_duplicates(subset=[id_col], keep="last", inplace=True, ignore_index=True)
+        return combined_df
+
+    def post_keys(self, key_columns: list[str]) -> set:
+        """Returns the distinct values of `key_columns` across all parts, reading only those columns."""
+        keys = set()
+        for df in self.iter_partitions(columns=key_columns):
+            for col in key_columns:
+                if col in df.columns:
+                    keys.update(df[col].dropna().unique())
+        return keys
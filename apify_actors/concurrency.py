@@ -0,0 +1,153 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# --- Adaptive Concurrency (AIMD) ---
+# The number of actor runs in flight is not a fixed pool size. It grows by one per full
+# window of healthy runs (additive increase) and is cut by a factor when Apify throttles
+# (HTTP 429, account memory / concurrent-run limits), when too many recent runs fail, or when
+# new runs sit queued in READY for longer than the latency target (multiplicative decrease).
+# The controller only counts runs in flight; the run scheduler decides which run gets the
+# next slot and calls acquire() / release() around it.
+
+# Apify error types that mean "slow down" rather than "this request is wrong"
+THROTTLE_ERROR_TYPES = {
+    "rate-limit-exceeded",
+    "actor-memory-limit-exceeded",
+    "max-concurrent-actor-runs-exceeded",
+}
+THROTTLE_STATUS_CODES = {429, 402}
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True if an Apify client error means the account or API is throttling us."""
+    if getattr(exc, "status_code", None) in THROTTLE_STATUS_CODES:
+        return True
+    if getattr(exc, "type", None) in THROTTLE_ERROR_TYPES:
+        return True
+    message = str(exc).lower()
+    return "rate limit" in message or "too many requests" in message
+
+
+@dataclass
+class LimitChange:
+    """One entry of the controller's history."""
+
+    at: float  # time.monotonic()
+    limit: int
+    reason: str  # "start", "increase", "throttle", "errors", "latency" or "budget"
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on concurrent actor runs."""
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        decrease_factor: float = 0.5,
+        latency_target: float = 60.0,
+        error_threshold: float = 0.2,
+        window: int = 20,
+        cooldown: float = 5.0,
+    ):
+        """
+        Args:
+            initial_limit: Runs allowed in flight before any feedback has arrived.
+            min_limit: The limit never drops below this.
+            max_limit: The limit never grows above this.
+            decrease_factor: The limit is multiplied by this on throttling.
+            latency_target: Seconds a run may wait in READY before it counts as a sign of overload.
+            error_threshold: Fraction of failed runs among the last `window` outcomes that triggers a decrease.
+            window: Number of recent outcomes the error rate is computed over.
+            cooldown: Seconds after a decrease during which further decreases are ignored,
+                      so one burst of throttled requests only halves the limit once.
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self.history: list[LimitChange] = []
+        self._limit = float(min(self.max_limit, max(self.min_limit, int(initial_limit))))
+        self._outcomes: deque[bool] = deque(maxlen=max(1, int(window)))  # True = failed
+        self._last_decrease = float("-inf")
+        self._record("start")
+
+    @property
+    def limit(self) -> int:
+        """The current number of runs allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of runs holding a slot."""
+        return self._in_flight
+
+    def error_rate(self) -> float:
+        """Fraction of failed runs among the recent outcomes."""
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _record(self, reason: str):
+        self.history.append(LimitChange(time.monotonic(), self.limit, reason))
+
+    # --- Slots (taken and returned by the run scheduler) ---
+
+    def has_room(self) -> bool:
+        """True while fewer runs than the limit are in flight."""
+        return self._in_flight < self.limit
+
+    def acquire(self):
+        """Counts a run the scheduler let start as in flight."""
+        self._in_flight += 1
+
+    def release(self):
+        """Counts a run as no longer in flight."""
+        self._in_flight -= 1
+
+    def set_max_limit(self, max_limit: int):
+        """Changes the ceiling the limit can grow to; a current limit above it is cut at once."""
+        self.max_limit = max(self.min_limit, int(max_limit))
+        if self._limit > self.max_limit:
+            self._limit = float(self.max_limit)
+            self._record("budget")
+
+    # --- Feedback (reported while the run still holds its slot) ---
+
+    def on_success(self, latency: float | None = None):
+        """A run finished. `latency` is how long it waited before it started running."""
+        self._outcomes.append(False)
+        if latency is not None and latency > self.latency_target:
+            self._decrease("latency")
+            return
+        # Only grow while the limit is actually being used, not while demand is below it
+        if self.in_flight >= self.limit - 1 and self._limit < self.max_limit:
+            previous = self.limit
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            if self.limit != previous:
+                self._record("increase")
+
+    def on_error(self):
+        """A run failed for a reason other than throttling."""
+        self._outcomes.append(True)
+        if len(self._outcomes) == self._outcomes.maxlen and self.error_rate() > self.error_threshold:
+            self._decrease("errors")
+
+    def on_throttle(self):
+        """Apify refused or delayed a request because of rate or account limits."""
+        self._outcomes.append(True)
+        self._decrease("throttle")
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self._outcomes.clear()
+        self._record(reason)
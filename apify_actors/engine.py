@@ -0,0 +1,455 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Coroutine, Iterable
+
+import pandas as pd
+from apify_client import ApifyClientAsync
+
+from .concurrency import AIMDController, is_throttle_error
+from .ingest import DEFAULT_CHUNK_SIZE, FieldProjection, concat_frames, aiter_dataset_frames
+from .resilience import ActorRunError, CircuitBreaker, DatasetReadError, async_retrying
+from .result_cache import ResultCache, _set_current_cache, cache_key, current_cache
+from .job_journal import JobContext, _set_current_job, current_job
+from .scheduler import DEFAULT_MAX_RUNS_PER_ACTOR, RunBudget, RunScheduler, _set_current_budget, _set_current_tenant, current_budget, current_tenant
+
+# --- Async Actor Engine ---
+# An actor run spends nearly all of its time waiting on Apify. Instead of parking one OS
+# thread per run inside a blocking `.call()`, runs are coroutines on a single background
+# event loop built on ApifyClientAsync. Synchronous scraper code submits coroutines and gets
+# concurrent.futures.Future objects back, so the existing as_completed/tqdm loops keep working.
+#
+# Runs are fired with `start()` and tracked by a RunManager: one poll loop checks every run
+# still in flight and wakes its waiter once it reaches a terminal status, which then reads
+# the dataset. A slow run therefore only occupies a row in the run table, not a worker slot.
+# A run that keeps failing to poll (or no longer exists) fails its waiter instead of being
+# polled forever, and rows are dropped once their waiter has been resolved.
+#
+# How many runs may be in flight is decided by an AIMD controller fed with every run's
+# outcome: it ramps up while runs start promptly and succeed, and backs off on throttling.
+# Runs are admitted under that limit by a RunScheduler, which also caps each actor and
+# serves the waiting runs of different sessions and handles in turn.
+# Starting a run is retried on transient errors, and each actor has a circuit breaker.
+# With a result cache active, identical calls and dataset reads are served from it.
+# Inside a journaled job, every run is recorded, so a resumed job re-uses finished runs and
+# re-attaches to runs that were still going.
+
+DEFAULT_MAX_CONCURRENT_RUNS = 200  # Ceiling for in-flight actor runs across all scrapers sharing an engine
+DEFAULT_INITIAL_CONCURRENT_RUNS = 20  # Starting point the controller adapts from
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+ERROR_STATUSES = {"FAILED", "TIMED-OUT"}  # Count against the error rate (ABORTED is a deliberate stop)
+DEFAULT_MAX_POLL_FAILURES = 20  # Consecutive failed or empty polls before a run is given up on (minutes at the poll ceiling)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+@dataclass
+class RunRecord:
+    """One row of the run table."""
+
+    run_id: str
+    actor_id: str
+    dataset_id: str
+    status: str
+    started_at: float = field(default_factory=time.monotonic)
+    running_at: float | None = None  # First time the run was seen past READY
+    finished_at: float | None = None
+    polls: int = 0
+    poll_failures: int = 0  # Consecutive polls that raised or found no run
+    next_poll_at: float = 0.0
+
+    def queue_delay(self) -> float | None:
+        """Seconds the run waited in READY before Apify started it (as seen by the poll loop)."""
+        if self.running_at is None:
+            return None
+        return self.running_at - self.started_at
+
+
+class RunManager:
+    """Starts actor runs and waits on all of them from a single poll loop."""
+
+    def __init__(self, async_client, min_poll_interval: float = 1.0, max_poll_interval: float = 15.0, max_parallel_polls: int = 25, max_poll_failures: int = DEFAULT_MAX_POLL_FAILURES):
+        """
+        Args:
+            async_client: ApifyClientAsync used to start and poll runs.
+            min_poll_interval: Seconds before a new run is first polled.
+            max_poll_interval: Poll backoff ceiling for long runs.
+            max_parallel_polls: Status requests sent at once by one sweep of the poll loop.
+            max_poll_failures: Consecutive polls that raise or find no run before its waiter
+                               fails with LookupError.
+        """
+        self.client = async_client
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_poll_failures = max(1, int(max_poll_failures))
+        self.table: dict[str, RunRecord] = {}
+        self._waiters: dict[str, list[asyncio.Future]] = {}  # Run ID -> every call waiting on it
+        self._poll_slots = asyncio.Semaphore(max_parallel_polls)
+        self._wakeup: asyncio.Event | None = None
+        self._poller: asyncio.Task | None = None
+
+    async def start(self, actor_id: str, run_input: dict) -> RunRecord:
+        """Fires a run without waiting for it and records it in the run table."""
+        run = await self.client.actor(actor_id).start(run_input=run_input)
+        return self._track(actor_id, run)
+
+    async def attach(self, actor_id: str, run_id: str) -> RunRecord:
+        """
+        Tracks a run started earlier (e.g. by a process that has since died) so it can be waited
+        on. A run that is already tracked keeps its record, and every caller may wait on it.
+        """
+        if run_id in self.table:
+            return self.table[run_id]
+        run = await self.client.run(run_id).get()
+        if run is None:
+            raise LookupError(f"Actor run {run_id} no longer exists.")
+        return self._track(actor_id, run)
+
+    def _track(self, actor_id: str, run: dict) -> RunRecord:
+        record = RunRecord(
+            run_id=run["id"],
+            actor_id=actor_id,
+            dataset_id=run["defaultDatasetId"],
+            status=run.get("status", "READY"),
+            next_poll_at=time.monotonic() + self.min_poll_interval,
+        )
+        self.table[record.run_id] = record
+        if record.status != "READY":
+            record.running_at = time.monotonic()
+        if record.status in TERMINAL_STATUSES:
+            record.finished_at = time.monotonic()
+        return record
+
+    async def wait(self, run_id: str) -> dict:
+        """
+        Waits until the poll loop sees the run finish and returns the final run object.
+        Several calls may wait on the same run; all of them get the result.
+        Raises LookupError if the run is not tracked, or cannot be polled `max_poll_failures`
+        times in a row. The run is no longer tracked once its waiters have the result.
+        """
+        record = self.table.get(run_id)
+        if record is None:
+            raise LookupError(f"Actor run {run_id} is not tracked.")
+        if record.finished_at is not None:
+            try:
+                run = await self.client.run(run_id).get()
+            finally:
+                self.table.pop(run_id, None)
+            if run is None:
+                raise LookupError(f"Actor run {run_id} no longer exists.")
+            return run
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(run_id, []).append(waiter)
+        if self._poller is None or self._poller.done():
+            self._wakeup = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll_loop())
+        self._wakeup.set()
+        return await waiter
+
+    def in_flight(self) -> list[RunRecord]:
+        """Returns the runs that have not reached a terminal status yet."""
+        return [record for record in self.table.values() if record.finished_at is None]
+
+    def status_counts(self) -> dict[str, int]:
+        """Returns the number of tracked runs per status (finished runs are dropped once their waiter has the result)."""
+        counts = {}
+        for record in self.table.values():
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return counts
+
+    async def _poll_loop(self):
+        while self._waiters:
+            # Waiters whose call was cancelled are dropped; a run nobody waits on stops being tracked
+            for run_id, waiters in list(self._waiters.items()):
+                waiters[:] = [waiter for waiter in waiters if not waiter.done()]
+                if not waiters:
+                    del self._waiters[run_id]
+                    self.table.pop(run_id, None)
+            if not self._waiters:
+                break
+            now = time.monotonic()
+            due = [run_id for run_id in self._waiters if self.table[run_id].next_poll_at <= now]
+            if due:
+                await asyncio.gather(*(self._poll(run_id) for run_id in due))
+            if not self._waiters:
+                break
+            # Sleep until the next run is due, or until a new waiter arrives
+            next_due = min(self.table[run_id].next_poll_at for run_id in self._waiters)
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_due - time.monotonic()))
+
+    async def _poll(self, run_id: str):
+        record = self.table[run_id]
+        try:
+            async with self._poll_slots:
+                run = await self.client.run(run_id).get()
+        except Exception as e:
+            run = None
+            problem = f"could not be polled ({e})"
+            print(f"\nWarning: Could not poll actor run {run_id}: {e}")
+        else:
+            problem = "was not found"
+
+        record.polls += 1
+        # Back off on long runs so thousands of them do not flood the API with status requests
+        interval = min(self.max_poll_interval, self.min_poll_interval * (1.5 ** record.polls))
+        record.next_poll_at = time.monotonic() + interval
+        if run is None:
+            record.poll_failures += 1
+            if record.poll_failures >= self.max_poll_failures:
+                self._resolve(run_id, error=LookupError(f"Actor run {run_id} {problem} {record.poll_failures} times in a row; giving up on it."))
+            return
+        record.poll_failures = 0
+
+        record.status = run.get("status", record.status)
+        if record.running_at is None and record.status != "READY":
+            record.running_at = time.monotonic()
+        if record.status in TERMINAL_STATUSES:
+            record.finished_at = time.monotonic()
+            self._resolve(run_id, run=run)
+
+    def _resolve(self, run_id: str, run: dict | None = None, error: Exception | None = None):
+        """Hands the run (or the error) to its waiters and stops tracking it."""
+        self.table.pop(run_id, None)
+        for waiter in self._waiters.pop(run_id, []):
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(run)
+
+
+class AsyncActorEngine:
+    """One event loop thread running the actor calls and dataset reads of every scraper."""
+
+    def __init__(self, async_client, max_concurrent_runs: int = DEFAULT_MAX_CONCURRENT_RUNS, initial_concurrent_runs: int = DEFAULT_INITIAL_CONCURRENT_RUNS, max_runs_per_actor: int | None = DEFAULT_MAX_RUNS_PER_ACTOR):
+        """
+        Args:
+            async_client: An ApifyClientAsync (or anything with the same actor/run/dataset interface).
+            max_concurrent_runs: Upper bound for the adaptive limit on actor runs in flight at once.
+            initial_concurrent_runs: The adaptive limit before any run has reported back.
+            max_runs_per_actor: Default cap on runs of one actor in flight (None for no cap).
+        """
+        self.client = async_client
+        self.max_concurrent_runs = max_concurrent_runs
+        self.runs = RunManager(async_client)
+        self.concurrency = AIMDController(initial_limit=initial_concurrent_runs, max_limit=max_concurrent_runs)
+        self.scheduler = RunScheduler(self.concurrency, max_runs_per_actor)
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="apify-engine", daemon=True)
+        self._thread.start()
+
+    # --- Scheduling (callable from any thread) ---
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the engine's loop, inside the caller's current job (if any)
+        and under the caller's scheduler session and tenant.
+        """
+        return asyncio.run_coroutine_threadsafe(self._in_job(current_job(), current_tenant(), current_budget(), current_cache(), coro), self._loop)
+
+    @staticmethod
+    async def _in_job(job: JobContext | None, tenant: tuple[str, str], budget: RunBudget | None, cache: ResultCache | None, coro: Coroutine):
+        _set_current_job(job)  # Task-local: each submitted coroutine runs in its own task context
+        _set_current_tenant(tenant)
+        _set_current_budget(budget)
+        _set_current_cache(cache)
+        return await coro
+
+    def submit_bounded(self, coros: Iterable[Coroutine], limit: int) -> list[concurrent.futures.Future]:
+        """
+        Schedules coroutines that share `limit` slots. Each coroutine holds its slot from start
+        to finish, so at most `limit` of them (and the actor runs they start and read) are in
+        flight at once, on top of the engine-wide run limit.
+        """
+        submit = self.bounded_submitter(limit)
+        return [submit(coro) for coro in coros]
+
+    def bounded_submitter(self, limit: int) -> Callable[[Coroutine], concurrent.futures.Future]:
+        """Like submit_bounded, for coroutines handed over one at a time as they become available."""
+        semaphore = asyncio.Semaphore(max(1, int(limit)))
+        return lambda coro: self.submit(self._bounded(semaphore, coro))
+
+    @staticmethod
+    async def _bounded(semaphore: asyncio.Semaphore, coro: Coroutine):
+        async with semaphore:
+            return await coro
+
+    def set_max_concurrent_runs(self, max_concurrent_runs: int):
+        """
+        Changes the ceiling of the adaptive run limit. It is a budget shared by every scraper,
+        platform and handle using this engine.
+        """
+        self.max_concurrent_runs = max_concurrent_runs
+        asyncio.run_coroutine_threadsafe(self.scheduler.set_max_runs(max_concurrent_runs), self._loop).result()
+
+    def set_actor_limit(self, actor_id: str, limit: int | None):
+        """Caps the runs of one actor in flight across every scraper using this engine (None restores the default)."""
+        asyncio.run_coroutine_threadsafe(self.scheduler.set_actor_limit(actor_id, limit), self._loop).result()
+
+    # --- Apify operations (awaited on the engine's loop) ---
+
+    def breaker(self, actor_id: str) -> CircuitBreaker:
+        """Returns the circuit breaker of one actor."""
+        if actor_id not in self.breakers:
+            self.breakers[actor_id] = CircuitBreaker(actor_id)
+        return self.breakers[actor_id]
+
+    async def call_actor(self, actor_id: str, run_input: dict, require_success: bool = False) -> dict:
+        """
+        Starts an actor run and waits for it to finish without holding a thread.
+        Starting is retried on transient errors; the outcome is reported to the concurrency
+        controller and the actor's circuit breaker (CircuitOpenError while it is open).
+        A successful run of an identical call in the current result cache is returned instead.
+        Inside a journaled job, a run this job already finished is re-used and one still
+        going is re-attached to.
+        With `require_success`, a run that did not succeed raises ActorRunError instead of being
+        returned, even if its dataset holds some items.
+        """
+        run = await self._call_actor(actor_id, run_input)
+        if require_success and run.get("status") != "SUCCEEDED":
+            raise ActorRunError(actor_id, run)
+        return run
+
+    async def _call_actor(self, actor_id: str, run_input: dict) -> dict:
+        job = current_job()
+        call_key = cache_key(actor_id, run_input)
+        if job is not None:
+            journaled = await asyncio.to_thread(job.journal.get_run, job.job_id, call_key)
+            if journaled is not None and journaled.run is not None and journaled.status not in ERROR_STATUSES:
+                print(f"Re-using run {journaled.run_id} of actor {actor_id} finished earlier in this job.")
+                return journaled.run
+            if journaled is not None and journaled.run is None:
+                run = await self._reattach(job, journaled.actor_id, journaled.run_id, call_key)
+                if run is not None:
+                    return run
+
+        cache = current_cache()
+        if cache is not None:
+            cached_run = await asyncio.to_thread(cache.get_run, actor_id, run_input)
+            if cached_run is not None:
+                print(f"Re-using cached run {cached_run['id']} of actor {actor_id} for an identical input.")
+                return cached_run
+
+        breaker = self.breaker(actor_id)
+        async with self.scheduler.slot(actor_id):
+            breaker.before_call()  # Checked once a slot is free, so queued calls see a breaker that opened meanwhile
+            try:
+                async for attempt in async_retrying():
+                    with attempt:
+                        record = await self._start(actor_id, run_input)
+            except Exception:
+                breaker.record_failure()
+                raise
+            if job is not None:
+                await asyncio.to_thread(job.journal.record_run, job.job_id, call_key, actor_id, record.run_id, record.dataset_id, record.status)
+            run = await self._finish(record, breaker)
+        if job is not None:
+            await asyncio.to_thread(job.journal.record_run, job.job_id, call_key, actor_id, record.run_id, record.dataset_id, run.get("status", "UNKNOWN"), run)
+        if cache is not None and run.get("status") == "SUCCEEDED":
+            await asyncio.to_thread(cache.put_run, actor_id, run_input, run)
+        return run
+
+    async def _finish(self, record: RunRecord, breaker: CircuitBreaker) -> dict:
+        try:
+            run = await self.runs.wait(record.run_id)
+        except Exception:
+            self.concurrency.on_error()
+            breaker.record_failure()
+            raise
+        if run.get("status") in ERROR_STATUSES:
+            self.concurrency.on_error()
+            breaker.record_failure()
+        else:
+            self.concurrency.on_success(record.queue_delay())
+            breaker.record_success()
+        return run
+
+    async def _reattach(self, job: JobContext, actor_id: str, run_id: str, call_key: str) -> dict | None:
+        """Waits for a run a previous attempt of the job started. Returns None if it cannot be found."""
+        try:
+            record = await self.runs.attach(actor_id, run_id)
+        except Exception as e:
+            print(f"\nWarning: Could not re-attach to actor run {run_id}, starting a new one: {e}")
+            return None
+        print(f"Re-attached to actor run {run_id} of actor {actor_id} (status {record.status}).")
+        try:
+            async with self.scheduler.slot(actor_id):
+                run = await self._finish(record, self.breaker(actor_id))
+        except LookupError as e:
+            print(f"\nWarning: Lost track of actor run {run_id}, starting a new one: {e}")
+            return None
+        await asyncio.to_thread(job.journal.record_run, job.job_id, call_key, actor_id, record.run_id, record.dataset_id, run.get("status", "UNKNOWN"), run)
+        if run.get("status") in ERROR_STATUSES:
+            return None # Start a fresh run instead
+        return run
+
+    async def _start(self, actor_id: str, run_input: dict) -> RunRecord:
+        try:
+            return await self.runs.start(actor_id, run_input)
+        except Exception as e:
+            self._report_error(e)
+            raise
+
+    def _report_error(self, exc: Exception):
+        if is_throttle_error(exc):
+            self.concurrency.on_throttle()
+        else:
+            self.concurrency.on_error()
+
+    async def iterate_items(self, dataset_id: str) -> AsyncIterator[dict]:
+        """Yields the items of a dataset."""
+        async for item in self.client.dataset(dataset_id).iterate_items():
+            yield item
+
+    async def read_frame(self, dataset_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, projection: FieldProjection | None = None, offset: int = 0) -> pd.DataFrame:
+        """
+        Reads a dataset into one DataFrame in `chunk_size` pages, starting at `offset`.
+        Failed pages are retried from their own offset. If one keeps failing, DatasetReadError
+        is raised, so callers never mistake a failed read for an empty or complete dataset. Full reads go through the current result cache.
+        """
+        cache = current_cache() if offset == 0 else None
+        fields = projection.params() if projection is not None else None
+        if cache is not None:
+            cached_df = await asyncio.to_thread(cache.get_items, dataset_id, fields)
+            if cached_df is not None:
+                return cached_df
+
+        frames = []
+        try:
+            async for df in aiter_dataset_frames(self.client, dataset_id, chunk_size, projection=projection, offset=offset):
+                frames.append(df)
+        except DatasetReadError as e:
+            if is_throttle_error(e.cause):
+                self.concurrency.on_throttle()
+            raise
+        df = concat_frames(frames)
+        if cache is not None:
+            await asyncio.to_thread(cache.put_items, dataset_id, fields, df)
+        return df
+
+
+def get_engine(client) -> AsyncActorEngine:
+    """Returns the shared engine for a synchronous ApifyClient (one per token and API URL)."""
+    key = (client.token, client.base_url)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            api_url = client.base_url.removesuffix("/v2")
+            engine = AsyncActorEngine(ApifyClientAsync(client.token, api_url=api_url))
+            _engines[key] = engine
+    return engine
+
+
+def run_actor(client, actor_id: str, run_input: dict) -> dict:
+    """Blocking form of call_actor for synchronous code: the run is started and tracked by the engine's run manager."""
+    engine = get_engine(client)
+    return engine.submit(engine.call_actor(actor_id, run_input)).result()
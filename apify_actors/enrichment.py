@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .ingest import concat_frames
+
+# --- Comment Enrichment ---
+# Comment runs return comments tagged only with the URL of their post. The attributes of the
+# post (text, date, engagement, author) are attached once per scrape, after every run has
+# been collected: the posts of the run are reduced to one lookup row per URL and joined onto
+# all new comments with a single hashed merge, rather than looking the post up for every
+# comment run. Every platform's comments get the same post_* columns.
+
+POST_KEY = "post_url"
+POST_COLUMNS = ("post_text", "post_date", "post_likes", "post_comments", "post_shares")
+POST_AUTHOR = "post_author"
+
+
+@dataclass(frozen=True)
+class PostAttributes:
+    """Where a platform's posts keep the attributes copied onto their comments (None if they have none)."""
+
+    key: str = "url"
+    text: str | None = "text"
+    date: str | None = None
+    likes: str | None = None
+    comments: str | None = None
+    shares: str | None = None
+
+    def sources(self) -> dict[str, str]:
+        """Post column -> the post_* column it becomes."""
+        columns = (self.text, self.date, self.likes, self.comments, self.shares)
+        return {source: target for source, target in zip(columns, POST_COLUMNS) if source is not None}
+
+
+def enrich_comments(comment_frames: list[pd.DataFrame], posts_df: pd.DataFrame, attributes: PostAttributes, author: str | None = None) -> pd.DataFrame:
+    """
+    Combines comment batches and attaches the attributes of the post each comment belongs to.
+
+    Args:
+        comment_frames: Comments with a 'post_url' column, as returned per post by the comment runs.
+        posts_df: The posts the comments were scraped from.
+        attributes: Which columns of `posts_df` hold the post attributes.
+        author: The handle the posts were scraped from, stored as 'post_author'.
+
+    Returns:
+        All comments, one row each, with every post_* column present. Attributes the posts do
+        not have (or comments whose post is not in `posts_df`) are left empty.
+    """
+    comments = concat_frames(comment_frames)
+    if comments.empty:
+        return comments
+
+    sources = {source: target for source, target in attributes.sources().items() if source in posts_df.columns}
+    if attributes.key in posts_df.columns:
+        lookup = posts_df[[attributes.key, *sources]].rename(columns={attributes.key: POST_KEY, **sources})
+        # The same post can appear twice in a run (e.g. pinned posts); the last copy wins
+        lookup = lookup.dropna(subset=[POST_KEY]).drop_duplicates(subset=[POST_KEY], keep="last")
+    else:
+        lookup = pd.DataFrame(columns=[POST_KEY])
+
+    # Values already on the comments are replaced by the post's
+    comments = comments.drop(columns=[c for c in lookup.columns if c != POST_KEY and c in comments.columns])
+    enriched = comments.merge(lookup, on=POST_KEY, how="left", validate="many_to_one")
+    for column in POST_COLUMNS:
+        if column not in enriched.columns:
+            enriched[column] = None
+    enriched[POST_AUTHOR] = author
+    return enriched
@@ -5,21 +5,37 @@ from pathlib import Path
 import concurrent.futures
 import time
 from apify_client import ApifyClient
+from .storage import StorageBackend, get_storage, read_frame
+from .catalog import DataCatalog
+from .comment_store import PartitionedCommentStore
+from .post_index import ScrapedPostIndex, reported_comment_counts
+from .batching import split_by_parent, profile_key
+from .engine import AsyncActorEngine, get_engine, run_actor
+from .enrichment import PostAttributes, enrich_comments
+from .ingest import FieldProjection, read_dataset_frame
+from .pipeline import pipeline_posts_to_comments
+from .resilience import DatasetReadError
 
 POSTS_ACTOR_ID = "KoJrdxJCTtpon81KY" 
+# Post fields that identify the page a post was scraped from, tried in order when splitting batched runs
+POST_SOURCE_COLS = ["facebookUrl", "inputUrl", "pageUrl"]
 COMMENTS_ACTOR_ID = "thDyWzaBBQxt4VOfW" 
+# Post columns copied onto their comments as post_text, post_date, post_likes, ...
+POST_ATTRIBUTES = PostAttributes(text="text", date="time", likes="likes", comments="comments", shares="shares")
 
 # Helper function to load existing posts data
-def load_existing_posts(path: Path, facebook_handle: str) -> pd.DataFrame:
-    """Loads existing posts data from saved Excel files for a handle."""
+def load_existing_posts(path: Path, facebook_handle: str, catalog: DataCatalog | None = None) -> pd.DataFrame:
+    """Loads existing posts data from saved post files (Parquet or Excel) for a handle."""
     posts_dir = path / "posts"
     if not posts_dir.exists():
         print("No existing posts directory found.")
         return pd.DataFrame()
 
 
-    pattern = f"*{facebook_handle}*.xlsx"
-    existing_files = list(posts_dir.glob(pattern))
+    # Ask the catalog for the exact files of this handle (a substring glob would also match e.g. 'bobby' for 'bob')
+    catalog = catalog or DataCatalog.for_path(path)
+    catalog.adopt_untracked(posts_dir, "facebook", "posts") # Files written before the catalog existed
+    existing_files = catalog.files("facebook", facebook_handle, "posts")
 
     if not existing_files:
         print(f"No existing posts files found for handle: {facebook_handle}.")
@@ -30,7 +46,7 @@ def load_existing_posts(path: Path, facebook_handle: str) -> pd.DataFrame:
 
     for f in existing_files:
         try:
-            df = pd.read_excel(f)
+            df = read_frame(f)
             # Ensure the necessary columns exist
             if 'url' in df.columns and 'text' in df.columns:
                 all_existing_posts.append(df)
@@ -54,37 +70,60 @@ def load_existing_posts(path: Path, facebook_handle: str) -> pd.DataFrame:
 
 # Helper function to load existing comments data
 def load_existing_comments(path: Path, facebook_handle: str) -> pd.DataFrame:
-    """Loads existing comments data from the combined Excel file for a handle."""
+    """Loads existing comments data for a handle by merging the partitions of its comment store."""
     comments_dir = path / "comments"
     if not comments_dir.exists():
         print("No existing comments directory found.")
         return pd.DataFrame()
 
-    # We expect a single combined file for comments
-    # Assuming the combined file name is {handle}_facebook_comments_combined.xlsx
-    combined_file_path = comments_dir / f"{facebook_handle}_facebook_comments_combined.xlsx"
-
-    if not combined_file_path.exists():
-        print(f"No combined comments file found at {combined_file_path}.")
-        return pd.DataFrame()
-
+    comment_store = PartitionedCommentStore(path, facebook_handle, "facebook")
     try:
-        df = pd.read_excel(combined_file_path)
-        # Ensure the necessary columns exist for tracking which posts have comments and post text
-        if 'post_url' in df.columns and 'post_text' in df.columns:
-             print(f"Loaded {len(df)} existing comments from {combined_file_path}.")
-             return df
-        else:
-             print(f"Warning: Existing comments file {combined_file_path} does not contain required columns ('post_url', 'post_text'). Cannot use for skipping or post text lookup.")
-             # Return empty DataFrame if crucial columns are missing, as we can't rely on it
-             return pd.DataFrame()
+        df = comment_store.read()
     except Exception as e:
-        print(f"Warning: Could not load existing comments file {combined_file_path}: {e}")
+        print(f"Warning: Could not load existing comments from {comment_store.root}: {e}")
         return pd.DataFrame()
 
+    if df.empty:
+        print(f"No existing comments found in {comment_store.root}.")
+        return df
+    # Ensure the necessary columns exist for tracking which posts have comments and post text
+    if 'post_url' in df.columns and 'post_text' in df.columns:
+         print(f"Loaded {len(df)} existing comments from {len(comment_store.partitions())} partition(s) in {comment_store.root}.")
+         return df
+    else:
+         print(f"Warning: Existing comments in {comment_store.root} do not contain required columns ('post_url', 'post_text'). Cannot use for skipping or post text lookup.")
+         # Return empty DataFrame if crucial columns are missing, as we can't rely on it
+         return pd.DataFrame()
+
 # Keep ScrapePosts focused, but it will save to a unique file per run
-def ScrapePosts(client: ApifyClient, facebook_handle: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100) -> pd.DataFrame | None:
+def ScrapePosts(client: ApifyClient, facebook_handle: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> pd.DataFrame | None:
     """Scrapes posts for a given Facebook handle and date range."""
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+
+    run = _run_posts_actor(client, facebook_handle, start_time, end_time, max_posts)
+    if run is None:
+        return None
+
+    # Fetch Actor results from the run's dataset
+    dataset_id = run["defaultDatasetId"]
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing posts for {facebook_handle}", unit="post", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} posts from the dataset.")
+
+    if df.empty:
+        print("No posts found within the specified date range by the actor.")
+        return df # Return empty DataFrame instead of None
+
+    return _process_posts(df, facebook_handle, start_time, end_time, path, storage, catalog)
+
+def _run_posts_actor(client: ApifyClient, facebook_handle: str, start_time: datetime.datetime, end_time: datetime.datetime, max_posts: int) -> dict | None:
+    """Runs the posts actor for one Facebook handle. Returns the finished run, or None if the call fails."""
     url = f"https://www.facebook.com/{facebook_handle}"
     print(f"\n--- Starting post scrape for Facebook handle: {facebook_handle} ---")
     print(f"Fetching posts from {url} between {start_time.strftime('%Y-%m-%d')} and {end_time.strftime('%Y-%m-%d')}")
@@ -104,40 +143,16 @@ def ScrapePosts(client: ApifyClient, facebook_handle: str, start_time: datetime.
 
     try:
         print(f"Calling Apify Actor {POSTS_ACTOR_ID} for posts...")
-        run = client.actor(POSTS_ACTOR_ID).call(run_input=payload)
-        print(f"Actor run started with ID: {run['id']}")
+        run = run_actor(client, POSTS_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
+        return run
 
     except Exception as e:
         print(f"Error calling Apify Actor {POSTS_ACTOR_ID}. Please check API key/Actor ID/Permissions. Error: {e}")
         return None
 
-    # Fetch Actor results from the run's dataset
-    data = []
-    dataset_id = run["defaultDatasetId"]
-    print(f"Collecting post data from dataset: {dataset_id}...")
-
-    try:
-        # Attempt to get item count for tqdm total
-        dataset_info = client.dataset(dataset_id).get()
-        total_items = dataset_info.get('itemCount')
-        if total_items is None: total_items = 0 # Handle cases where count isn't immediately available
-
-        # Use iterate_items() for potentially large datasets
-        for item in tqdm(client.dataset(dataset_id).iterate_items(), total=total_items, desc=f"Processing posts for {facebook_handle}", unit="post"):
-            data.append(item)
-
-    except Exception as e:
-        print(f"Error fetching data from dataset {dataset_id}: {e}")
-        # Even if fetching fails partially, return what we got
-        pass
-
-    df = pd.DataFrame(data)
-    print(f"Collected {len(df)} posts from the dataset.")
-
-    if df.empty:
-        print("No posts found within the specified date range by the actor.")
-        return df # Return empty DataFrame instead of None
-
+def _process_posts(df: pd.DataFrame, facebook_handle: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, storage: StorageBackend, catalog: DataCatalog) -> pd.DataFrame:
+    """Saves/registers the posts of one Facebook handle."""
     # Save results to a unique file based on handle, date range, and timestamp
     save_dir = path / "posts"
     save_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists
@@ -145,7 +160,8 @@ def ScrapePosts(client: ApifyClient, facebook_handle: str, start_time: datetime.
     # Clean handle for filename
     handle_cleaned = facebook_handle.replace("/", "_").replace("?", "_").replace("&", "_").replace("=", "_")
     current_timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filename = save_dir / f"{handle_cleaned}_facebook_posts_{start_time.strftime('%Y-%m-%d')}_to_{end_time.strftime('%Y-%m-%d')}_{current_timestamp}.xlsx"
+    output_stem = save_dir / f"{handle_cleaned}_facebook_posts_{start_time.strftime('%Y-%m-%d')}_to_{end_time.strftime('%Y-%m-%d')}_{current_timestamp}"
+    output_filename = storage.path_for(output_stem)
 
     print(f"Saving newly scraped post data ({len(df)} posts) to {output_filename}...")
     try:
@@ -154,43 +170,78 @@ def ScrapePosts(client: ApifyClient, facebook_handle: str, start_time: datetime.
              print("Warning: 'text' column not found in scraped posts data.")
              df['text'] = None # Add it with None values if missing
 
-        df.to_excel(output_filename, index=False)
+        written_path = storage.write(df, output_stem)
+        catalog.register(written_path, "facebook", facebook_handle, "posts", df, date_start=start_time, date_end=end_time)
         print("Post data saved successfully.")
     except Exception as e:
         print(f"Error saving post data to {output_filename}: {e}")
 
     return df
 
-# Keep ScrapePostComments focused on scraping a single post's comments
-def ScrapePostComments(client: ApifyClient, post_url: str, max_comments: int = 100) -> pd.DataFrame:
-    """Scrapes comments for a single post URL."""
+def ScrapePostsBatch(client: ApifyClient, facebook_handles: list[str], start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> dict[str, pd.DataFrame] | None:
+    """
+    Scrapes posts for several Facebook handles in one actor run and attributes them back to each handle by page URL.
+    Returns {facebook_handle: posts_df} (each saved like ScrapePosts would), or None if the run fails.
+    """
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+    print(f"\n--- Starting batched post scrape for {len(facebook_handles)} Facebook handles ---")
+    print(f"Fetching posts between {start_time.strftime('%Y-%m-%d')} and {end_time.strftime('%Y-%m-%d')}")
+
     payload = {
-        "post_url": post_url,
-        "count": max_comments,
+        "startUrls": [{"url": f"https://www.facebook.com/{handle}"} for handle in facebook_handles],
+        "resultsLimit": max_posts, # Applied per start URL by the actor
+        "onlyPostsNewerThan": start_time.isoformat(),
+        "onlyPostsOlderThan": end_time.isoformat(),
     }
 
     try:
-        run = client.actor(COMMENTS_ACTOR_ID).call(run_input=payload)
-        # print(f"Comment actor run started for {post_id_display} with ID: {run['id']}") # Too noisy
-
+        print(f"Calling Apify Actor {POSTS_ACTOR_ID} for posts...")
+        run = run_actor(client, POSTS_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
     except Exception as e:
-        return pd.DataFrame()
+        print(f"Error calling Apify Actor {POSTS_ACTOR_ID} for {len(facebook_handles)} handles. Error: {e}")
+        return None
 
-    # Fetch Actor results from the run's dataset
-    data = []
     dataset_id = run["defaultDatasetId"]
-    # print(f"Collecting comment data from dataset: {dataset_id} for post {post_id_display}...") # Too noisy
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing posts for {len(facebook_handles)} handles", unit="post", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} posts from the dataset.")
+
+    posts_by_handle, unattributed_count = split_by_parent(df, facebook_handles, POST_SOURCE_COLS, key_fn=profile_key)
+    if unattributed_count:
+        print(f"Warning: {unattributed_count} posts in dataset {dataset_id} could not be matched to a requested handle.")
+
+    for handle, handle_df in posts_by_handle.items():
+        print(f"Attributed {len(handle_df)} posts to {handle}.")
+        if not handle_df.empty:
+            posts_by_handle[handle] = _process_posts(handle_df, handle, start_time, end_time, path, storage, catalog)
+    return posts_by_handle
+
+# The comments actor takes a single post URL per run
+def _comments_payload(post_url: str, max_comments: int) -> dict:
+    return {
+        "post_url": post_url,
+        "count": max_comments,
+    }
 
+async def ScrapePostCommentsAsync(engine: AsyncActorEngine, post_url: str, max_comments: int = 100, comment_fields: FieldProjection | None = None) -> pd.DataFrame:
+    """Scrapes comments for a single post URL on the async engine, waiting for the run without holding a thread."""
+    # A run that did not succeed raises too: its partial items would mark these posts as scraped
     try:
-        for item in client.dataset(dataset_id).iterate_items():
-            data.append(item)
-        # print(f"Collected {len(data)} comments for post {post_id_display}") # Too noisy
+        run = await engine.call_actor(COMMENTS_ACTOR_ID, _comments_payload(post_url, max_comments), require_success=True)
     except Exception as e:
-         pass
+        print(f"\nError calling Apify Actor {COMMENTS_ACTOR_ID} for post {post_url}. Error: {e}")
+        raise # An empty result would mark the post as scraped; the caller skips it so a later run retries it
 
+    # Failed pages are retried; a read that still fails raises, so these posts are not marked as scraped
+    df = await engine.read_frame(run["defaultDatasetId"], projection=comment_fields)
 
-    df = pd.DataFrame(data)
-    # print(f"Found {len(df)} comments for post {post_id_display}") # Too noisy
     return df
 
 # Orchestrator function with threading and duplicate check
@@ -203,13 +254,24 @@ def ScrapePostsAndComments(
     max_posts: int = 100,
     max_comments: int = 100,
     max_threads: int = 10,
+    storage: StorageBackend | None = None,
+    post_index: ScrapedPostIndex | None = None,
+    catalog: DataCatalog | None = None,
+    post_fields: FieldProjection | None = None, # Dataset fields to download, None downloads full items
+    comment_fields: FieldProjection | None = None,
+    posts_df: pd.DataFrame | None = None, # Posts already fetched by a batched run, skips the posts scrape
+    pipeline: bool = False, # Start comment runs while the posts dataset is still being read
 ) -> tuple[pd.DataFrame, pd.DataFrame] | tuple[None, None]:
     """
     Scrape posts and their comments for a specific Facebook handle.
-    Uses threading for comment scraping and avoids re-scraping comments for posts already processed.
+    Runs comment scraping on the async actor engine and avoids re-scraping comments for posts already processed.
+    With `pipeline`, comment runs start as soon as their posts are read from the posts dataset.
 
-    Returns a tuple of (posts_df, comments_df) or (None, None) if post scraping fails.
+    Returns a tuple of (posts_df_this_run, comments_df_this_run) or (None, None) if post scraping fails.
     """
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+
     print("-" * 60)
     print(f"--- Starting combined scrape process for {facebook_handle} ---")
     print(f"Posts between {start_time.strftime('%Y-%m-%d')} and {end_time.strftime('%Y-%m-%d')}")
@@ -217,21 +279,66 @@ def ScrapePostsAndComments(
 
     # --- 1. Load existing data to identify already scraped items ---
     # We primarily need the list of post_urls for which comments have already been saved
-    existing_comments_df = load_existing_comments(path, facebook_handle)
-    # Ensure 'post_url' exists before trying to get unique values
-    existing_comment_post_urls = set(existing_comments_df['post_url'].unique() if not existing_comments_df.empty and 'post_url' in existing_comments_df.columns else [])
-    print(f"Identified {len(existing_comment_post_urls)} posts with existing comments data.")
+    comment_store = PartitionedCommentStore(path, facebook_handle, "facebook", storage, catalog)
+    # Which posts already have comments is looked up in the persistent post index
+    post_index = post_index or ScrapedPostIndex.for_path(path)
+    migrated_count = post_index.backfill_from_store("facebook", facebook_handle, comment_store)
+    if migrated_count:
+        print(f"Seeded post index with {migrated_count} posts from existing comment partitions.")
 
     # --- 2. Scrape Posts ---
-    # Get posts from the specified date range in this run
-    posts_df_this_run = ScrapePosts( # Renamed variable to be clear this is posts from *this* scrape
-        client=client,
-        facebook_handle=facebook_handle,
-        start_time=start_time,
-        end_time=end_time,
-        path=path,
-        max_posts=max_posts
-    )
+    engine = get_engine(client)
+    future_to_url = None # Comment runs already started by the pipeline
+    streamed = None
+    if pipeline and posts_df is None:
+        # Posts are read chunk by chunk; a comment run starts for each post without scraped
+        # comments as soon as it has been read, and the posts file is written in the background
+        run = _run_posts_actor(client, facebook_handle, start_time, end_time, max_posts)
+        if run is None:
+            print("Post scraping failed. Aborting comment scraping.")
+            return None, None
+
+        def select(chunk: pd.DataFrame) -> list[str]:
+            if 'url' not in chunk.columns:
+                return []
+            urls = chunk['url'].dropna()
+            urls = urls[urls.astype(bool)] # Ensure url is not empty
+            return urls[~urls.isin(post_index.scraped_keys("facebook", facebook_handle, urls, reported_comment_counts(urls, chunk, POST_ATTRIBUTES.comments)))].tolist()
+
+        print(f"Collecting post data from dataset: {run['defaultDatasetId']} (comment runs start while it is read)...")
+        try:
+            streamed = pipeline_posts_to_comments(
+                client,
+                run["defaultDatasetId"],
+                select=select,
+                comment_batch=lambda batch: ScrapePostCommentsAsync(engine, batch[0], max_comments, comment_fields),
+                # Saved from a shallow copy: _process_posts may add a 'text' column while comments are collected
+                save=lambda df: _process_posts(df.copy(deep=False), facebook_handle, start_time, end_time, path, storage, catalog),
+                max_threads=max_threads,
+                projection=post_fields,
+                desc=f"Processing posts for {facebook_handle}",
+                unit="post",
+            )
+        except DatasetReadError as e:
+            print(f"Error fetching data from dataset {run['defaultDatasetId']}: {e}")
+            return None, None
+        posts_df_this_run = streamed.posts_df
+        future_to_url = {future: batch[0] for future, batch in streamed.future_to_batch.items()}
+        print(f"Collected {len(posts_df_this_run)} posts from the dataset.")
+    else:
+        # Get posts from the specified date range in this run
+        # Posts fetched beforehand by a batched run (ScrapePostsBatch) are used as-is.
+        posts_df_this_run = posts_df if posts_df is not None else ScrapePosts( # Renamed variable to be clear this is posts from *this* scrape
+            client=client,
+            facebook_handle=facebook_handle,
+            start_time=start_time,
+            end_time=end_time,
+            path=path,
+            max_posts=max_posts,
+            storage=storage,
+            catalog=catalog,
+            post_fields=post_fields,
+        )
 
     # Check if post scraping failed or returned no posts
     if posts_df_this_run is None:
@@ -240,20 +347,22 @@ def ScrapePostsAndComments(
 
     if posts_df_this_run.empty or "url" not in posts_df_this_run.columns:
         print("No posts scraped in this run or 'url' column missing. No new comments to scrape.")
-        # Load existing comments just in case
-        final_comments_df = load_existing_comments(path, facebook_handle)
-        # Return the scraped posts_df (even if empty) and the loaded comments_df
-        return posts_df_this_run, final_comments_df # Return the posts df from this run
+        if streamed is not None:
+            streamed.wait_saved()
+        return posts_df_this_run, pd.DataFrame() # No comments scraped in this run
 
 
     # --- 3. Determine which posts need comments scraped ---
     # Ensure 'url' column exists before accessing it
     if 'url' not in posts_df_this_run.columns:
          print("Error: 'url' column missing in newly scraped posts DataFrame. Cannot proceed with comment scraping.")
-         final_comments_df = load_existing_comments(path, facebook_handle) # Load existing comments as fallback
-         return posts_df_this_run, final_comments_df # Return scraped posts (which is missing 'url') and loaded comments
+         return posts_df_this_run, pd.DataFrame() # No comments scraped in this run
 
     all_post_urls_from_scrape = posts_df_this_run['url'].tolist()
+    # Posts checked with no comments are looked at again once they report more comments
+    reported_counts = reported_comment_counts(posts_df_this_run['url'].dropna(), posts_df_this_run, POST_ATTRIBUTES.comments)
+    existing_comment_post_urls = post_index.scraped_keys("facebook", facebook_handle, all_post_urls_from_scrape, reported_counts)
+    print(f"Identified {len(existing_comment_post_urls)} posts with existing comments data.")
 
     # Filter out post URLs for which we already have comments data
     post_urls_to_scrape_comments = [
@@ -268,135 +377,81 @@ def ScrapePostsAndComments(
     print(f"Proceeding to scrape comments for {len(post_urls_to_scrape_comments)} posts.")
 
     newly_scraped_comments_list = []
-
-    # --- 4. Scrape Comments using Threading ---
-    if post_urls_to_scrape_comments:
-        print(f"Starting comment scraping using {max_threads} threads...")
-
-        # Use ThreadPoolExecutor for concurrent comment scraping
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+    newly_scraped_comments_df = pd.DataFrame()
+    fetched_comment_counts = {} # post_url -> number of comments fetched in this run
+
+    # --- 4. Scrape Comments on the async engine ---
+    if future_to_url or post_urls_to_scrape_comments:
+        print(f"Starting comment scraping with up to {max_threads} concurrent actor runs...")
+
+        if future_to_url is None:
+            # Comment runs are coroutines on the shared engine loop, at most max_threads of them in flight
+            futures = engine.submit_bounded(
+                (ScrapePostCommentsAsync(engine, post_url, max_comments, comment_fields) for post_url in post_urls_to_scrape_comments),
+                limit=max_threads,
+            )
             # Create a dictionary to map future objects to post URLs for easier tracking and error reporting
-            future_to_url = {
-                executor.submit(ScrapePostComments, client, post_url, max_comments): post_url
-                for post_url in post_urls_to_scrape_comments
-            }
-
-            # Use tqdm with as_completed for progress tracking
-            progress_bar = tqdm(concurrent.futures.as_completed(future_to_url),
-                                total=len(future_to_url),
-                                desc=f"Scraping comments for {facebook_handle}'s posts",
-                                unit="post",
-                                # Leave the progress bar after completion
-                                leave=True)
-
-            for future in progress_bar:
-                post_url = future_to_url[future]
-                try:
-                    comments_df = future.result() # This retrieves the return value (DataFrame) or raises exception
-                    if not comments_df.empty:
-                        # --- START MODIFICATION: Add post_url and post_text ---
-                        # Add metadata to comments before appending
-                        comments_df['post_url'] = post_url
-                        comments_df['Author Handle'] = facebook_handle
-
-                        # Find the corresponding post text from the posts_df_this_run
-                        # Using .query() can sometimes be cleaner
-                        post_row = posts_df_this_run.query('url == @post_url')
-                        # Alternatively: post_row = posts_df_this_run[posts_df_this_run['url'] == post_url]
-
-
-                        # Check if the post was found and has a 'text' column
-                        if not post_row.empty and 'text' in post_row.columns:
-                            # Extract the text (handle potential missing text for the post)
-                            # Use .iat[0, column_index] or .iloc[0]['text'] for robust access
-                            post_text_value = post_row['text'].iloc[0]
-                            # Add the post text to all comments for this post
-                            comments_df['post_text'] = post_text_value
-                        else:
-                             # If post text isn't found or column is missing, add a placeholder
-                             # print(f"Warning: Could not find post text for URL: {post_url} in posts_df_this_run or 'text' column missing. Adding None.") # Too noisy
-                             comments_df['post_text'] = None # or pd.NA or ''
-
-                        # --- END MODIFICATION ---
-
-                        newly_scraped_comments_list.append(comments_df)
-
-                except Exception as exc:
-                     pass 
-
-            # Ensure progress bar completes
-            progress_bar.close()
-
-        # --- 5. Combine newly scraped comments ---
+            future_to_url = dict(zip(futures, post_urls_to_scrape_comments))
+
+        # Use tqdm with as_completed for progress tracking
+        progress_bar = tqdm(concurrent.futures.as_completed(future_to_url),
+                            total=len(future_to_url),
+                            desc=f"Scraping comments for {facebook_handle}'s posts",
+                            unit="post",
+                            # Leave the progress bar after completion
+                            leave=True)
+
+        for future in progress_bar:
+            post_url = future_to_url[future]
+            try:
+                comments_df = future.result() # This retrieves the return value (DataFrame) or raises exception
+                fetched_comment_counts[post_url] = len(comments_df)
+                if not comments_df.empty:
+                    # The post's text and other attributes are attached to all comments at once in step 5
+                    comments_df['post_url'] = post_url
+                    newly_scraped_comments_list.append(comments_df)
+
+            except Exception as exc:
+                # Handle exceptions raised by individual comment runs
+                print(f"\nComment run for post {post_url} generated an exception during comment scraping: {exc}")
+                # Continue processing other runs
+
+        # Ensure progress bar completes
+        progress_bar.close()
+
+        # --- 5. Combine newly scraped comments and attach their posts' attributes ---
         newly_scraped_comments_df = pd.DataFrame() # Initialize as empty DataFrame
         if newly_scraped_comments_list:
-             newly_scraped_comments_df = pd.concat(newly_scraped_comments_list, ignore_index=True)
+             # One merge on post_url; 'post_text' is always present, empty where a post has no text
+             newly_scraped_comments_df = enrich_comments(newly_scraped_comments_list, posts_df_this_run, POST_ATTRIBUTES, author=facebook_handle)
              print(f"Successfully scraped comments for {len(newly_scraped_comments_list)} posts in this run.")
              print(f"Collected {len(newly_scraped_comments_df)} new comments in this run.")
-
-             # Ensure 'post_text' column exists even if no text was found for any post
-             if 'post_text' not in newly_scraped_comments_df.columns:
-                 newly_scraped_comments_df['post_text'] = None
+             newly_scraped_comments_df['Author Handle'] = facebook_handle # Kept for files written before post_author
 
 
         else:
             print("No new comments were successfully scraped for the selected posts.")
 
 
-        if not existing_comments_df.empty:
-            # Combine existing and new comments
-            # Ensure consistent columns before concat, adding 'post_text' to existing if missing (less likely)
-            if 'post_text' not in existing_comments_df.columns:
-                 print("Warning: 'post_text' column missing in existing comments data. Adding it with None.")
-                 existing_comments_df['post_text'] = None
-
-            # Harmonize columns before concat - this is important if new and old scraped data had different columns
-            all_columns = list(set(existing_comments_df.columns) | set(newly_scraped_comments_df.columns))
-            existing_comments_df = existing_comments_df.reindex(columns=all_columns)
-            newly_scraped_comments_df = newly_scraped_comments_df.reindex(columns=all_columns)
-
-
-            combined_comments_df = pd.concat([existing_comments_df, newly_scraped_comments_df], ignore_index=True)
-            print(f"Combined new comments with {len(existing_comments_df)} existing comments.")
-
-            # Drop duplicates in the final combined set if possible (based on a unique comment ID if the actor provides one)
-            # Assuming 'id' is a unique comment ID from the actor
-            if 'id' in combined_comments_df.columns:
-                 initial_count = len(combined_comments_df)
-                 subset_cols = ['id']
-
-                 combined_comments_df.drop_duplicates(subset=subset_cols, inplace=True)
-                 if len(combined_comments_df) < initial_count:
-                      print(f"Removed {initial_count - len(combined_comments_df)} duplicate comments based on {subset_cols} in the combined dataset.")
-            else:
-                 print("Warning: 'id' column not found in comments for robust duplicate checking. Only avoiding re-scraping posts.")
-
-        else:
-            # No existing comments, the combined dataframe is just the new ones
-            combined_comments_df = newly_scraped_comments_df
-            print("No existing comments found. Saving only newly scraped comments.")
-
-
-        # Save the combined comments data to the single cumulative file
-        comments_dir = path / "comments"
-        comments_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists
-        output_filename = comments_dir / f"{facebook_handle}_facebook_comments_combined.xlsx"
-
-        print(f"Saving combined comments data ({len(combined_comments_df)} total unique comments) to {output_filename}...")
+        # --- 6. Append this run's comments as a new partition ---
+        # Only the delta is written, existing partitions are never rewritten
         try:
-            combined_comments_df.to_excel(output_filename, index=False)
-            print("Combined comments data saved successfully.")
-            final_comments_df = combined_comments_df
+            if not newly_scraped_comments_df.empty:
+                print(f"Appending {len(newly_scraped_comments_df)} new comments to {comment_store.root}...")
+                part_path = comment_store.append(newly_scraped_comments_df)
+                print(f"New comments saved successfully to {part_path}.")
+            # Only record posts in the index once their comments are safely on disk
+            post_index.mark_scraped("facebook", facebook_handle, fetched_comment_counts, reported_counts=reported_counts)
         except Exception as e:
-            print(f"Error saving combined comments data to {output_filename}: {e}")
-            # If saving fails, return the combined df before saving
-            final_comments_df = combined_comments_df
-
+            print(f"Error saving new comments to {comment_store.root}: {e}")
 
     else: # This else corresponds to `if post_urls_to_scrape_comments:` being empty
         print("No posts required comment scraping based on previous runs.")
-        # If no posts needed scraping, the final comments dataframe is just the existing one
-        final_comments_df = existing_comments_df
-        print(f"Loaded existing comments dataframe has {len(final_comments_df)} rows.")
 
-    return posts_df_this_run, final_comments_df
+    if streamed is not None:
+        streamed.wait_saved() # The posts file is on disk before this handle counts as done
+
+    # Only this run's comments are returned. Earlier ones stay in the comment store, where
+    # readers merge the partitions lazily (load_existing_comments), so a run never re-reads the history
+    print(f"Returning {len(newly_scraped_comments_df)} new comments for {facebook_handle}.")
+    return posts_df_this_run, newly_scraped_comments_df
@@ -0,0 +1,145 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --- Flattening Nested Items ---
+# Actor items carry nested objects (tweet authors, page owners) and lists (media, mentions,
+# hashtags). Built with pd.DataFrame(items), each of them is a Python object per cell. Pages
+# are converted to Arrow a column at a time instead: nested objects become one typed column
+# per leaf field, named "parent.child", and lists become typed Arrow list columns. Lists can
+# then be split into child tables (one row per element) without touching Python objects.
+# A field whose values do not share one shape across the page stays a column of Python objects.
+
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError)
+
+
+def _is_list(arrow_type: pa.DataType) -> bool:
+    return pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+
+
+def _list_dtype(arrow_type: pa.DataType):
+    return pd.ArrowDtype(arrow_type) if _is_list(arrow_type) else None
+
+
+def _flatten(name: str, array: pa.Array) -> list[tuple[str, pa.Array]]:
+    """Splits struct columns into one column per leaf field (a null parent makes its fields null)."""
+    if not pa.types.is_struct(array.type):
+        return [(name, array)]
+    columns = []
+    for field, child in zip(array.type, array.flatten()):
+        columns.extend(_flatten(f"{name}.{field.name}" if name else field.name, child))
+    return columns
+
+
+def _to_frame(arrays: dict[str, pa.Array], objects: dict[str, list | pd.Series], order: list[str], length: int, types_mapper=_list_dtype) -> pd.DataFrame:
+    df = pa.table(arrays).to_pandas(types_mapper=types_mapper) if arrays else pd.DataFrame(index=pd.RangeIndex(length))
+    for name, values in objects.items():
+        df[name] = values if isinstance(values, pd.Series) else pd.Series(values, index=df.index, dtype=object)
+    return df[order]
+
+
+def flatten_items(items: list[dict]) -> pd.DataFrame:
+    """One page of actor items as a DataFrame with nested objects flattened and lists typed."""
+    if not items:
+        return pd.DataFrame()
+    keys = dict.fromkeys(key for item in items for key in item) # Items of one page can have different fields
+    arrays, objects, order = {}, {}, []
+    for key in keys:
+        values = [item.get(key) for item in items]
+        try:
+            array = pa.array(values, from_pandas=True)
+        except _ARROW_ERRORS:
+            objects[key] = values # Mixed shapes, e.g. a field that is sometimes a string and sometimes an object
+            order.append(key)
+            continue
+        for name, column in _flatten(key, array):
+            arrays[name] = column
+            order.append(name)
+    return _to_frame(arrays, objects, order, len(items))
+
+
+def flatten_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """flatten_items for a frame whose nested values are still Python objects (e.g. items read back from the result cache)."""
+    arrays, objects, order = {}, {}, []
+    for col in df.columns:
+        series = df[col]
+        array = None
+        if series.dtype == object:
+            try:
+                array = pa.array(series, from_pandas=True)
+            except _ARROW_ERRORS:
+                pass
+        if array is None or not (pa.types.is_struct(array.type) or _is_list(array.type)):
+            objects[col] = series.reset_index(drop=True) # Left as it was
+            order.append(col)
+            continue
+        for name, column in _flatten(col, array):
+            arrays[name] = column
+            order.append(name)
+    if not arrays:
+        return df
+    return _to_frame(arrays, objects, order, len(df)).set_axis(df.index)
+
+
+def _list_array(series: pd.Series) -> pa.Array | None:
+    """The column as an Arrow list array, or None if it does not hold lists."""
+    try:
+        array = pa.array(series, from_pandas=True)
+    except _ARROW_ERRORS:
+        return None
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    return array if _is_list(array.type) else None
+
+
+def child_table(df: pd.DataFrame, column: str, key: str | None = None, key_name: str | None = None) -> pd.DataFrame:
+    """
+    Splits a list column into a child table with one row per list element.
+
+    Args:
+        df: The parent frame.
+        column: The list column.
+        key: Parent column copied onto each element's row (the parent's row position if None).
+        key_name: Name of the copied key column (defaults to `key`, or "row").
+
+    Returns:
+        Columns: the parent key, 'position' (the element's index in its list), then the
+        element: one column per field for lists of objects, 'value' otherwise. Empty if the
+        column is missing or does not hold lists.
+    """
+    array = _list_array(df[column]) if column in df.columns else None
+    if array is None:
+        return pd.DataFrame()
+
+    parents = pc.list_parent_indices(array).to_numpy()
+    values = pc.list_flatten(array)
+    offsets = array.offsets.to_numpy()
+    positions = np.arange(len(values)) + offsets[0] - offsets[parents]
+
+    element_columns = _flatten("" if pa.types.is_struct(values.type) else "value", values)
+    frame = _to_frame(
+        dict(element_columns), {}, [name for name, _ in element_columns], len(values),
+        types_mapper=lambda t: pd.StringDtype("pyarrow") if pa.types.is_string(t) else _list_dtype(t),
+    )
+    parent_keys = df[key].to_numpy()[parents] if key is not None else parents
+    frame.insert(0, "position", positions)
+    frame.insert(0, key_name or key or "row", parent_keys)
+    return frame
+
+
+def nested_to_text(series: pd.Series) -> pd.Series:
+    """
+    Typed list columns as text, for formats without lists (Excel): lists of scalars are
+    joined with ", " in one vectorized pass, lists of objects become JSON.
+    """
+    array = _list_array(series)
+    if array is None:
+        return series
+    try:
+        joined = pc.binary_join(array.cast(pa.list_(pa.string())), ", ")
+        return pd.Series(joined.to_numpy(zero_copy_only=False), index=series.index, dtype=object)
+    except _ARROW_ERRORS:
+        return pd.Series([None if v is None else json.dumps(v, default=str) for v in array.to_pylist()], index=series.index, dtype=object)
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+import pandas as pd
+from tqdm import tqdm
+
+from .flatten import flatten_items
+from .resilience import DatasetReadError, async_retrying, retrying
+from .result_cache import current_cache
+
+# --- Streaming Dataset Ingestion ---
+# Datasets are paged through with `list_items` in fixed-size chunks. Each page becomes a
+# DataFrame straight away and its item dicts are dropped, so at most one chunk of raw
+# items is alive at a time instead of the whole dataset as a list of dicts.
+# Nested fields are flattened a page at a time on the way (see flatten.py).
+# A page that fails is retried from its own offset; if it keeps failing, the read raises
+# DatasetReadError instead of returning the pages read so far as if they were the dataset.
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class FieldProjection:
+    """
+    Item fields to download from a dataset, sent as the API's `fields` / `omit` parameters.
+    `fields` keeps only the listed top-level fields; `omit` drops the listed ones.
+    """
+
+    fields: tuple[str, ...] = ()
+    omit: tuple[str, ...] = ()
+
+    def params(self) -> dict:
+        params = {}
+        if self.fields:
+            params["fields"] = list(self.fields)
+        if self.omit:
+            params["omit"] = list(self.omit)
+        return params
+
+
+def _projection_params(projection: FieldProjection | None) -> dict:
+    return projection.params() if projection is not None else {}
+
+
+def _read_page(dataset, dataset_id: str, offset: int, limit: int, params: dict):
+    try:
+        for attempt in retrying():
+            with attempt:
+                return dataset.list_items(offset=offset, limit=limit, **params)
+    except Exception as e:
+        raise DatasetReadError(dataset_id, offset, e) from e
+
+
+async def _aread_page(dataset, dataset_id: str, offset: int, limit: int, params: dict):
+    try:
+        async for attempt in async_retrying():
+            with attempt:
+                return await dataset.list_items(offset=offset, limit=limit, **params)
+    except Exception as e:
+        raise DatasetReadError(dataset_id, offset, e) from e
+
+
+def iter_dataset_frames(client, dataset_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, desc: str | None = None, unit: str = "item", projection: FieldProjection | None = None, offset: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Yields a dataset as DataFrames of at most `chunk_size` rows, starting at `offset`.
+    Shows a tqdm bar when `desc` is given (the total comes from the first page).
+    With a `projection`, only the selected fields are downloaded; None downloads full items.
+    Raises DatasetReadError if a page still fails after retries.
+    """
+    dataset = client.dataset(dataset_id)
+    params = _projection_params(projection)
+    progress_bar = None
+    try:
+        while True:
+            page = _read_page(dataset, dataset_id, offset, chunk_size, params)
+            if desc is not None and progress_bar is None:
+                progress_bar = tqdm(total=page.total, initial=offset, desc=desc, unit=unit)
+            if not page.items:
+                break
+            offset += len(page.items)
+            if progress_bar is not None:
+                progress_bar.update(len(page.items))
+            yield flatten_items(page.items)
+            if page.total is not None and offset >= page.total:
+                break
+    finally:
+        if progress_bar is not None:
+            progress_bar.close()
+
+
+def iter_cached_dataset_frames(client, dataset_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, desc: str | None = None, unit: str = "item", projection: FieldProjection | None = None, offset: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    iter_dataset_frames through the current result cache: stored items come back as one frame,
+    and a dataset read in full is stored. A read that raises part-way is not stored.
+    """
+    cache = current_cache() if offset == 0 else None
+    fields = _projection_params(projection) or None
+    if cache is not None:
+        cached_df = cache.get_items(dataset_id, fields)
+        if cached_df is not None:
+            print(f"Loaded {len(cached_df)} items of dataset {dataset_id} from the result cache.")
+            yield cached_df
+            return
+
+    frames = []
+    for df in iter_dataset_frames(client, dataset_id, chunk_size, desc=desc, unit=unit, projection=projection, offset=offset):
+        if cache is not None:
+            frames.append(df.copy(deep=False)) # Columns the caller adds to its frame stay out of the cache
+        yield df
+    if cache is not None:
+        cache.put_items(dataset_id, fields, concat_frames(frames))
+
+
+def read_dataset_frame(client, dataset_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, desc: str | None = None, unit: str = "item", projection: FieldProjection | None = None, offset: int = 0) -> pd.DataFrame:
+    """
+    Reads a dataset into one DataFrame, chunk by chunk.
+    Raises DatasetReadError if a page still fails after retries, so a partial read is never
+    mistaken for the whole dataset. Full reads go through the current result cache.
+    """
+    return concat_frames(list(iter_cached_dataset_frames(client, dataset_id, chunk_size, desc=desc, unit=unit, projection=projection, offset=offset)))
+
+
+async def aiter_dataset_frames(async_client, dataset_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE, projection: FieldProjection | None = None, offset: int = 0) -> AsyncIterator[pd.DataFrame]:
+    """iter_dataset_frames for ApifyClientAsync."""
+    dataset = async_client.dataset(dataset_id)
+    params = _projection_params(projection)
+    while True:
+        page = await _aread_page(dataset, dataset_id, offset, chunk_size, params)
+        if not page.items:
+            break
+        offset += len(page.items)
+        yield flatten_items(page.items)
+        if page.total is not None and offset >= page.total:
+            break
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates frames with a fresh index, skipping empty ones (an empty frame if all are)."""
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
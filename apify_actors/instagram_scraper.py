@@ -5,23 +5,40 @@ from pathlib import Path
 import concurrent.futures
 import os
 import time # Added for potential delays
+from .storage import StorageBackend, get_storage, read_frame
+from .catalog import DataCatalog
+from .comment_store import PartitionedCommentStore
+from .post_index import ScrapedPostIndex, reported_comment_counts
+from .batching import chunked, split_by_parent, profile_key, drop_unresolved, rerun_per_post
+from .engine import AsyncActorEngine, get_engine, run_actor
+from .enrichment import PostAttributes, enrich_comments
+from .ingest import FieldProjection, read_dataset_frame
+from .pipeline import pipeline_posts_to_comments
+from .resilience import DatasetReadError
 
 # --- Apify Actor ID (Keep as is) ---
 APIFY_ACTOR_ID = "shu8hvrXbJbY3Eb9W"
+# Post fields that identify the profile a post belongs to, tried in order when splitting batched runs
+POST_SOURCE_COLS = ["ownerUsername", "inputUrl"]
+# Comment fields that identify the post a comment belongs to, tried in order when splitting batched runs
+COMMENT_PARENT_COLS = ["postUrl", "parentPostShortcode", "inputUrl"]
+# Post columns copied onto their comments as post_text, post_date, post_likes, ...
+POST_ATTRIBUTES = PostAttributes(text="caption", date="timestamp", likes="likesCount", comments="commentsCount")
 
 # --- Helper Functions ---
 
 # Helper function to load existing posts data (for consistency, though not strictly needed for skipping comments)
-def load_existing_instagram_posts(path: Path, username: str) -> pd.DataFrame:
-    """Loads existing Instagram posts data from saved Excel files for a user."""
+def load_existing_instagram_posts(path: Path, username: str, catalog: DataCatalog | None = None) -> pd.DataFrame:
+    """Loads existing Instagram posts data from saved post files (Parquet or Excel) for a user."""
     posts_dir = path / "posts"
     if not posts_dir.exists():
         print("Instagram posts directory not found.")
         return pd.DataFrame()
 
-    # Find all Excel files for this username in the posts directory
-    pattern = f"*{username}*.xlsx" # Use a broader pattern and then filter/check later
-    existing_files = list(posts_dir.glob(pattern))
+    # Ask the catalog for the exact files of this handle (a substring glob would also match e.g. 'bobby' for 'bob')
+    catalog = catalog or DataCatalog.for_path(path)
+    catalog.adopt_untracked(posts_dir, "instagram", "posts") # Files written before the catalog existed
+    existing_files = catalog.files("instagram", username, "posts")
 
     if not existing_files:
         print(f"No existing Instagram posts files found for user: {username}.")
@@ -32,7 +49,7 @@ def load_existing_instagram_posts(path: Path, username: str) -> pd.DataFrame:
 
     for f in existing_files:
         try:
-            df = pd.read_excel(f)
+            df = read_frame(f)
             # Need to check for a column that identifies the post uniquely
             # 'shortcode' or 'id' or 'url' are good candidates
             if 'shortcode' in df.columns or 'id' in df.columns or 'url' in df.columns:
@@ -62,36 +79,61 @@ def load_existing_instagram_posts(path: Path, username: str) -> pd.DataFrame:
 
 # Helper function to load existing comments data
 def load_existing_instagram_comments(path: Path, username: str) -> pd.DataFrame:
-    """Loads existing Instagram comments data from the combined Excel file for a user."""
+    """Loads existing Instagram comments for a user by merging the partitions of their comment store."""
     comments_dir = path / "comments"
     if not comments_dir.exists():
         print("Instagram comments directory not found.")
         return pd.DataFrame()
 
-    # We expect a single combined file for comments for this user
-    combined_file_path = comments_dir / f"{username}_instagram_comments_combined.xlsx"
-
-    if not combined_file_path.exists():
-        print(f"No combined Instagram comments file found at {combined_file_path}.")
-        return pd.DataFrame()
-
+    comment_store = PartitionedCommentStore(path, username, "instagram")
     try:
-        df = pd.read_excel(combined_file_path)
-        # Ensure the necessary column exists for tracking which posts comments belong to
-        # 'post_url' (added by scraper) or 'parentPostShortcode' (from actor) are candidates
-        if 'post_url' in df.columns or 'parentPostShortcode' in df.columns:
-             print(f"Loaded {len(df)} existing Instagram comments from {combined_file_path}.")
-             return df
-        else:
-             print(f"Warning: Existing Instagram comments file {combined_file_path} does not contain 'post_url' or 'parentPostShortcode' column. Cannot use effectively for skipping.")
-             return pd.DataFrame()
+        df = comment_store.read()
     except Exception as e:
-        print(f"Warning: Could not load existing Instagram comments file {combined_file_path}: {e}")
+        print(f"Warning: Could not load existing Instagram comments from {comment_store.root}: {e}")
         return pd.DataFrame()
 
+    if df.empty:
+        print(f"No existing Instagram comments found in {comment_store.root}.")
+        return df
+    # Ensure the necessary column exists for tracking which posts comments belong to
+    # 'post_url' (added by scraper) or 'parentPostShortcode' (from actor) are candidates
+    if 'post_url' in df.columns or 'parentPostShortcode' in df.columns:
+         print(f"Loaded {len(df)} existing Instagram comments from {len(comment_store.partitions())} partition(s) in {comment_store.root}.")
+         return df
+    else:
+         print(f"Warning: Existing Instagram comments in {comment_store.root} do not contain 'post_url' or 'parentPostShortcode' column. Cannot use effectively for skipping.")
+         return pd.DataFrame()
+
 # --- Modified ScrapePosts Function ---
-def ScrapePosts(client, url: str, start_time: datetime.datetime, path: Path, max_posts: int = 100) -> pd.DataFrame | None:
+def ScrapePosts(client, url: str, start_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> pd.DataFrame | None:
     """Scrape posts for a specific Instagram URL (user profile, hashtag, etc.) newer than a start time."""
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+    start_time_str = start_time.strftime("%Y-%m-%d")
+
+    run = _run_posts_actor(client, url, start_time, max_posts)
+    if run is None:
+        return None # Critical failure
+
+    # Fetch Actor results from the run's dataset
+    dataset_id = run["defaultDatasetId"]
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing Instagram posts for {url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]}", unit="post", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} Instagram posts from the dataset.")
+
+    if df.empty:
+        print(f"No Instagram posts found for {url} newer than {start_time_str}.")
+        return df # Return empty DataFrame
+
+    return _process_posts(df, url, start_time, path, storage, catalog)
+
+def _run_posts_actor(client, url: str, start_time: datetime.datetime, max_posts: int) -> dict | None:
+    """Runs the posts actor for one Instagram URL. Returns the finished run, or None if the call fails."""
     start_time_str = start_time.strftime("%Y-%m-%d")
 
     print(f"\n--- Starting Instagram post scrape for URL: {url} ---")
@@ -111,38 +153,17 @@ def ScrapePosts(client, url: str, start_time: datetime.datetime, path: Path, max
 
     try:
         print(f"Calling Apify Actor {APIFY_ACTOR_ID} for Instagram posts...")
-        run = client.actor(APIFY_ACTOR_ID).call(run_input=payload)
-        print(f"Actor run started with ID: {run['id']}")
+        run = run_actor(client, APIFY_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
+        return run
 
     except Exception as e:
         print(f"Error calling Apify Actor {APIFY_ACTOR_ID} for {url}. Please check API key/Actor ID/Permissions. Error: {e}")
-        return None # Critical failure
-
-    # Fetch Actor results from the run's dataset
-    data = []
-    dataset_id = run["defaultDatasetId"]
-    print(f"Collecting post data from dataset: {dataset_id}...")
-
-    try:
-        # Attempt to get item count for tqdm total
-        dataset_info = client.dataset(dataset_id).get()
-        total_items = dataset_info.get('itemCount')
-        if total_items is None: total_items = 0
-
-        for item in tqdm(client.dataset(dataset_id).iterate_items(), total=total_items, desc=f"Processing Instagram posts for {url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]}", unit="post"):
-            data.append(item)
-
-    except Exception as e:
-        print(f"Error fetching data from dataset {dataset_id}: {e}")
-        # Return what we got even if fetching fails partially
-        pass
-
-    df = pd.DataFrame(data)
-    print(f"Collected {len(df)} Instagram posts from the dataset.")
+        return None
 
-    if df.empty:
-        print(f"No Instagram posts found for {url} newer than {start_time_str}.")
-        return df # Return empty DataFrame
+def _process_posts(df: pd.DataFrame, url: str, start_time: datetime.datetime, path: Path, storage: StorageBackend, catalog: DataCatalog) -> pd.DataFrame:
+    """Saves/registers the posts scraped for one Instagram URL."""
+    start_time_str = start_time.strftime("%Y-%m-%d")
 
     # Save results to a unique file based on username/url part, start_time, and timestamp
     save_dir = path / "posts"
@@ -154,85 +175,143 @@ def ScrapePosts(client, url: str, start_time: datetime.datetime, path: Path, max
     url_cleaned = url_cleaned.replace("?", "_").replace("&", "_").replace("=", "_")
 
     current_timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filename = save_dir / f"{url_cleaned}_instagram_posts_newerthan_{start_time_str}_{current_timestamp}.xlsx"
+    output_stem = save_dir / f"{url_cleaned}_instagram_posts_newerthan_{start_time_str}_{current_timestamp}"
+    output_filename = storage.path_for(output_stem)
 
     print(f"Saving newly scraped Instagram post data ({len(df)} posts) to {output_filename}...")
     try:
-        df.to_excel(output_filename, index=False)
+        written_path = storage.write(df, output_stem)
+        catalog.register(written_path, "instagram", url_cleaned, "posts", df, date_start=start_time, date_end=None)
         print("Instagram post data saved successfully.")
     except Exception as e:
         print(f"Error saving Instagram post data to {output_filename}: {e}")
 
     return df
 
-# --- Modified ScrapePostComments Function ---
-def ScrapePostComments(client, post_url: str, max_comments: int = 100) -> pd.DataFrame:
-    """Scrape comments for a single Instagram post URL."""
-    # Show which post is being processed (truncated shortcode)
-    post_id_display = post_url.split('/')[-2] if post_url.endswith('/') else post_url.split('/')[-1]
-    if len(post_id_display) > 12: # Shortcode is typically 11 chars, maybe slightly more
-        post_id_display = post_id_display[:6] + "..." + post_id_display[-6:]
+def ScrapeUserPosts(client, username: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> pd.DataFrame | None:
+    """Scrape posts for an Instagram user newer than start_time (the actor has no end date, end_time is ignored)."""
+    return ScrapePosts(client, f"https://www.instagram.com/{username}/", start_time, path, max_posts=max_posts, storage=storage, catalog=catalog, post_fields=post_fields)
 
+def ScrapePostsBatch(client, usernames: list[str], start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> dict[str, pd.DataFrame] | None:
+    """
+    Scrape posts for several Instagram users in one actor run and attribute them back to each user by owner.
+    Returns {username: posts_df} (each saved like ScrapePosts would), or None if the run fails.
+    """
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+    start_time_str = start_time.strftime("%Y-%m-%d")
+    urls = {username: f"https://www.instagram.com/{username}/" for username in usernames}
+
+    print(f"\n--- Starting batched Instagram post scrape for {len(usernames)} users ---")
+    print(f"Fetching posts newer than {start_time_str}")
 
     payload = {
-        "addParentData": False, # Typically False for comments, though depends on actor
-        "directUrls": [ post_url ],
+        "addParentData": False,
+        "directUrls": list(urls.values()),
         "enhanceUserSearchWithFacebookPage": False,
         "isUserReelFeedURL": False,
         "isUserTaggedFeedURL": False,
-        "resultsLimit": max_comments,
-        "resultsType": "comments",
+        "onlyPostsNewerThan": start_time_str,
+        "resultsLimit": max_posts, # Applied per direct URL by the actor
+        "resultsType": "posts",
         "searchLimit": 1,
     }
 
     try:
-        # print(f"Calling Apify Actor {APIFY_ACTOR_ID} for comments on {post_id_display}...") # Too noisy
-        run = client.actor(APIFY_ACTOR_ID).call(run_input=payload)
-        # print(f"Comment actor run started for {post_id_display} with ID: {run['id']}") # Too noisy
-
+        print(f"Calling Apify Actor {APIFY_ACTOR_ID} for Instagram posts...")
+        run = run_actor(client, APIFY_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
     except Exception as e:
-        print(f"\nError calling Apify Actor {APIFY_ACTOR_ID} for post {post_id_display}. Error: {e}")
-        # Return empty DataFrame if actor call fails for this post
-        return pd.DataFrame() # Return empty DF instead of None
+        print(f"Error calling Apify Actor {APIFY_ACTOR_ID} for {len(usernames)} users. Error: {e}")
+        return None
 
-    # Fetch Actor results from the run's dataset
-    data = []
     dataset_id = run["defaultDatasetId"]
-    # print(f"Collecting comment data from dataset: {dataset_id} for post {post_id_display}...") # Too noisy
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing Instagram posts for {len(usernames)} users", unit="post", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} Instagram posts from the dataset.")
+
+    posts_by_user, unattributed_count = split_by_parent(df, usernames, POST_SOURCE_COLS, key_fn=profile_key)
+    if unattributed_count:
+        print(f"Warning: {unattributed_count} posts in dataset {dataset_id} could not be matched to a requested user.")
 
+    for username, user_df in posts_by_user.items():
+        print(f"Attributed {len(user_df)} posts to {username}.")
+        if not user_df.empty:
+            posts_by_user[username] = _process_posts(user_df, urls[username], start_time, path, storage, catalog)
+    return posts_by_user
+
+def _comments_payload(post_urls: list[str], max_comments: int) -> dict:
+    return {
+        "addParentData": False,
+        "directUrls": list(post_urls),
+        "enhanceUserSearchWithFacebookPage": False,
+        "isUserReelFeedURL": False,
+        "isUserTaggedFeedURL": False,
+        "resultsLimit": max_comments, # Applied per direct URL by the actor
+        "resultsType": "comments",
+        "searchLimit": 1,
+    }
+
+def _comments_by_post(df: pd.DataFrame, post_urls: list[str], dataset_id: str) -> dict[str, pd.DataFrame]:
+    """
+    Splits the comments of one run back out per requested post and adds the post_url column.
+    Posts that may own comments which could not be attributed are left out.
+    """
+    if len(post_urls) == 1:
+        comments_by_post, unattributed_count = {post_urls[0]: df}, 0 # Everything in a single-post run belongs to that post
+    else:
+        comments_by_post, unattributed_count = split_by_parent(df, post_urls, COMMENT_PARENT_COLS)
+    if unattributed_count:
+        print(f"\nWarning: {unattributed_count} comments in dataset {dataset_id} could not be matched to a requested post.")
+
+    for post_url, df in comments_by_post.items():
+        if not df.empty:
+            df['post_url'] = post_url
+    return drop_unresolved(comments_by_post, unattributed_count)
+
+async def ScrapePostCommentsBatchAsync(engine: AsyncActorEngine, post_urls: list[str], max_comments: int = 100, comment_fields: FieldProjection | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Scrape comments for several Instagram posts in one actor run on the async engine (without
+    holding a thread while it runs) and split them back out per post. Returns
+    {post_url: comments_df}, or {} if the run fails.
+    """
+    # A run that did not succeed raises too: its partial items would mark these posts as scraped
     try:
-        # Note: TQDM not used here as it's per thread
-        for item in client.dataset(dataset_id).iterate_items():
-            data.append(item)
-        # print(f"Collected {len(data)} comments for post {post_id_display}") # Too noisy
+        run = await engine.call_actor(APIFY_ACTOR_ID, _comments_payload(post_urls, max_comments), require_success=True)
     except Exception as e:
-         print(f"\nError fetching comment data from dataset {dataset_id} for post {post_id_display}: {e}")
-         # Return partial data or empty df if fetching fails
-         pass
-
-    df = pd.DataFrame(data)
-
-    # Add context columns IF data was collected
-    if not df.empty:
-        df['post_url'] = post_url
-        if 'parentPostShortcode' in df.columns:
-             # If parentPostShortcode is available, we can potentially link comments without relying on post_url
-             pass # Already in DF
-        if 'ownerUsername' in df.columns: # This might be the commenter's username, not post author
-             pass # Already in DF
-
-    # print(f"Found {len(df)} comments for post {post_id_display}") # Too noisy
-    return df
+        print(f"\nError calling Apify Actor {APIFY_ACTOR_ID} for {len(post_urls)} post(s). Error: {e}")
+        return {}
 
-# --- Helper function for ThreadPoolExecutor ---
-def process_instagram_post_comments(args):
-    """Helper function to process comments for a single Instagram post in a thread."""
-    client, post_url, max_comments = args
-    # Add other potential args needed by ScrapeComments like post_author_username
-    return ScrapePostComments(client, post_url, max_comments)
+    dataset_id = run["defaultDatasetId"]
+    # Failed pages are retried; a read that still fails raises, so these posts are not marked as scraped
+    df = await engine.read_frame(dataset_id, projection=comment_fields)
+
+    comments_by_post = _comments_by_post(df, post_urls, dataset_id)
+    # Posts left out because some items could not be attributed are re-run on their own
+    if len(post_urls) > 1:
+        comments_by_post = await rerun_per_post(
+            comments_by_post, post_urls,
+            lambda batch: ScrapePostCommentsBatchAsync(engine, batch, max_comments, comment_fields),
+        )
+    return comments_by_post
 
 
 # --- Modified ScrapeUserComentsAndPosts Function ---
+def _comment_urls(df: pd.DataFrame) -> pd.Series:
+    """The post URLs to scrape comments from, built from 'shortcode' when 'url' is missing."""
+    if 'url' in df.columns:
+        urls = df['url']
+    elif 'shortcode' in df.columns:
+        urls = df['shortcode'].apply(lambda sc: f"https://www.instagram.com/p/{sc}/" if pd.notna(sc) else None)
+    else:
+        return pd.Series(dtype=object)
+    return urls.dropna()
+
 def ScrapeUserComentsAndPosts(
     client,
     username: str,
@@ -241,46 +320,92 @@ def ScrapeUserComentsAndPosts(
     path: Path,
     max_posts: int = 100,
     max_comments: int = 100,
-    max_threads: int = 10 # New parameter for controlling concurrency
+    max_threads: int = 10, # Max comment actor runs in flight at once
+    comment_batch_size: int = 1, # Posts packed into each comments actor run
+    storage: StorageBackend | None = None,
+    post_index: ScrapedPostIndex | None = None,
+    catalog: DataCatalog | None = None,
+    post_fields: FieldProjection | None = None, # Dataset fields to download, None downloads full items
+    comment_fields: FieldProjection | None = None,
+    posts_df: pd.DataFrame | None = None, # Posts already fetched by a batched run, skips the posts scrape
+    pipeline: bool = False, # Start comment runs while the posts dataset is still being read
 ) -> tuple[pd.DataFrame, pd.DataFrame] | tuple[None, None]:
     """
     Scrape Instagram posts (newer than start_time) and their comments for a specific user.
-    Uses threading for comment scraping and avoids re-scraping comments for posts already processed.
+    Runs comment scraping on the async actor engine and avoids re-scraping comments for posts already processed.
+    With `pipeline`, comment runs start as soon as their posts are read from the posts dataset.
 
-    Returns a tuple of (posts_df_this_run, combined_comments_df_for_this_user)
+    Returns a tuple of (posts_df_this_run, comments_df_this_run)
     or (None, None) if post scraping fails.
     """
     url = f"https://www.instagram.com/{username}/"
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
 
     print("-" * 60)
     print(f"--- Starting combined Instagram scrape process for user: {username} ---")
     print(f"Fetching posts newer than {start_time.strftime('%Y-%m-%d')}")
-    print(f"Using {max_threads} threads for comment scraping.")
+    print(f"Using up to {max_threads} concurrent actor runs for comment scraping.")
     print("-" * 60)
 
     # --- 1. Load existing data to identify already scraped items ---
     # We primarily need the list of post identifiers for which comments have already been saved
-    existing_comments_df = load_existing_instagram_comments(path, username)
-    # Identify unique identifiers for posts from the existing comments data
-    existing_comment_post_identifiers = set() # Use post_url or parentPostShortcode
-    if not existing_comments_df.empty:
-        if 'post_url' in existing_comments_df.columns:
-             existing_comment_post_identifiers.update(existing_comments_df['post_url'].dropna().unique())
-        # If 'post_url' is not reliable or available, use 'parentPostShortcode'
-        if 'parentPostShortcode' in existing_comments_df.columns:
-             existing_comment_post_identifiers.update(existing_comments_df['parentPostShortcode'].dropna().unique())
-
-    print(f"Identified {len(existing_comment_post_identifiers)} posts with existing comments data.")
+    comment_store = PartitionedCommentStore(path, username, "instagram", storage, catalog)
+    # Which posts already have comments is looked up in the persistent post index
+    post_index = post_index or ScrapedPostIndex.for_path(path)
+    migrated_count = post_index.backfill_from_store("instagram", username, comment_store)
+    if migrated_count:
+        print(f"Seeded post index with {migrated_count} posts from existing comment partitions.")
 
     # --- 2. Scrape Posts newer than start_time ---
-    # ScrapePosts saves its results independently. It returns posts from the specified criteria.
-    scraped_posts_df = ScrapePosts(
-        client=client,
-        url=url,
-        start_time=start_time,
-        path=path,
-        max_posts=max_posts
-    )
+    engine = get_engine(client)
+    future_to_urls = None # Comment runs already started by the pipeline
+    streamed = None
+    if pipeline and posts_df is None:
+        # Posts are read chunk by chunk; comment runs start as soon as a batch of posts without
+        # scraped comments has been read, and the posts file is written in the background
+        run = _run_posts_actor(client, url, start_time, max_posts)
+        if run is None:
+            print("Instagram post scraping failed. Aborting comment scraping.")
+            return None, None
+
+        def select(chunk: pd.DataFrame) -> list[str]:
+            urls = _comment_urls(chunk)
+            return urls[~urls.isin(post_index.scraped_keys("instagram", username, urls, reported_comment_counts(urls, chunk, POST_ATTRIBUTES.comments)))].tolist()
+
+        print(f"Collecting post data from dataset: {run['defaultDatasetId']} (comment runs start while it is read)...")
+        try:
+            streamed = pipeline_posts_to_comments(
+                client,
+                run["defaultDatasetId"],
+                select=select,
+                comment_batch=lambda batch: ScrapePostCommentsBatchAsync(engine, batch, max_comments, comment_fields),
+                save=lambda df: _process_posts(df, url, start_time, path, storage, catalog),
+                batch_size=comment_batch_size,
+                max_threads=max_threads,
+                projection=post_fields,
+                desc=f"Processing Instagram posts for {username}",
+                unit="post",
+            )
+        except DatasetReadError as e:
+            print(f"Error fetching data from dataset {run['defaultDatasetId']}: {e}")
+            return None, None
+        scraped_posts_df = streamed.posts_df
+        future_to_urls = streamed.future_to_batch
+        print(f"Collected {len(scraped_posts_df)} Instagram posts from the dataset.")
+    else:
+        # ScrapePosts saves its results independently. It returns posts from the specified criteria.
+        # Posts fetched beforehand by a batched run (ScrapePostsBatch) are used as-is.
+        scraped_posts_df = posts_df if posts_df is not None else ScrapePosts(
+            client=client,
+            url=url,
+            start_time=start_time,
+            path=path,
+            max_posts=max_posts,
+            storage=storage,
+            catalog=catalog,
+            post_fields=post_fields,
+        )
 
     # Check if post scraping failed or returned no posts
     if scraped_posts_df is None:
@@ -289,9 +414,9 @@ def ScrapeUserComentsAndPosts(
 
     if scraped_posts_df.empty or ("url" not in scraped_posts_df.columns and "shortcode" not in scraped_posts_df.columns):
         print("No posts scraped or required columns (url/shortcode) missing. No comments to scrape.")
-        # Return scraped posts (empty) and existing comments
-        final_comments_df = existing_comments_df # Or load again if preferred
-        return scraped_posts_df, final_comments_df
+        if streamed is not None:
+            streamed.wait_saved()
+        return scraped_posts_df, pd.DataFrame() # No comments scraped in this run
 
     # Ensure necessary columns for comment scraping are present and not null
     posts_df_for_comments = scraped_posts_df.copy() # Work on a copy
@@ -304,19 +429,23 @@ def ScrapeUserComentsAndPosts(
               )
          else:
               print("Error: Neither 'url' nor 'shortcode' found in scraped posts. Cannot scrape comments.")
-              # Return scraped posts (potentially with missing columns) and existing comments
-              final_comments_df = existing_comments_df
-              return scraped_posts_df, final_comments_df
+              return scraped_posts_df, pd.DataFrame() # No comments scraped in this run
 
     # Remove posts without a usable identifier (url or shortcode leading to url)
     posts_df_for_comments = posts_df_for_comments.dropna(subset=['url'])
     if posts_df_for_comments.empty:
          print("No Instagram posts with valid URLs found after scraping. Cannot scrape comments.")
-         final_comments_df = existing_comments_df
-         return scraped_posts_df, final_comments_df
+         if streamed is not None:
+             streamed.wait_saved()
+         return scraped_posts_df, pd.DataFrame() # No comments scraped in this run
 
 
     # --- 3. Determine which posts need comments scraped ---
+    # Posts checked with no comments are looked at again once they report more comments
+    reported_counts = reported_comment_counts(posts_df_for_comments['url'], posts_df_for_comments, POST_ATTRIBUTES.comments)
+    existing_comment_post_identifiers = post_index.scraped_keys("instagram", username, posts_df_for_comments['url'], reported_counts)
+    print(f"Identified {len(existing_comment_post_identifiers)} posts with existing comments data.")
+
     posts_to_scrape_comments_df = posts_df_for_comments[
         (~posts_df_for_comments['url'].isin(existing_comment_post_identifiers))
     ].copy()
@@ -341,55 +470,54 @@ def ScrapeUserComentsAndPosts(
 
 
     newly_scraped_comments_list = []
-
-    # --- 4. Scrape Comments using Threading ---
-    if not posts_to_scrape_comments_df.empty:
-        print(f"Starting Instagram comment scraping using {max_threads} threads...")
-
-        # Prepare arguments list for the thread pool
-        # Columns needed: 'url' (for scraper), maybe 'ownerUsername' if needed by ScrapeComments
-        process_args = [
-            (client, row['url'], max_comments) # Add row['ownerUsername'] if needed
-            for _, row in posts_to_scrape_comments_df.iterrows()
-        ]
-
-        # Use ThreadPoolExecutor for concurrent comment scraping
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-            # Create a dictionary to map future objects to post URLs for easier tracking
-            future_to_url = {
-                executor.submit(process_instagram_post_comments, args): args[1] # args[1] is post_url
-                for args in process_args
-            }
-
-            # Use tqdm with as_completed to show progress
-            progress_bar = tqdm(concurrent.futures.as_completed(future_to_url),
-                                total=len(future_to_url),
-                                desc=f"Scraping comments for {username}",
-                                unit="post",
-                                leave=True)
-
-            for future in progress_bar:
-                post_url = future_to_url[future]
-                try:
-                    comments_df = future.result() # Retrieves the DataFrame or raises exception
+    newly_scraped_comments_df = pd.DataFrame()
+    fetched_comment_counts = {} # post_url -> number of comments fetched in this run
+
+    # --- 4. Scrape Comments on the async engine ---
+    if future_to_urls or not posts_to_scrape_comments_df.empty:
+        print(f"Starting Instagram comment scraping with up to {max_threads} concurrent actor runs, {comment_batch_size} post(s) per run...")
+
+        if future_to_urls is None:
+            # One batch of post URLs per actor run
+            batches = list(chunked(posts_to_scrape_comments_df['url'].tolist(), comment_batch_size))
+
+            # Comment runs are coroutines on the shared engine loop, at most max_threads of them in flight
+            futures = engine.submit_bounded(
+                (ScrapePostCommentsBatchAsync(engine, batch, max_comments, comment_fields) for batch in batches),
+                limit=max_threads,
+            )
+            # Create a dictionary to map future objects to the post URLs of their batch
+            future_to_urls = dict(zip(futures, batches))
+
+        # Use tqdm with as_completed to show progress
+        progress_bar = tqdm(concurrent.futures.as_completed(future_to_urls),
+                            total=len(future_to_urls),
+                            desc=f"Scraping comments for {username}",
+                            unit="run",
+                            leave=True)
+
+        for future in progress_bar:
+            post_urls = future_to_urls[future]
+            try:
+                comments_by_post = future.result() # Retrieves {post_url: DataFrame} or raises exception
+                for post_url, comments_df in comments_by_post.items():
+                    fetched_comment_counts[post_url] = len(comments_df)
                     if not comments_df.empty:
-                        # Metadata like post_url is added inside ScrapeComments
+                        # post_url is added when the run is split per post, the post's attributes in step 5
                         newly_scraped_comments_list.append(comments_df)
 
-                except Exception as exc:
-                    # Handle exceptions raised by ScrapeComments for individual posts
-                    post_id_display = post_url.split('/')[-2] if post_url.endswith('/') else post_url.split('/')[-1]
-                    if len(post_id_display) > 12:
-                        post_id_display = post_id_display[:6] + "..." + post_id_display[-6:]
-                    print(f"\nPost {post_id_display} ({post_url}) generated an exception during comment scraping: {exc}")
-                    # Continue processing other posts
+            except Exception as exc:
+                # Handle exceptions raised by individual comment runs
+                print(f"\nComment run for {len(post_urls)} post(s) ({post_urls[0]}...) generated an exception during comment scraping: {exc}")
+                # Continue processing other runs
 
-            progress_bar.close()
+        progress_bar.close()
 
-        # --- 5. Combine newly scraped comments ---
+        # --- 5. Combine newly scraped comments and attach their posts' attributes ---
         newly_scraped_comments_df = pd.DataFrame() # Initialize as empty
         if newly_scraped_comments_list:
-             newly_scraped_comments_df = pd.concat(newly_scraped_comments_list, ignore_index=True)
+             # posts_df_for_comments has a 'url' for every post, built from 'shortcode' where needed
+             newly_scraped_comments_df = enrich_comments(newly_scraped_comments_list, posts_df_for_comments, POST_ATTRIBUTES, author=username)
              print(f"Successfully scraped comments for {len(newly_scraped_comments_list)} posts in this run.")
              print(f"Collected {len(newly_scraped_comments_df)} new comments in this run.")
              # Add the instagram username to the newly scraped comments
@@ -397,49 +525,25 @@ def ScrapeUserComentsAndPosts(
         else:
             print("No new comments were successfully scraped for the selected posts in this run.")
 
-        # --- 6. Combine with existing comments and save ---
-        # Use the initially loaded existing_comments_df
-        if not existing_comments_df.empty:
-             # Combine existing and new comments
-             combined_comments_df = pd.concat([existing_comments_df, newly_scraped_comments_df], ignore_index=True)
-             print(f"Combined new comments with {len(existing_comments_df)} existing comments.")
-
-             # Drop duplicates in the final combined set
-             # Use a unique identifier for comments. 'id' from the actor is common.
-             id_col = 'id' # Assuming 'id' is the unique comment identifier returned by the actor
-             if id_col in combined_comments_df.columns:
-                  initial_count = len(combined_comments_df)
-                  combined_comments_df.drop_duplicates(subset=[id_col], inplace=True)
-                  if len(combined_comments_df) < initial_count:
-                       print(f"Removed {initial_count - len(combined_comments_df)} duplicate comments based on '{id_col}' in the combined dataset.")
-             else:
-                  print(f"Warning: '{id_col}' column not found in comments for robust duplicate checking.")
-
-        else:
-             # No existing comments, the combined dataframe is just the new ones
-             combined_comments_df = newly_scraped_comments_df
-             print("No existing comments found. Saving only newly scraped comments.")
-
-        # Save the combined comments data to the single cumulative file
-        comments_dir = path / "comments"
-        comments_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists
-        output_filename = comments_dir / f"{username}_instagram_comments_combined.xlsx"
-
-        print(f"Saving combined comments data ({len(combined_comments_df)} total unique comments) to {output_filename}...")
+        # --- 6. Append this run's comments as a new partition ---
+        # Only the delta is written, existing partitions are never rewritten
         try:
-            combined_comments_df.to_excel(output_filename, index=False)
-            print("Combined comments data saved successfully.")
-            final_comments_df = combined_comments_df
+            if not newly_scraped_comments_df.empty:
+                print(f"Appending {len(newly_scraped_comments_df)} new comments to {comment_store.root}...")
+                part_path = comment_store.append(newly_scraped_comments_df)
+                print(f"New comments saved successfully to {part_path}.")
+            # Only record posts in the index once their comments are safely on disk
+            post_index.mark_scraped("instagram", username, fetched_comment_counts, reported_counts=reported_counts)
         except Exception as e:
-            print(f"Error saving combined comments data to {output_filename}: {e}")
-            # If saving fails, return the dataframe we attempted to save
-            final_comments_df = combined_comments_df
+            print(f"Error saving new comments to {comment_store.root}: {e}")
 
     else:
         print("No posts required comment scraping or no comments were found in this run.")
-        # If no new comments were scraped, the final comments dataframe is just the existing one
-        final_comments_df = existing_comments_df
-        print(f"Loaded existing comments dataframe has {len(final_comments_df)} rows.")
 
-    # Return the posts scraped in this run and the total combined comments for this user
-    return scraped_posts_df, final_comments_df
+    if streamed is not None:
+        streamed.wait_saved() # The posts file is on disk before this user counts as done
+
+    # Only this run's comments are returned. Earlier ones stay in the comment store, where
+    # readers merge the partitions lazily (load_existing_instagram_comments), so a run never re-reads the history
+    print(f"Returning {len(newly_scraped_comments_df)} new comments for {username}.")
+    return scraped_posts_df, newly_scraped_comments_df
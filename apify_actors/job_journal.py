@@ -0,0 +1,260 @@
+import contextlib
+import contextvars
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from .catalog import DataCatalog
+from .storage import read_frame
+
+# --- Job Journal ---
+# A scrape is a job made of units. The journal records two kinds of unit as they complete:
+#   handles: a handle whose posts (and comments) were fully scraped, with the keys of the
+#            rows it returned; the rows themselves are already in the platform's post files
+#            and comment store, so nothing is written twice
+#   calls:   every actor run the job started, keyed by (actor ID, run input), with its run and
+#            dataset IDs and last known status (this covers posts for a handle and comments
+#            for a batch of posts alike)
+# When a job is restarted with the same parameters, finished handles are read back from the
+# files the catalog recorded for them since the job started, finished runs are re-used
+# instead of started again, and runs that were still going when the process died are
+# re-attached to and waited for.
+# Only jobs younger than the maximum resume age are resumed. Finished jobs are deleted, and
+# expired ones are pruned whenever a job starts.
+
+JOURNAL_FILENAME = "jobs.sqlite"
+DEFAULT_MAX_RESUME_AGE = 24 * 3600  # Seconds; an older interrupted scrape starts over
+
+_current_job: contextvars.ContextVar["JobContext | None"] = contextvars.ContextVar("_current_job", default=None)
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def _row_keys(df: pd.DataFrame | None, key_col: str) -> list[str] | None:
+    """The keys of a handle's rows, as strings. None if the rows cannot be told apart by `key_col`."""
+    if df is None or df.empty:
+        return []
+    if key_col not in df.columns:
+        return None
+    return sorted(df[key_col].dropna().astype(str).unique().tolist())
+
+
+@dataclass
+class JournaledRun:
+    """One actor run recorded for a job."""
+
+    call_key: str
+    actor_id: str
+    run_id: str
+    dataset_id: str
+    status: str
+    run: dict | None  # The final run object, once finished
+
+
+class JobJournal:
+    """SQLite journal of scrape jobs and their completed units."""
+
+    def __init__(self, db_path: Path, max_resume_age: float = DEFAULT_MAX_RESUME_AGE):
+        """
+        Args:
+            db_path: The journal's SQLite file.
+            max_resume_age: Seconds after which an unfinished job is no longer resumed and is pruned.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_resume_age = max_resume_age
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_fingerprint ON jobs (fingerprint, created_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS handle_keys (
+                    job_id TEXT NOT NULL,
+                    handle TEXT NOT NULL,
+                    post_keys TEXT,
+                    comment_keys TEXT,
+                    completed_at TEXT NOT NULL,
+                    PRIMARY KEY (job_id, handle)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS calls (
+                    job_id TEXT NOT NULL,
+                    call_key TEXT NOT NULL,
+                    actor_id TEXT NOT NULL,
+                    run_id TEXT NOT NULL,
+                    dataset_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    run TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (job_id, call_key)
+                ) WITHOUT ROWID
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _cutoff(self) -> str:
+        return (datetime.datetime.now() - datetime.timedelta(seconds=self.max_resume_age)).isoformat()
+
+    # --- Jobs ---
+
+    def start_job(self, params: dict) -> tuple[str, bool]:
+        """
+        Returns (job_id, resumed): the unfinished job started with the same `params` within the
+        maximum resume age, or a new one. Expired jobs are pruned first.
+        """
+        params_json = json.dumps(params, sort_keys=True, default=str)
+        fingerprint = hashlib.sha256(params_json.encode("utf-8")).hexdigest()
+        self.prune()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE fingerprint = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (fingerprint, self._cutoff()),
+            ).fetchone()
+            if row is not None:
+                return row[0], True
+            job_id = uuid.uuid4().hex
+            conn.execute("INSERT INTO jobs (job_id, fingerprint, params, created_at) VALUES (?, ?, ?, ?)", (job_id, fingerprint, params_json, _now()))
+        return job_id, False
+
+    def finish_job(self, job_id: str):
+        """Deletes a finished job and its units; an identical scrape later starts a new job."""
+        with self._lock, self._connect() as conn:
+            self._delete_jobs(conn, [job_id])
+
+    def prune(self) -> int:
+        """Deletes the jobs (and their units) older than the maximum resume age. Returns how many."""
+        with self._lock, self._connect() as conn:
+            job_ids = [row[0] for row in conn.execute("SELECT job_id FROM jobs WHERE created_at < ?", (self._cutoff(),))]
+            self._delete_jobs(conn, job_ids)
+        return len(job_ids)
+
+    @staticmethod
+    def _delete_jobs(conn: sqlite3.Connection, job_ids: list[str]):
+        rows = [(job_id,) for job_id in job_ids]
+        for table in ("handle_keys", "calls", "jobs"):
+            conn.executemany(f"DELETE FROM {table} WHERE job_id = ?", rows)
+
+    # --- Handle units ---
+
+    def completed_handles(self, job_id: str) -> dict[str, dict]:
+        """Returns {handle: row} for the handles a job has finished; each row carries the job's start time."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT h.*, j.created_at AS job_created_at FROM handle_keys h JOIN jobs j USING (job_id) WHERE h.job_id = ?",
+                (job_id,),
+            ).fetchall()
+        return {row["handle"]: dict(row) for row in rows}
+
+    def complete_handle(self, job_id: str, handle: str, posts_df: pd.DataFrame | None, comments_df: pd.DataFrame | None, post_key_col: str, comment_key_col: str):
+        """Records a finished handle with the keys of the posts and comments it returned."""
+        post_keys, comment_keys = _row_keys(posts_df, post_key_col), _row_keys(comments_df, comment_key_col)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO handle_keys VALUES (?, ?, ?, ?, ?)",
+                (job_id, handle, json.dumps(post_keys) if post_keys is not None else None, json.dumps(comment_keys) if comment_keys is not None else None, _now()),
+            )
+
+    def load_handle(self, row: dict, catalog: DataCatalog, platform: str, post_key_col: str, comment_key_col: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Reads back the (posts_df, comments_df) a completed handle returned: the rows with the
+        recorded keys in the handle's files written since the job started. Without recorded keys
+        (the key column was missing), every row of those files is returned.
+        """
+        frames = []
+        for kind, keys_json, key_col in (("posts", row["post_keys"], post_key_col), ("comments", row["comment_keys"], comment_key_col)):
+            keys = set(json.loads(keys_json)) if keys_json is not None else None
+            if keys is not None and not keys:
+                frames.append(pd.DataFrame())
+                continue
+            parts = []
+            for entry in catalog.entries(platform, row["handle"], kind):
+                path = catalog.root / entry["path"]
+                if entry["created_at"] < row["job_created_at"] or not path.exists():
+                    continue
+                df = read_frame(path)
+                if keys is not None and key_col in df.columns:
+                    df = df[df[key_col].astype(str).isin(keys)]
+                parts.append(df)
+            df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            if keys is not None and key_col in df.columns:
+                df = df.drop_duplicates(subset=[key_col], keep="last", ignore_index=True)
+            frames.append(df)
+        return frames[0], frames[1]
+
+    # --- Actor call units ---
+
+    def get_run(self, job_id: str, call_key: str) -> JournaledRun | None:
+        """Returns the run a job started for this call, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT call_key, actor_id, run_id, dataset_id, status, run FROM calls WHERE job_id = ? AND call_key = ?",
+                (job_id, call_key),
+            ).fetchone()
+        if row is None:
+            return None
+        return JournaledRun(*row[:5], run=json.loads(row[5]) if row[5] else None)
+
+    def record_run(self, job_id: str, call_key: str, actor_id: str, run_id: str, dataset_id: str, status: str, run: dict | None = None):
+        """Records a started run, or its final state once `run` is given."""
+        row = (job_id, call_key, actor_id, run_id, dataset_id, status, json.dumps(run, default=str) if run else None, _now())
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+
+@dataclass
+class JobContext:
+    """The job the current scrape belongs to."""
+
+    journal: JobJournal
+    job_id: str
+
+
+def current_job() -> JobContext | None:
+    """Returns the job of the running scrape, if it is journaled."""
+    return _current_job.get()
+
+
+@contextlib.contextmanager
+def job_context(job: JobContext | None):
+    """Makes `job` the current job for actor calls made inside the block (on this thread)."""
+    token = _current_job.set(job)
+    try:
+        yield job
+    finally:
+        _current_job.reset(token)
+
+
+def _set_current_job(job: JobContext | None):
+    # For tasks on the engine loop, which do not inherit the submitting thread's context
+    _current_job.set(job)
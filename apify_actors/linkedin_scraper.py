@@ -2,62 +2,51 @@ import pandas as pd
 import datetime
 import concurrent.futures
 import os
-import re
 from tqdm import tqdm
 from pathlib import Path
 import time
+from .storage import StorageBackend, get_storage, read_frame
+from .catalog import DataCatalog
+from .comment_store import PartitionedCommentStore
+from .post_index import ScrapedPostIndex, reported_comment_counts
+from .batching import chunked, split_by_parent, profile_key, drop_unresolved, rerun_per_post
+from .engine import AsyncActorEngine, get_engine, run_actor
+from .enrichment import PostAttributes, enrich_comments
+from .ingest import FieldProjection, read_dataset_frame
+from .pipeline import pipeline_posts_to_comments
+from .resilience import DatasetReadError
+from .timestamps import parse_timestamp, parse_timestamps
 
 # --- Apify Actor IDs (Keep as is) ---
 # Assuming these are correct for the linkedin actors you are using
 POSTS_ACTOR_ID = "Wpp1BZ6yGWjySadk3"  # linkedin Profile Scraper (or similar for user posts)
 COMMENTS_ACTOR_ID = "2XnpwxfhSW1fAWElp" # linkedin Conversation Scraper (or similar for comments)
+# Post fields that identify the profile a post was scraped from, tried in order when splitting batched runs
+POST_SOURCE_COLS = ["inputUrl", "input_url", "authorProfileUrl", "author_profile_url"]
+# Comment fields that identify the post a comment belongs to, tried in order when splitting batched runs
+COMMENT_PARENT_COLS = ["post_input", "postUrl", "post_url"]
+# Post columns copied onto their comments as post_text, post_date, post_likes, ...
+POST_ATTRIBUTES = PostAttributes(text="text", date="parsed_date", likes="numLikes", comments="numComments", shares="numShares")
 
 
 # --- Helper Functions ---
 
 def parse_linkedin_date(date_str):
-    """Parse linkedin date format to datetime object"""
-    if not isinstance(date_str, str):
-         # Handle non-string inputs gracefully
-         return None
-    try:
-        return datetime.datetime.strptime(date_str, '%a %b %d %H:%M:%S %z %Y')
-    except ValueError:
-        # Fallback regex for slight variations or if %z parsing fails
-        pattern = r'(\w{3}) (\w{3}) (\d{1,2}) (\d{2}):(\d{2}):(\d{2}) \+?\d{4} (\d{4})' # Added +?
-        match = re.match(pattern, date_str)
-
-        if match:
-             month_map = {
-                 'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
-                 'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
-             }
-             try:
-                 _, month_name, day, hour, minute, second, year = match.groups()
-                 month = month_map.get(month_name)
-                 if month is not None:
-                     return datetime.datetime(
-                         int(year), month, int(day),
-                         int(hour), int(minute), int(second)
-                     )
-             except (ValueError, TypeError):
-                 pass # Regex match didn't yield valid parts
-
-
-        print(f"Unable to parse date: {date_str}")
-        return None
+    """Parse linkedin date format to a tz-aware UTC timestamp (None if it cannot be parsed). Use parse_timestamps for columns."""
+    return parse_timestamp(date_str)
 
 # Helper function to load existing posts data
-def load_existing_linkedin_posts(path: Path, username: str) -> pd.DataFrame:
-    """Loads existing linkedin posts data from saved Excel files for a user."""
+def load_existing_linkedin_posts(path: Path, username: str, catalog: DataCatalog | None = None) -> pd.DataFrame:
+    """Loads existing linkedin posts data from saved post files (Parquet or Excel) for a user."""
     posts_dir = path / "posts"
     if not posts_dir.exists():
         print("linkedin posts directory not found.")
         return pd.DataFrame()
 
-    # Find all Excel files for this username in the posts directory
-    pattern = f"*{username}*posts.xlsx"
-    existing_files = list(posts_dir.glob(pattern))
+    # Ask the catalog for the exact files of this handle (a substring glob would also match e.g. 'bobby' for 'bob')
+    catalog = catalog or DataCatalog.for_path(path)
+    catalog.adopt_untracked(posts_dir, "linkedin", "posts") # Files written before the catalog existed
+    existing_files = catalog.files("linkedin", username, "posts")
 
     if not existing_files:
         print(f"No existing linkedin posts files found for user: {username}.")
@@ -68,7 +57,7 @@ def load_existing_linkedin_posts(path: Path, username: str) -> pd.DataFrame:
 
     for f in existing_files:
         try:
-            df = pd.read_excel(f)
+            df = read_frame(f)
             # Need to check for a column that identifies the post uniquely
             # 'url' or 'tweetId' are good candidates
             if 'url' in df.columns:
@@ -98,41 +87,64 @@ def load_existing_linkedin_posts(path: Path, username: str) -> pd.DataFrame:
 
 # Helper function to load existing comments data
 def load_existing_linkedin_comments(path: Path, username: str) -> pd.DataFrame:
-    """Loads existing linkedin comments (comments) data from the combined Excel file for a user."""
+    """Loads existing linkedin comments (comments) for a user by merging the partitions of their comment store."""
     comments_dir = path / "comments"
     if not comments_dir.exists():
         print("linkedin comments directory not found.")
         return pd.DataFrame()
 
-    # We expect a single combined file for comments for this user
-    combined_file_path = comments_dir / f"{username}_linkedin_comments_combined.xlsx"
-
-    if not combined_file_path.exists():
-        print(f"No combined linkedin comments file found at {combined_file_path}.")
-        return pd.DataFrame()
-
+    comment_store = PartitionedCommentStore(path, username, "linkedin")
     try:
-        df = pd.read_excel(combined_file_path)
-        # Ensure the necessary column exists for tracking which posts comments belong to
-        # 'post_input' (added by scraper) or 'conversationId' (from actor) are candidates
-        if 'post_input' in df.columns or 'conversationId' in df.columns:
-             print(f"Loaded {len(df)} existing linkedin comments from {combined_file_path}.")
-             return df
-        else:
-             print(f"Warning: Existing linkedin comments file {combined_file_path} does not contain 'post_input' or 'conversationId' column. Cannot use effectively for skipping.")
-             return pd.DataFrame()
+        df = comment_store.read()
     except Exception as e:
-        print(f"Warning: Could not load existing linkedin comments file {combined_file_path}: {e}")
+        print(f"Warning: Could not load existing linkedin comments from {comment_store.root}: {e}")
         return pd.DataFrame()
 
+    if df.empty:
+        print(f"No existing linkedin comments found in {comment_store.root}.")
+        return df
+    # Ensure the necessary column exists for tracking which posts comments belong to
+    # 'post_input' (added by scraper) or 'conversationId' (from actor) are candidates
+    if 'post_input' in df.columns or 'conversationId' in df.columns:
+         print(f"Loaded {len(df)} existing linkedin comments from {len(comment_store.partitions())} partition(s) in {comment_store.root}.")
+         return df
+    else:
+         print(f"Warning: Existing linkedin comments in {comment_store.root} do not contain 'post_input' or 'conversationId' column. Cannot use effectively for skipping.")
+         return pd.DataFrame()
+
 
 # --- Modified ScrapePosts Function ---
-def ScrapePosts(client, username, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100) -> pd.DataFrame | None:
+def ScrapePosts(client, username, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> pd.DataFrame | None:
     """Scrape posts for a specific user within a date range."""
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+    url = _profile_url(username)
+
+    run = _run_posts_actor(client, url, start_time, end_time, max_posts)
+    if run is None:
+        return None
+
+    # Fetch Actor results from the run's dataset
+    dataset_id = run["defaultDatasetId"]
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing tweets for {username}", unit="tweet", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} tweets from the dataset.")
+
+    if df.empty:
+        print("No tweets found within the specified date range by the actor.")
+        return df # Return empty DataFrame instead of None
+
+    return _process_posts(df, username, url, start_time, end_time, path, storage, catalog)
+
+def _run_posts_actor(client, url: str, start_time: datetime.datetime, end_time: datetime.datetime, max_posts: int) -> dict | None:
+    """Runs the posts actor for one profile URL. Returns the finished run, or None if the call fails."""
     start_time_str = start_time.strftime("%Y-%m-%d")
     end_time_str = end_time.strftime("%Y-%m-%d")
-    
-    url = username if "linkedin.com" in username else f"https://www.linkedin.com/in/{username}"
 
     print(f"\n--- Starting linkedin post scrape for url: {url} ---")
     print(f"Fetching posts between {start_time_str} and {end_time_str}")
@@ -148,47 +160,39 @@ def ScrapePosts(client, username, start_time: datetime.datetime, end_time: datet
 
     try:
         print(f"Calling Apify Actor {POSTS_ACTOR_ID} for linkedin posts...")
-        run = client.actor(POSTS_ACTOR_ID).call(run_input=payload)
-        print(f"Actor run started with ID: {run['id']}")
+        run = run_actor(client, POSTS_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
+        return run
 
     except Exception as e:
         print(f"Error calling Apify Actor {POSTS_ACTOR_ID} for {url}. Please check API key/Actor ID/Permissions. Error: {e}")
         return None
 
-    # Fetch Actor results from the run's dataset
-    data = []
-    dataset_id = run["defaultDatasetId"]
-    print(f"Collecting post data from dataset: {dataset_id}...")
-
-    try:
-        # Attempt to get item count for tqdm total
-        dataset_info = client.dataset(dataset_id).get()
-        total_items = dataset_info.get('itemCount')
-        if total_items is None: total_items = 0
-
-        for item in tqdm(client.dataset(dataset_id).iterate_items(), total=total_items, desc=f"Processing tweets for {username}", unit="tweet"):
-            data.append(item)
-
-    except Exception as e:
-        print(f"Error fetching data from dataset {dataset_id}: {e}")
-        # Even if fetching fails partially, return what we got
-        pass
-
-    df = pd.DataFrame(data)
-    print(f"Collected {len(df)} tweets from the dataset.")
-
-    if df.empty:
-        print("No tweets found within the specified date range by the actor.")
-        return df # Return empty DataFrame instead of None
+def _profile_url(username: str) -> str:
+    return username if "linkedin.com" in username else f"https://www.linkedin.com/in/{username}"
 
-    # Parse timestamp dates and add 'parsed_date' column
+def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the 'parsed_date' column and drops posts whose date could not be parsed."""
+    # Parse timestamp dates (whole column at once, tz-aware UTC) and add 'parsed_date' column
     if 'timestamp' in df.columns:
-        df['parsed_date'] = df['timestamp'].apply(parse_linkedin_date)
+        df['parsed_date'], report = parse_timestamps(df['timestamp'])
+        if report.failed or report.missing:
+            print(f"Warning: {report.describe('timestamp')}.")
         df = df.dropna(subset=['parsed_date']) # Drop rows where date couldn't be parsed
-        print(f"After date parsing: {len(df)} valid tweets.")
+        print(f"After date parsing: {len(df)} valid posts.")
     else:
-        print("Warning: 'timestamp' column not found in tweet data.")
+        print("Warning: 'timestamp' column not found in post data.")
         df['parsed_date'] = None # Add the column even if no data
+    return df
+
+def _process_posts(df: pd.DataFrame, username: str, url: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, storage: StorageBackend, catalog: DataCatalog) -> pd.DataFrame:
+    """Parses post dates and saves/registers the posts of one profile."""
+    return _save_posts(_parse_dates(df), username, url, start_time, end_time, path, storage, catalog)
+
+def _save_posts(df: pd.DataFrame, username: str, url: str, start_time: datetime.datetime, end_time: datetime.datetime, path: Path, storage: StorageBackend, catalog: DataCatalog) -> pd.DataFrame:
+    """Saves/registers the (date-parsed) posts of one profile."""
+    start_time_str = start_time.strftime("%Y-%m-%d")
+    end_time_str = end_time.strftime("%Y-%m-%d")
 
     # Save results to a unique file based on username, date range, and timestamp
     save_dir = path / "posts"
@@ -198,67 +202,126 @@ def ScrapePosts(client, username, start_time: datetime.datetime, end_time: datet
     username = url.split("/")[-1] if "linkedin.com" in url else username
     username_cleaned = username.replace("/", "_").replace("?", "_").replace("&", "_")
     current_timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filename = save_dir / f"{username_cleaned}_linkedin_posts_{start_time_str}_to_{end_time_str}_{current_timestamp}.xlsx"
+    output_stem = save_dir / f"{username_cleaned}_linkedin_posts_{start_time_str}_to_{end_time_str}_{current_timestamp}"
+    output_filename = storage.path_for(output_stem)
 
     print(f"Saving newly scraped tweet data ({len(df)} tweets) to {output_filename}...")
     try:
-        df.to_excel(output_filename, index=False)
+        written_path = storage.write(df, output_stem)
+        catalog.register(written_path, "linkedin", username, "posts", df, date_start=start_time, date_end=end_time)
         print("Tweet data saved successfully.")
     except Exception as e:
         print(f"Error saving tweet data to {output_filename}: {e}")
 
     return df
 
-# --- Modified ScrapeComments Function (minor changes) ---
-def ScrapeComments(client, post_url, post_text, max_comments: int = 100) -> pd.DataFrame:
-    """Scrape comments (comments) for a specific post URL."""
-     # Show which post is being processed (truncated)
-    post_url_display = post_url.split("/")[-1] if "/" in post_url else post_url
-    if len(post_url_display) > 20: # Shorter display for linkedin tweet IDs
-        post_url_display = post_url_display[:10] + "..." + post_url_display[-10:]
+def ScrapePostsBatch(client, usernames: list[str], start_time: datetime.datetime, end_time: datetime.datetime, path: Path, max_posts: int = 100, storage: StorageBackend | None = None, catalog: DataCatalog | None = None, post_fields: FieldProjection | None = None) -> dict[str, pd.DataFrame] | None:
+    """
+    Scrape posts for several profiles in one actor run and attribute them back to each profile by source URL.
+    Returns {username: posts_df} (each saved like ScrapePosts would), or None if the run fails.
+    """
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+    urls = {username: _profile_url(username) for username in usernames}
+
+    print(f"\n--- Starting batched linkedin post scrape for {len(usernames)} profiles ---")
+    print(f"Fetching posts between {start_time.strftime('%Y-%m-%d')} and {end_time.strftime('%Y-%m-%d')}")
 
     payload = {
-        "postIds": [
-            post_url
-        ],
-        "page_number": 1,
-        "sortOrder": "most recent",
-        "limit": 100
+        "deepScrape": True,
+        "limitPerSource": max_posts,
+        "rawData": False,
+        "urls": list(urls.values())
     }
 
     try:
-        run = client.actor(COMMENTS_ACTOR_ID).call(run_input=payload)
-
+        print(f"Calling Apify Actor {POSTS_ACTOR_ID} for linkedin posts...")
+        run = run_actor(client, POSTS_ACTOR_ID, payload)
+        print(f"Actor run {run['id']} finished with status {run.get('status')}.")
     except Exception as e:
-        print(f"\nError calling Apify Actor {COMMENTS_ACTOR_ID} for post {post_url_display}. Error: {e}")
-        return pd.DataFrame()
+        print(f"Error calling Apify Actor {POSTS_ACTOR_ID} for {len(usernames)} profiles. Error: {e}")
+        return None
 
-    # Fetch Actor results from the run's dataset
-    data = []
     dataset_id = run["defaultDatasetId"]
+    print(f"Collecting post data from dataset: {dataset_id}...")
+    # Paged through in chunks; a page that still fails after retries fails the whole read
+    try:
+        df = read_dataset_frame(client, dataset_id, desc=f"Processing posts for {len(usernames)} profiles", unit="post", projection=post_fields)
+    except DatasetReadError as e:
+        print(f"Error fetching data from dataset {dataset_id}: {e}")
+        return None
+    print(f"Collected {len(df)} posts from the dataset.")
+
+    posts_by_user, unattributed_count = split_by_parent(df, usernames, POST_SOURCE_COLS, key_fn=profile_key)
+    if unattributed_count:
+        print(f"Warning: {unattributed_count} posts in dataset {dataset_id} could not be matched to a requested profile.")
+
+    for username, user_df in posts_by_user.items():
+        print(f"Attributed {len(user_df)} posts to {username}.")
+        if not user_df.empty:
+            posts_by_user[username] = _process_posts(user_df, username, urls[username], start_time, end_time, path, storage, catalog)
+    return posts_by_user
+
+def _comments_payload(post_urls: list[str], max_comments: int) -> dict:
+    return {
+        "postIds": post_urls,
+        "page_number": 1,
+        "sortOrder": "most recent",
+        "limit": max_comments # Applied per post by the actor
+    }
+
+def _comments_by_post(df: pd.DataFrame, post_urls: list[str], dataset_id: str) -> dict[str, pd.DataFrame]:
+    """
+    Splits the comments of one run back out per requested post and adds the post_url column.
+    Posts that may own comments which could not be attributed are left out.
+    """
+    if len(post_urls) == 1:
+        comments_by_post, unattributed_count = {post_urls[0]: df}, 0 # Everything in a single-post run belongs to that post
+    else:
+        comments_by_post, unattributed_count = split_by_parent(df, post_urls, COMMENT_PARENT_COLS)
+    if unattributed_count:
+        print(f"\nWarning: {unattributed_count} comments in dataset {dataset_id} could not be matched to a requested post.")
 
+    for post_url, df in comments_by_post.items():
+        if not df.empty:
+            df['post_url'] = post_url # The URL of the post comments are associated with
+    return drop_unresolved(comments_by_post, unattributed_count)
+
+async def ScrapeCommentsBatchAsync(engine: AsyncActorEngine, post_urls: list[str], max_comments: int = 100, comment_fields: FieldProjection | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Scrape comments for several posts in one actor run on the async engine (without holding a
+    thread while it runs) and split them back out per post. Returns {post_url: comments_df},
+    or {} if the run fails.
+    """
+
+    # A run that did not succeed raises too: its partial items would mark these posts as scraped
     try:
-        # Note: TQDM not used here as it's per thread
-        for item in client.dataset(dataset_id).iterate_items():
-            data.append(item)
-        # print(f"Collected {len(data)} comments for post {post_url_display}") # Too noisy
+        run = await engine.call_actor(COMMENTS_ACTOR_ID, _comments_payload(post_urls, max_comments), require_success=True)
     except Exception as e:
-         print(f"\nError fetching comment data from dataset {dataset_id} for post {post_url_display}: {e}")
-         # Return partial data or empty df if fetching fails
-         pass
+        print(f"\nError calling Apify Actor {COMMENTS_ACTOR_ID} for {len(post_urls)} post(s). Error: {e}")
+        return {}
 
-    df = pd.DataFrame(data)
+    dataset_id = run["defaultDatasetId"]
+    # Failed pages are retried; a read that still fails raises, so these posts are not marked as scraped
+    df = await engine.read_frame(dataset_id, projection=comment_fields)
 
-    # Add context columns IF data was collected
-    if not df.empty:
-        df['post_text'] = post_text # The text of the post comments are associated with
-        df['post_url'] = post_url   # The URL of the post comments are associated with
-    return df
+    comments_by_post = _comments_by_post(df, post_urls, dataset_id)
+    # Posts left out because some items could not be attributed are re-run on their own
+    if len(post_urls) > 1:
+        comments_by_post = await rerun_per_post(
+            comments_by_post, post_urls,
+            lambda batch: ScrapeCommentsBatchAsync(engine, batch, max_comments, comment_fields),
+        )
+    return comments_by_post
 
-def process_linkedin_post_comments(args):
-    """Helper function to process comments for a single linkedin post in a thread."""
-    client, post_url, post_text, max_comments = args # reply_count removed
-    return ScrapeComments(client, post_url, post_text, max_comments)
+
+def _posts_needing_comments(df: pd.DataFrame, scraped_urls) -> pd.DataFrame:
+    """Posts with comments reported by the actor, a URL, and no comments scraped yet."""
+    return df[
+        (df['numComments'] > 0) & # Actor reported comments
+        (df['url'].notna())    & # Ensure URL is available
+        (~df['url'].isin(scraped_urls)) # URL is NOT in our set of already scraped posts
+    ]
 
 
 # --- Modified ScrapePostsAndComments Function ---
@@ -270,42 +333,95 @@ def ScrapePostsAndComments(
     path: Path,
     max_posts: int = 100,
     max_comments: int = 100,
-    max_threads: int = 10 # New parameter for controlling concurrency
+    max_threads: int = 10, # Max comment actor runs in flight at once
+    comment_batch_size: int = 1, # Posts packed into each comments actor run
+    storage: StorageBackend | None = None,
+    post_index: ScrapedPostIndex | None = None,
+    catalog: DataCatalog | None = None,
+    post_fields: FieldProjection | None = None, # Dataset fields to download, None downloads full items
+    comment_fields: FieldProjection | None = None,
+    posts_df: pd.DataFrame | None = None, # Posts already fetched by a batched run, skips the posts scrape
+    pipeline: bool = False, # Start comment runs while the posts dataset is still being read
 ) -> tuple[pd.DataFrame, pd.DataFrame] | tuple[None, None]:
     """
     Scrape linkedin posts and their comments (comments) for a specific user.
-    Uses threading for comment scraping and avoids re-scraping comments for posts already processed.
+    Runs comment scraping on the async actor engine and avoids re-scraping comments for posts already processed.
+    With `pipeline`, comment runs start as soon as their posts are read from the posts dataset.
 
-    Returns a tuple of (posts_df_this_run, combined_comments_df_for_this_user)
+    Returns a tuple of (posts_df_this_run, comments_df_this_run)
     or (None, None) if post scraping fails.
     """
+    storage = storage or get_storage()
+    catalog = catalog or DataCatalog.for_path(path)
+
     print("-" * 60)
     print(f"--- Starting combined linkedin scrape process for {username} ---")
     print(f"Posts between {start_time.strftime('%Y-%m-%d')} and {end_time.strftime('%Y-%m-%d')}")
-    print(f"Using {max_threads} threads for comment scraping.")
+    print(f"Using up to {max_threads} concurrent actor runs for comment scraping.")
     print("-" * 60)
 
     # --- 1. Load existing data to identify already scraped items ---
-    existing_comments_df = load_existing_linkedin_comments(path, username)
-    # Identify unique identifiers for posts from the existing comments data
-    existing_comment_post_urls = set()
-    if not existing_comments_df.empty:
-        if 'post_url' in existing_comments_df.columns:
-             existing_comment_post_urls.update(existing_comments_df['post_url'].dropna().unique())
-             
-
-    print(f"Identified {len(existing_comment_post_urls)} posts with existing comments data.")
+    comment_store = PartitionedCommentStore(path, username, "linkedin", storage, catalog)
+    # Which posts already have comments is looked up in the persistent post index
+    post_index = post_index or ScrapedPostIndex.for_path(path)
+    migrated_count = post_index.backfill_from_store("linkedin", username, comment_store)
+    if migrated_count:
+        print(f"Seeded post index with {migrated_count} posts from existing comment partitions.")
 
     # --- 2. Scrape Posts for the specified date range ---
-    # ScrapePosts saves its results independently. It returns posts within the date range.
-    scraped_posts_df = ScrapePosts(
-        client=client,
-        username=username,
-        start_time=start_time,
-        end_time=end_time,
-        path=path,
-        max_posts=max_posts
-    )
+    engine = get_engine(client)
+    future_to_urls = None # Comment runs already started by the pipeline
+    streamed = None
+    if pipeline and posts_df is None:
+        # Posts are read chunk by chunk; comment runs start as soon as a batch of posts needing
+        # comments has been read, and the posts file is written in the background
+        url = _profile_url(username)
+        run = _run_posts_actor(client, url, start_time, end_time, max_posts)
+        if run is None:
+            print("linkedin post scraping failed. Aborting comment scraping.")
+            return None, None
+
+        def select(chunk: pd.DataFrame) -> list[str]:
+            if 'url' not in chunk.columns or 'numComments' not in chunk.columns:
+                return []
+            chunk = _posts_needing_comments(chunk, post_index.scraped_keys("linkedin", username, chunk['url'].dropna(), reported_comment_counts(chunk['url'].dropna(), chunk, POST_ATTRIBUTES.comments)))
+            return chunk['url'].tolist()
+
+        print(f"Collecting post data from dataset: {run['defaultDatasetId']} (comment runs start while it is read)...")
+        try:
+            streamed = pipeline_posts_to_comments(
+                client,
+                run["defaultDatasetId"],
+                select=select,
+                comment_batch=lambda batch: ScrapeCommentsBatchAsync(engine, batch, max_comments, comment_fields),
+                save=lambda df: _save_posts(df, username, url, start_time, end_time, path, storage, catalog),
+                prepare=_parse_dates,
+                batch_size=comment_batch_size,
+                max_threads=max_threads,
+                projection=post_fields,
+                desc=f"Processing posts for {username}",
+                unit="post",
+            )
+        except DatasetReadError as e:
+            print(f"Error fetching data from dataset {run['defaultDatasetId']}: {e}")
+            return None, None
+        scraped_posts_df = streamed.posts_df
+        future_to_urls = streamed.future_to_batch
+        print(f"Collected {len(scraped_posts_df)} posts from the dataset.")
+    else:
+        # ScrapePosts saves its results independently. It returns posts within the date range.
+        # Posts fetched beforehand by a batched run (ScrapePostsBatch) are used as-is.
+        scraped_posts_df = posts_df if posts_df is not None else ScrapePosts(
+            client=client,
+            username=username,
+            start_time=start_time,
+            end_time=end_time,
+            path=path,
+            max_posts=max_posts,
+            storage=storage,
+            catalog=catalog,
+            post_fields=post_fields,
+        )
 
     # Check if post scraping failed or returned no posts
     if scraped_posts_df is None:
@@ -314,17 +430,17 @@ def ScrapePostsAndComments(
 
     if scraped_posts_df.empty or "url" not in scraped_posts_df.columns:
         print("No posts scraped or 'url' column missing. No comments to scrape.")
-        # Load existing comments just in case, though the main scraper already did
-        final_comments_df = load_existing_linkedin_comments(path, username)
-        # Return the scraped posts_df (even if empty) and the loaded existing comments_df
-        return scraped_posts_df, final_comments_df
+        if streamed is not None:
+            streamed.wait_saved()
+        return scraped_posts_df, pd.DataFrame() # No comments scraped in this run
 
     # --- 3. Determine which posts need comments scraped ---
-    posts_to_scrape_comments_df = scraped_posts_df[
-        (scraped_posts_df['numComments'] > 0) & # Actor reported comments
-        (scraped_posts_df['url'].notna())    & # Ensure URL is available
-        (~scraped_posts_df['url'].isin(existing_comment_post_urls)) # URL is NOT in our set of already scraped posts
-    ].copy() # Use .copy() to avoid SettingWithCopyWarning
+    # Posts checked with no comments are looked at again once they report more comments
+    reported_counts = reported_comment_counts(scraped_posts_df['url'].dropna(), scraped_posts_df, POST_ATTRIBUTES.comments)
+    existing_comment_post_urls = post_index.scraped_keys("linkedin", username, scraped_posts_df['url'].dropna(), reported_counts)
+    print(f"Identified {len(existing_comment_post_urls)} posts with existing comments data.")
+
+    posts_to_scrape_comments_df = _posts_needing_comments(scraped_posts_df, existing_comment_post_urls).copy() # Use .copy() to avoid SettingWithCopyWarning
 
     all_post_urls_from_scrape = scraped_posts_df['url'].dropna().tolist()
     total_posts_with_urls = len(all_post_urls_from_scrape)
@@ -346,55 +462,53 @@ def ScrapePostsAndComments(
 
 
     newly_scraped_comments_list = []
-
-    # --- 4. Scrape Comments using Threading ---
-    if not posts_to_scrape_comments_df.empty:
-        print(f"Starting linkedin comment scraping using {max_threads} threads...")
-
-        # Prepare arguments list for the thread pool
-        # Columns needed: 'url' (for scraper), 'text' (to add context)
-        process_args = [
-            (client, row['url'], row['text'], max_comments) # Pass what process_linkedin_post_comments expects
-            for _, row in posts_to_scrape_comments_df.iterrows()
-        ]
-
-        # Use ThreadPoolExecutor for concurrent comment scraping
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-            # Create a dictionary to map future objects to post URLs for easier tracking
-            future_to_url = {
-                executor.submit(process_linkedin_post_comments, args): args[1] # args[1] is post_url
-                for args in process_args
-            }
-
-            # Use tqdm with as_completed to show progress
-            progress_bar = tqdm(concurrent.futures.as_completed(future_to_url),
-                                total=len(future_to_url),
-                                desc=f"Scraping comments for {username}",
-                                unit="post",
-                                leave=True)
-
-            for future in progress_bar:
-                post_url = future_to_url[future]
-                try:
-                    comments_df = future.result() # Retrieves the DataFrame or raises exception
+    newly_scraped_comments_df = pd.DataFrame()
+    fetched_comment_counts = {} # post_url -> number of comments fetched in this run
+
+    # --- 4. Scrape Comments on the async engine ---
+    if future_to_urls or not posts_to_scrape_comments_df.empty:
+        print(f"Starting linkedin comment scraping with up to {max_threads} concurrent actor runs, {comment_batch_size} post(s) per run...")
+
+        if future_to_urls is None:
+            # One batch of post URLs per actor run
+            batches = list(chunked(posts_to_scrape_comments_df['url'].tolist(), comment_batch_size))
+
+            # Comment runs are coroutines on the shared engine loop, at most max_threads of them in flight
+            futures = engine.submit_bounded(
+                (ScrapeCommentsBatchAsync(engine, batch, max_comments, comment_fields) for batch in batches),
+                limit=max_threads,
+            )
+            # Create a dictionary to map future objects to the post URLs of their batch
+            future_to_urls = dict(zip(futures, batches))
+
+        # Use tqdm with as_completed to show progress
+        progress_bar = tqdm(concurrent.futures.as_completed(future_to_urls),
+                            total=len(future_to_urls),
+                            desc=f"Scraping comments for {username}",
+                            unit="run",
+                            leave=True)
+
+        for future in progress_bar:
+            post_urls = future_to_urls[future]
+            try:
+                comments_by_post = future.result() # Retrieves {post_url: DataFrame} or raises exception
+                for post_url, comments_df in comments_by_post.items():
+                    fetched_comment_counts[post_url] = len(comments_df)
                     if not comments_df.empty:
-                        # Metadata like post_url and tweet_text are added inside ScrapeComments
+                        # post_url is added when the run is split per post, the post's attributes in step 5
                         newly_scraped_comments_list.append(comments_df)
 
-                except Exception as exc:
-                    # Handle exceptions raised by ScrapeComments for individual posts
-                    post_url_display = post_url.split("/")[-1] if "/" in post_url else post_url
-                    if len(post_url_display) > 20:
-                         post_url_display = post_url_display[:10] + "..." + post_url_display[-10:]
-                    print(f"\nPost {post_url_display} ({post_url}) generated an exception during comment scraping: {exc}")
-                    # Continue processing other posts
+            except Exception as exc:
+                # Handle exceptions raised by individual comment runs
+                print(f"\nComment run for {len(post_urls)} post(s) ({post_urls[0]}...) generated an exception during comment scraping: {exc}")
+                # Continue processing other runs
 
-            progress_bar.close()
+        progress_bar.close()
 
-        # --- 5. Combine newly scraped comments ---
+        # --- 5. Combine newly scraped comments and attach their posts' attributes ---
         newly_scraped_comments_df = pd.DataFrame() # Initialize as empty
         if newly_scraped_comments_list:
-             newly_scraped_comments_df = pd.concat(newly_scraped_comments_list, ignore_index=True)
+             newly_scraped_comments_df = enrich_comments(newly_scraped_comments_list, scraped_posts_df, POST_ATTRIBUTES, author=username)
              print(f"Successfully scraped comments for {len(newly_scraped_comments_list)} posts in this run.")
              print(f"Collected {len(newly_scraped_comments_df)} new comments in this run.")
              # Add the linkedin username to the newly scraped comments
@@ -402,49 +516,25 @@ def ScrapePostsAndComments(
         else:
             print("No new comments were successfully scraped for the selected posts in this run.")
 
-        # --- 6. Combine with existing comments and save ---
-        # Use the initially loaded existing_comments_df
-        if not existing_comments_df.empty:
-             # Combine existing and new comments
-             combined_comments_df = pd.concat([existing_comments_df, newly_scraped_comments_df], ignore_index=True)
-             print(f"Combined new comments with {len(existing_comments_df)} existing comments.")
-
-             id_col = 'id' # Assuming 'id' is the unique comment/reply ID returned by the actor
-             if id_col in combined_comments_df.columns:
-                  initial_count = len(combined_comments_df)
-                  combined_comments_df.drop_duplicates(subset=[id_col], inplace=True)
-                  if len(combined_comments_df) < initial_count:
-                       print(f"Removed {initial_count - len(combined_comments_df)} duplicate comments based on '{id_col}' in the combined dataset.")
-             else:
-                  print(f"Warning: '{id_col}' column not found in comments for robust duplicate checking.")
-
-        else:
-             # No existing comments, the combined dataframe is just the new ones
-             combined_comments_df = newly_scraped_comments_df
-             print("No existing comments found. Saving only newly scraped comments.")
-
-
-        # Save the combined comments data to the single cumulative file
-        comments_dir = path / "comments"
-        comments_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists
-        output_filename = comments_dir / f"{username}_linkedin_comments_combined.xlsx"
-
-        print(f"Saving combined comments data ({len(combined_comments_df)} total unique comments) to {output_filename}...")
+        # --- 6. Append this run's comments as a new partition ---
+        # Only the delta is written, existing partitions are never rewritten
         try:
-            combined_comments_df.to_excel(output_filename, index=False)
-            print("Combined comments data saved successfully.")
-            final_comments_df = combined_comments_df
+            if not newly_scraped_comments_df.empty:
+                print(f"Appending {len(newly_scraped_comments_df)} new comments to {comment_store.root}...")
+                part_path = comment_store.append(newly_scraped_comments_df)
+                print(f"New comments saved successfully to {part_path}.")
+            # Only record posts in the index once their comments are safely on disk
+            post_index.mark_scraped("linkedin", username, fetched_comment_counts, reported_counts=reported_counts)
         except Exception as e:
-            print(f"Error saving combined comments data to {output_filename}: {e}")
-            # If saving fails, return the dataframe we attempted to save
-            final_comments_df = combined_comments_df
+            print(f"Error saving new comments to {comment_store.root}: {e}")
 
     else:
         print("No posts required comment scraping or no comments were found in this run.")
-        # If no new comments were scraped, the final comments dataframe is just the existing one
-        final_comments_df = existing_comments_df
-        print(f"Loaded existing comments dataframe has {len(final_comments_df)} rows.")
 
+    if streamed is not None:
+        streamed.wait_saved() # The posts file is on disk before this profile counts as done
 
-    # Return the posts scraped in this run and the total combined comments for this user
-    return scraped_posts_df, final_comments_df
+    # Only this run's comments are returned. Earlier ones stay in the comment store, where
+    # readers merge the partitions lazily (load_existing_linkedin_comments), so a run never re-reads the history
+    print(f"Returning {len(newly_scraped_comments_df)} new comments for {username}.")
+    return scraped_posts_df, newly_scraped_comments_df
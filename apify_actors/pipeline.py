@@ -0,0 +1,99 @@
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Callable, Coroutine
+
+import pandas as pd
+
+from .engine import get_engine
+from .ingest import DEFAULT_CHUNK_SIZE, FieldProjection, concat_frames, iter_cached_dataset_frames
+from .resilience import DatasetReadError
+
+# --- Pipelined Post -> Comment Scraping ---
+# By default comment runs start only once the whole posts dataset has been downloaded, parsed
+# and saved. In the pipelined flow the posts dataset is read chunk by chunk, and the posts of
+# each chunk that need comments are packed into comment batches straight away; every full
+# batch is handed to the engine, so comment runs overlap the rest of the posts download.
+# The posts file is then written on a background thread while the comment runs finish.
+
+POST_WRITER_THREADS = 4
+
+_post_writer = concurrent.futures.ThreadPoolExecutor(max_workers=POST_WRITER_THREADS, thread_name_prefix="post-writer")
+
+
+@dataclass
+class PipelinedPosts:
+    """What pipeline_posts_to_comments started."""
+
+    posts_df: pd.DataFrame  # Every post read, after `prepare`
+    future_to_batch: dict[concurrent.futures.Future, list] = field(default_factory=dict)  # Comment runs -> their batch
+    saved: concurrent.futures.Future | None = None  # The background save of posts_df, None if there was nothing to save
+
+    def wait_saved(self):
+        """Blocks until the posts file has been written (save errors are reported by `save` itself)."""
+        if self.saved is not None:
+            self.saved.result()
+
+
+def pipeline_posts_to_comments(
+    client,
+    dataset_id: str,
+    select: Callable[[pd.DataFrame], list],
+    comment_batch: Callable[[list], Coroutine],
+    save: Callable[[pd.DataFrame], pd.DataFrame],
+    prepare: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+    batch_size: int = 1,
+    max_threads: int = 10,
+    projection: FieldProjection | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    desc: str | None = None,
+    unit: str = "post",
+) -> PipelinedPosts:
+    """
+    Reads a posts dataset and starts comment runs for its posts while it is still being read.
+
+    Args:
+        client: The ApifyClient the posts run belongs to.
+        dataset_id: The posts run's dataset.
+        select: Returns the items (post URLs, (url, text) pairs, ...) of a chunk that need comments.
+        comment_batch: Builds the comments coroutine for one batch of selected items.
+        save: Writes the posts; runs on a background thread once every chunk has been read.
+        prepare: Applied to each chunk before `select` (e.g. date parsing); its result is kept.
+        batch_size: Selected items per comment run.
+        max_threads: Comment runs of this call in flight at once.
+        projection: Posts dataset fields to download.
+
+    Returns:
+        A PipelinedPosts. The caller collects the comment futures and calls wait_saved().
+        If a posts page still fails after retries, the comment runs already started are
+        cancelled and DatasetReadError is raised, like read_dataset_frame does.
+    """
+    submit = get_engine(client).bounded_submitter(max_threads)
+    result = PipelinedPosts(pd.DataFrame())
+    frames = []
+    pending = []
+
+    def flush():
+        nonlocal pending
+        result.future_to_batch[submit(comment_batch(pending))] = pending
+        pending = []
+
+    try:
+        for chunk in iter_cached_dataset_frames(client, dataset_id, chunk_size, desc=desc, unit=unit, projection=projection):
+            if prepare is not None:
+                chunk = prepare(chunk)
+            frames.append(chunk)
+            for item in select(chunk):
+                pending.append(item)
+                if len(pending) >= batch_size:
+                    flush()
+    except DatasetReadError:
+        for future in result.future_to_batch:
+            future.cancel()
+        raise
+    if pending:
+        flush()
+
+    result.posts_df = concat_frames(frames)
+    if not result.posts_df.empty:
+        result.saved = _post_writer.submit(save, result.posts_df)
+    return result
@@ -0,0 +1,148 @@
+import contextlib
+import datetime
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+# --- Scraped Post Index ---
+# A small SQLite table recording, per (platform, handle, post key), when comments were
+# fetched and how many came back. Comment-skip decisions are primary-key lookups against
+# it instead of reading every stored comment. Each entry also keeps the comment count the
+# post reported when it was checked: a post checked with no comments is only skipped while it
+# still reports no more comments than then, so comments added later are picked up.
+
+INDEX_FILENAME = "scraped_posts.sqlite"
+_SQLITE_MAX_VARIABLES = 500  # Stay well below SQLite's bound-parameter limit per query
+
+
+class ScrapedPostIndex:
+    """Persistent index of posts whose comments have already been fetched."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS scraped_posts (
+                    platform TEXT NOT NULL,
+                    handle TEXT NOT NULL,
+                    post_key TEXT NOT NULL,
+                    comments_fetched_at TEXT NOT NULL,
+                    comment_count INTEGER NOT NULL,
+                    reported_count INTEGER,
+                    PRIMARY KEY (platform, handle, post_key)
+                ) WITHOUT ROWID
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(scraped_posts)")}
+            if "reported_count" not in columns: # Indexes written before the column existed
+                conn.execute("ALTER TABLE scraped_posts ADD COLUMN reported_count INTEGER")
+
+    @classmethod
+    def for_path(cls, path: Path) -> "ScrapedPostIndex":
+        """Returns the shared index for a platform data directory (stored one level up, in scraped_data/)."""
+        return cls(Path(path).parent / INDEX_FILENAME)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A fresh connection per call keeps the index safe to use from worker threads
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # Commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def has_handle(self, platform: str, handle: str) -> bool:
+        """Returns True if any post has been recorded for this handle."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM scraped_posts WHERE platform = ? AND handle = ? LIMIT 1",
+                (platform, handle),
+            ).fetchone()
+        return row is not None
+
+    def scraped_keys(self, platform: str, handle: str, post_keys: Iterable[str], reported_counts: dict | None = None) -> set:
+        """
+        Returns the subset of `post_keys` whose comments need not be fetched again: posts with
+        comments already fetched, and posts checked with none that report no more comments in
+        `reported_counts` ({post_key: count}, see reported_comment_counts) than when checked.
+        """
+        post_keys = [str(k) for k in dict.fromkeys(post_keys) if k is not None and k == k]
+        reported_counts = reported_counts or {}
+        found = set()
+        with self._connect() as conn:
+            for i in range(0, len(post_keys), _SQLITE_MAX_VARIABLES):
+                chunk = post_keys[i:i + _SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT post_key, comment_count, reported_count FROM scraped_posts "
+                    f"WHERE platform = ? AND handle = ? AND post_key IN ({placeholders})",
+                    (platform, handle, *chunk),
+                ).fetchall()
+                for post_key, comment_count, reported_then in rows:
+                    if comment_count > 0:
+                        found.add(post_key)
+                        continue
+                    reported_now = reported_counts.get(post_key)
+                    if reported_then is not None and reported_now is not None and reported_now <= reported_then:
+                        found.add(post_key)
+        return found
+
+    def mark_scraped(self, platform: str, handle: str, comment_counts: dict, fetched_at: datetime.datetime | None = None, reported_counts: dict | None = None):
+        """
+        Records (or updates) the comment fetch time and count for each post key, with the
+        comment count the post reported at the time (from `reported_counts`, where known).
+        """
+        if not comment_counts:
+            return
+        fetched_at = (fetched_at or datetime.datetime.now()).isoformat()
+        reported_counts = reported_counts or {}
+        rows = [
+            (platform, handle, str(key), fetched_at, int(count), reported_counts.get(str(key)))
+            for key, count in comment_counts.items() if key is not None
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO scraped_posts (platform, handle, post_key, comments_fetched_at, comment_count, reported_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (platform, handle, post_key) DO UPDATE SET
+                    comments_fetched_at = excluded.comments_fetched_at,
+                    comment_count = excluded.comment_count,
+                    reported_count = excluded.reported_count
+                """,
+                rows,
+            )
+
+    def backfill_from_store(self, platform: str, handle: str, comment_store, key_column: str = "post_url") -> int:
+        """
+        Seeds the index for a handle from its stored comment partitions (one-off migration).
+        Returns the number of post keys recorded.
+        """
+        if self.has_handle(platform, handle):
+            return 0
+        counts = {}
+        for df in comment_store.iter_partitions(columns=[key_column]):
+            if key_column in df.columns:
+                for key, count in df[key_column].dropna().value_counts().items():
+                    counts[key] = counts.get(key, 0) + int(count)
+        # The real fetch time of migrated rows is unknown, record them at the epoch
+        self.mark_scraped(platform, handle, counts, fetched_at=datetime.datetime.fromtimestamp(0))
+        return len(counts)
+
+
+def reported_comment_counts(keys: pd.Series, df: pd.DataFrame, count_col: str) -> dict:
+    """
+    Maps each post key to the comment count its post reports in `count_col` ({} if the actor
+    has no such column). `keys` must share `df`'s index, e.g. df['url'].dropna().
+    """
+    if count_col not in df.columns or keys.empty:
+        return {}
+    counts = pd.to_numeric(df.loc[keys.index, count_col], errors="coerce")
+    return {str(key): int(count) for key, count in zip(keys, counts) if pd.notna(key) and pd.notna(count)}
@@ -0,0 +1,137 @@
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+import pandas as pd
+
+# --- Post-Processing Pool ---
+# File serialization (Parquet conversion, to_excel) is CPU-bound and holds the GIL, so running
+# it on a scraper thread stalls every other thread of the process: the comment collection
+# loops, the handle workers and the engine's event loop. Large frames are shipped to a small
+# process pool instead; the calling thread only waits on a future, which releases the GIL.
+# Small frames are processed inline, where pickling would cost more than it saves. For the
+# same reason, vectorized steps whose input costs more to pickle than to process (date
+# parsing, flattening a page of items, the comment enrichment merge) stay on the calling
+# thread. The pool is created on first use and uses "spawn", since forking a process that
+# runs the engine's event loop thread is unsafe. Spawned workers import apify_actors afresh,
+# so nothing it imports may depend on the Streamlit app (components/).
+# The pool is shared by the whole process: its size is an app setting, taken from the
+# POSTPROCESS_WORKERS environment variable or set once at startup with configure_postprocess.
+# A pool that keeps breaking is given up on, and frames are processed inline from then on.
+
+# One core is left to the scraper threads; on a single core a pool has nothing to gain
+DEFAULT_POSTPROCESS_WORKERS = max(0, min(2, (os.cpu_count() or 1) - 1))
+OFFLOAD_MIN_ROWS = 5000  # Frames smaller than this are processed on the calling thread
+MAX_POOL_FAILURES = 3  # Broken pools in a row before offloading is switched off
+
+
+def _workers_from_env() -> int:
+    value = os.environ.get("POSTPROCESS_WORKERS")
+    if value is None:
+        return DEFAULT_POSTPROCESS_WORKERS
+    try:
+        return max(0, int(value))
+    except ValueError:
+        print(f"Warning: Ignoring POSTPROCESS_WORKERS={value!r}, it is not a number.")
+        return DEFAULT_POSTPROCESS_WORKERS
+
+
+_workers = _workers_from_env()
+_pool_failures = 0
+_pool: concurrent.futures.ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def configure_postprocess(workers: int):
+    """Sets the number of post-processing processes for the whole process (0 processes everything inline)."""
+    global _workers, _pool_failures
+    with _pool_lock:
+        if workers != _workers:
+            _shutdown_locked()
+        _workers = max(0, int(workers))
+        _pool_failures = 0
+
+
+def _get_pool() -> concurrent.futures.ProcessPoolExecutor | None:
+    global _pool
+    with _pool_lock:
+        if _pool is None and _workers > 0:
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _shutdown_locked():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown_postprocess():
+    """Stops the pool's processes; the next offloaded call starts a new pool."""
+    with _pool_lock:
+        _shutdown_locked()
+
+
+atexit.register(shutdown_postprocess)
+
+
+def offload(fn: Callable, df: pd.DataFrame, *args, min_rows: int = OFFLOAD_MIN_ROWS, **kwargs):
+    """
+    Returns fn(df, *args, **kwargs), computed in the post-processing pool when `df` has at
+    least `min_rows` rows. `fn` must be a module-level function; a call whose function or
+    other arguments cannot be pickled runs inline. Exceptions raised by `fn` propagate as if
+    it had run inline; if the pool itself fails, `fn` runs inline instead.
+    Note that `fn` works on a copy of `df` in the pool, so only its return value counts.
+    """
+    pool = _get_pool() if len(df) >= min_rows else None
+    if pool is None or not _picklable(fn, args, kwargs):
+        return fn(df, *args, **kwargs)
+    try:
+        future = pool.submit(fn, df, *args, **kwargs)
+        result = future.result()
+        _pool_succeeded()
+        return result
+    except BrokenProcessPool as e:
+        _pool_broke(pool, e)
+    except concurrent.futures.CancelledError:
+        pass # The pool was reconfigured while this call waited
+    return fn(df, *args, **kwargs)
+
+
+def _picklable(fn: Callable, args: tuple, kwargs: dict) -> bool:
+    """
+    Checks up front that the call can be sent to the pool, so errors raised later are fn's own.
+    The frame is not checked: it holds scraped data, and pickling it twice would double the cost.
+    """
+    try:
+        pickle.dumps((fn, args, kwargs))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        print(f"Warning: Could not send {getattr(fn, '__name__', fn)} to the post-processing pool ({e}). Processing inline.")
+        return False
+    return True
+
+
+def _pool_succeeded():
+    global _pool_failures
+    _pool_failures = 0
+
+
+def _pool_broke(pool: concurrent.futures.ProcessPoolExecutor, error: BaseException):
+    """Drops a broken pool; after MAX_POOL_FAILURES in a row, stops offloading altogether."""
+    global _pool, _workers, _pool_failures
+    with _pool_lock:
+        if _pool is not pool:
+            return # Another thread already dealt with this pool
+        _shutdown_locked()
+        _pool_failures += 1
+        if _pool_failures >= MAX_POOL_FAILURES:
+            _workers = 0
+            print(f"Warning: Post-processing pool failed {_pool_failures} times in a row ({error}). Processing inline from now on.")
+        else:
+            print(f"Warning: Post-processing pool failed ({error}). Processing inline and restarting the pool.")
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import httpx
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from .concurrency import is_throttle_error
+
+# --- Retries and Circuit Breakers ---
+# Failures are classified first. Transient ones (throttling, 5xx, network errors, timeouts)
+# are retried with jittered exponential backoff. Anything else (bad input, auth, missing
+# dataset) fails at once. Each actor also has a circuit breaker: after enough consecutive
+# failures its calls fail fast for a while instead of spending money on runs that will not work.
+
+RETRY_ATTEMPTS = 4
+RETRY_MAX_WAIT = 30.0  # Seconds; waits are random in [0, min(RETRY_MAX_WAIT, 2 ** attempt)]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an actor whose circuit breaker is open."""
+
+
+class DatasetReadError(Exception):
+    """A dataset page could not be read after retries. The rows read before it are not returned."""
+
+    def __init__(self, dataset_id: str, offset: int, cause: BaseException):
+        super().__init__(f"Reading dataset {dataset_id} failed at offset {offset}: {cause}")
+        self.dataset_id = dataset_id
+        self.cause = cause
+
+
+class ActorRunError(Exception):
+    """Raised for an actor run that finished without succeeding when the caller needs a complete result."""
+
+    def __init__(self, actor_id: str, run: dict):
+        super().__init__(f"Actor run {run.get('id')} of actor {actor_id} finished with status {run.get('status')}.")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for failures worth retrying: throttling, server errors, network errors and timeouts."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if is_throttle_error(exc):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500 or status_code == 408
+    return isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _retry_kwargs(attempts: int) -> dict:
+    return {
+        "retry": retry_if_exception(is_retryable),
+        "stop": stop_after_attempt(attempts),
+        "wait": wait_random_exponential(multiplier=1, max=RETRY_MAX_WAIT),
+        "reraise": True,  # Callers see the original error, not tenacity's RetryError
+    }
+
+
+def retrying(attempts: int = RETRY_ATTEMPTS) -> Retrying:
+    """Retry policy for blocking calls: `for attempt in retrying(): with attempt: ...`."""
+    return Retrying(**_retry_kwargs(attempts))
+
+
+def async_retrying(attempts: int = RETRY_ATTEMPTS) -> AsyncRetrying:
+    """Retry policy for coroutines: `async for attempt in async_retrying(): with attempt: ...`."""
+    return AsyncRetrying(**_retry_kwargs(attempts))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one actor (closed -> open -> half-open -> closed)."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        Args:
+            name: Shown in errors, usually the actor ID.
+            failure_threshold: Consecutive failures that open the circuit.
+            reset_timeout: Seconds the circuit stays open before one trial call is let through.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not go through."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_in_progress:
+                self._trial_in_progress = True  # Only one trial call while half-open
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(
+            f"Circuit for actor {self.name} is open after {self.failures} consecutive failures; "
+            f"next trial in {retry_in:.0f}s."
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_progress or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()  # (Re)open: a failed trial restarts the timeout
+            self._trial_in_progress = False
@@ -0,0 +1,218 @@
+import contextlib
+import contextvars
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from .flatten import flatten_frame
+
+# --- Actor Result Cache ---
+# Identical actor calls (same actor, same normalized run input) within the TTL re-use the
+# earlier run instead of starting and paying for a new one. Two things are cached:
+#   runs:  hash(actor ID, normalized run_input) -> the finished run object (and its dataset ID)
+#   items: (dataset ID, downloaded fields) -> the dataset's items, as gzipped JSON lines
+# A cached run hands back its dataset ID, so the following dataset read is served from the
+# stored items when they are still on disk, or re-downloaded from Apify otherwise.
+# Entries expire after the TTL; stored items are evicted least recently used first once
+# they exceed the size budget.
+# Caching is opt-in: a scraper's cache applies to the calls made inside its cache_context()
+# block, so sessions sharing an engine never read from or write to each other's cache.
+
+CACHE_DIRNAME = "cache"
+INDEX_FILENAME = "results.sqlite"
+DEFAULT_TTL = 6 * 3600  # Seconds
+DEFAULT_MAX_BYTES = 1024 ** 3  # Disk budget for stored items
+
+_current_cache: contextvars.ContextVar["ResultCache | None"] = contextvars.ContextVar("_current_cache", default=None)
+
+
+def normalize_input(value):
+    """
+    Canonical form of a run input for hashing: keys sorted, None values dropped, strings
+    stripped. Lists are sorted too, since every list in these actors' inputs is a set of targets.
+    """
+    if isinstance(value, dict):
+        return {str(k): normalize_input(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0])) if v is not None}
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_input(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def cache_key(actor_id: str, run_input: dict) -> str:
+    """Content hash of an actor call."""
+    payload = json.dumps({"actor": actor_id, "input": normalize_input(run_input)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _fields_key(params: dict | None) -> str:
+    return json.dumps(params or {}, sort_keys=True)
+
+
+class ResultCache:
+    """On-disk cache of finished actor runs and their dataset items."""
+
+    def __init__(self, root: Path, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            root: Directory holding the SQLite index and the stored items.
+            ttl: Seconds a cached run or its items may be re-used.
+            max_bytes: Size budget for stored items; least recently used ones are evicted beyond it.
+        """
+        self.root = Path(root)
+        self.items_dir = self.root / "items"
+        self.items_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / INDEX_FILENAME
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    key TEXT PRIMARY KEY,
+                    actor_id TEXT NOT NULL,
+                    run TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS items (
+                    dataset_id TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    PRIMARY KEY (dataset_id, fields)
+                ) WITHOUT ROWID
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Runs ---
+
+    def get_run(self, actor_id: str, run_input: dict) -> dict | None:
+        """Returns the cached run for an identical call made within the TTL, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT run, created_at FROM runs WHERE key = ?", (cache_key(actor_id, run_input),)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_run(self, actor_id: str, run_input: dict, run: dict):
+        """Records a finished run for its (actor ID, run input)."""
+        row = (cache_key(actor_id, run_input), actor_id, json.dumps(run, default=str), time.time())
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)", row)
+
+    # --- Items ---
+
+    def get_items(self, dataset_id: str, fields: dict | None = None) -> pd.DataFrame | None:
+        """Returns the stored items of a dataset downloaded with the same `fields` params, or None."""
+        key = (dataset_id, _fields_key(fields))
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, created_at FROM items WHERE dataset_id = ? AND fields = ?", key).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        path = self.items_dir / row[0]
+        try:
+            # dtype/convert_dates off: values come back exactly as the actor returned them
+            df = pd.read_json(path, orient="records", lines=True, compression="gzip", dtype=False, convert_dates=False)
+        except Exception as e:
+            print(f"Warning: Could not read cached items {path}: {e}")
+            return None
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE items SET last_used_at = ? WHERE dataset_id = ? AND fields = ?", (time.time(), *key))
+        # Lists (and objects stored before items were flattened) come back from JSON as Python objects
+        return flatten_frame(df)
+
+    def put_items(self, dataset_id: str, fields: dict | None, df: pd.DataFrame):
+        """Stores the items of a fully read dataset, then evicts down to the size budget."""
+        if df.empty:
+            return # Cheap to read again, and nothing to re-use
+        fields_key = _fields_key(fields)
+        file_name = f"{dataset_id}-{hashlib.sha256(fields_key.encode('utf-8')).hexdigest()[:12]}.jsonl.gz"
+        path = self.items_dir / file_name
+        tmp_path = path.with_name(file_name + ".tmp")
+        df.to_json(tmp_path, orient="records", lines=True, compression="gzip", date_format="iso")
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        row = (dataset_id, fields_key, file_name, path.stat().st_size, len(df), now, now)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        self.evict()
+
+    # --- Eviction ---
+
+    def evict(self) -> int:
+        """Drops expired entries, then the least recently used items beyond `max_bytes`. Returns items removed."""
+        cutoff = time.time() - self.ttl
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE created_at < ?", (cutoff,))
+            rows = conn.execute("SELECT dataset_id, fields, path, bytes, created_at FROM items ORDER BY last_used_at DESC").fetchall()
+            kept_bytes = 0
+            evicted = []
+            for dataset_id, fields, path, size, created_at in rows:
+                if created_at >= cutoff and kept_bytes + size <= self.max_bytes:
+                    kept_bytes += size
+                    continue
+                evicted.append((dataset_id, fields, path))
+            conn.executemany("DELETE FROM items WHERE dataset_id = ? AND fields = ?", [(d, f) for d, f, _ in evicted])
+        for _, _, path in evicted:
+            with contextlib.suppress(FileNotFoundError):
+                (self.items_dir / path).unlink()
+        return len(evicted)
+
+    def clear(self):
+        """Removes every cached run and stored item."""
+        with self._lock, self._connect() as conn:
+            paths = [row[0] for row in conn.execute("SELECT path FROM items")]
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM runs")
+        for path in paths:
+            with contextlib.suppress(FileNotFoundError):
+                (self.items_dir / path).unlink()
+
+
+def current_cache() -> ResultCache | None:
+    """Returns the cache actor calls and dataset reads made from here use, if any."""
+    return _current_cache.get()
+
+
+@contextlib.contextmanager
+def cache_context(cache: ResultCache | None):
+    """Makes `cache` the result cache for actor calls and dataset reads inside the block (on this thread); None disables caching."""
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
+
+
+def _set_current_cache(cache: ResultCache | None):
+    # For tasks on the engine loop, which do not inherit the submitting thread's context
+    _current_cache.set(cache)
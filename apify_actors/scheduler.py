@@ -0,0 +1,212 @@
+import asyncio
+import contextlib
+import contextvars
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from .concurrency import AIMDController
+
+# --- Actor Run Scheduler ---
+# Every actor run of the process waits here for a slot before it starts. The engine is
+# shared by every scraper using the same Apify account, so the scheduler is what keeps two
+# Streamlit sessions, or the platforms and handles of one scrape_all, from stacking their
+# own concurrency limits on top of each other. It enforces:
+#   a global cap:     the engine's adaptive (AIMD) limit, bounded by its run budget
+#   per-actor caps:   at most this many runs of one actor in flight
+#   per-call budgets: at most this many runs in flight for the calls inside a run_budget()
+#                     block (e.g. one scrape_all), without touching other sessions' limits
+#   fair queuing:     waiting runs are granted round-robin between sessions, then between
+#                     the handles (tenants) of a session, FIFO within a tenant, so one large
+#                     handle or session cannot starve the others
+# A run is attributed to the session and tenant set with run_tenant() in the thread that
+# submitted it; runs submitted outside of one share a default queue. Budgets are picked up
+# the same way, from run_budget().
+
+DEFAULT_MAX_RUNS_PER_ACTOR = 100  # Half the default engine ceiling: no single actor can take the whole account
+DEFAULT_SESSION = "default"
+DEFAULT_TENANT = "default"
+
+_current_tenant: contextvars.ContextVar[tuple[str, str]] = contextvars.ContextVar("_current_tenant", default=(DEFAULT_SESSION, DEFAULT_TENANT))
+
+
+@dataclass(eq=False)
+class RunBudget:
+    """A cap on the runs in flight for the calls inside one run_budget() block."""
+
+    limit: int
+    running: int = 0
+
+    def has_room(self) -> bool:
+        return self.running < self.limit
+
+
+_current_budget: contextvars.ContextVar[RunBudget | None] = contextvars.ContextVar("_current_budget", default=None)
+
+
+@dataclass
+class _Waiter:
+    actor_id: str
+    granted: asyncio.Future = field(repr=False)
+    budget: RunBudget | None = None
+
+
+class RunScheduler:
+    """Fair, capped admission of actor runs on the engine's event loop."""
+
+    def __init__(self, controller: AIMDController, max_runs_per_actor: int | None = DEFAULT_MAX_RUNS_PER_ACTOR):
+        """
+        Args:
+            controller: The engine's concurrency controller; its limit is the global cap.
+            max_runs_per_actor: Default cap on runs of one actor in flight (None for no cap).
+        """
+        self.controller = controller
+        self.max_runs_per_actor = max_runs_per_actor
+        self.actor_limits: dict[str, int] = {}  # Per-actor overrides of max_runs_per_actor
+        self.running: dict[str, int] = {}  # Actor ID -> runs in flight
+        # session -> tenant -> waiting runs; both levels are rotated as they are served
+        self._queues: OrderedDict[str, OrderedDict[str, deque[_Waiter]]] = OrderedDict()
+
+    def actor_limit(self, actor_id: str) -> int | None:
+        """The cap for one actor, or None if only the global cap applies."""
+        return self.actor_limits.get(actor_id, self.max_runs_per_actor)
+
+    async def set_max_runs(self, limit: int):
+        """Changes the ceiling of the global cap (the controller's adaptive limit)."""
+        self.controller.set_max_limit(limit)
+        self._dispatch()
+
+    async def set_actor_limit(self, actor_id: str, limit: int | None):
+        """Sets (or with None, removes) the cap of one actor."""
+        if limit is None:
+            self.actor_limits.pop(actor_id, None)
+        else:
+            self.actor_limits[actor_id] = max(1, int(limit))
+        self._dispatch()
+
+    def queued(self) -> dict[str, int]:
+        """Runs waiting for a slot, per session."""
+        return {session: sum(len(queue) for queue in tenants.values()) for session, tenants in self._queues.items()}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, actor_id: str) -> AsyncIterator[None]:
+        """Holds one run slot for `actor_id`, waiting for its turn among the queued runs."""
+        session, tenant = _current_tenant.get()
+        waiter = _Waiter(actor_id, asyncio.get_running_loop().create_future(), _current_budget.get())
+        self._queues.setdefault(session, OrderedDict()).setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.granted
+        except asyncio.CancelledError:
+            if waiter.granted.done() and not waiter.granted.cancelled():
+                self._release(waiter) # Granted just before the cancellation arrived
+            else:
+                self._discard(session, tenant, waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def _has_room(self, waiter: _Waiter) -> bool:
+        if waiter.budget is not None and not waiter.budget.has_room():
+            return False
+        limit = self.actor_limit(waiter.actor_id)
+        return limit is None or self.running.get(waiter.actor_id, 0) < limit
+
+    def _dispatch(self):
+        while self.controller.has_room():
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.controller.acquire()  # The controller only grows its limit while it is in use
+            self.running[waiter.actor_id] = self.running.get(waiter.actor_id, 0) + 1
+            if waiter.budget is not None:
+                waiter.budget.running += 1
+            waiter.granted.set_result(None)
+
+    def _next_waiter(self) -> _Waiter | None:
+        """Takes the first runnable waiter in round-robin order, skipping actors and budgets at their cap."""
+        for session, tenants in self._queues.items():
+            for tenant, queue in tenants.items():
+                waiter = next((w for w in queue if self._has_room(w)), None)
+                if waiter is None:
+                    continue
+                queue.remove(waiter)
+                # Served tenants and sessions go to the back of their rotation
+                if queue:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                if tenants:
+                    self._queues.move_to_end(session)
+                else:
+                    del self._queues[session]
+                return waiter
+        return None
+
+    def _discard(self, session: str, tenant: str, waiter: _Waiter):
+        tenants = self._queues.get(session)
+        queue = tenants.get(tenant) if tenants is not None else None
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del tenants[tenant]
+        if not tenants:
+            del self._queues[session]
+
+    def _release(self, waiter: _Waiter):
+        self.controller.release()
+        self.running[waiter.actor_id] -= 1
+        if waiter.budget is not None:
+            waiter.budget.running -= 1
+        self._dispatch()
+
+
+def current_tenant() -> tuple[str, str]:
+    """Returns the (session, tenant) runs submitted from here are queued under."""
+    return _current_tenant.get()
+
+
+@contextlib.contextmanager
+def run_tenant(session: str, tenant: str = DEFAULT_TENANT):
+    """Queues the actor runs submitted inside the block (on this thread) under `session` / `tenant`."""
+    token = _current_tenant.set((session, tenant))
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def _set_current_tenant(session_tenant: tuple[str, str]):
+    # For tasks on the engine loop, which do not inherit the submitting thread's context
+    _current_tenant.set(session_tenant)
+
+
+def current_budget() -> RunBudget | None:
+    """Returns the run budget runs submitted from here count against, if any."""
+    return _current_budget.get()
+
+
+@contextlib.contextmanager
+def run_budget(limit: int | None):
+    """
+    Caps the actor runs in flight for everything submitted inside the block (on this thread, and
+    on threads started with a copy of its context) at `limit`. None leaves the runs uncapped.
+    The global and per-actor caps still apply; other sessions are not affected.
+    """
+    if limit is None:
+        yield None
+        return
+    budget = RunBudget(max(1, int(limit)))
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def _set_current_budget(budget: RunBudget | None):
+    # See _set_current_tenant
+    _current_budget.set(budget)
@@ -0,0 +1,206 @@
+import json
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .flatten import child_table
+from .ingest import concat_frames
+from .timestamps import parse_timestamps
+
+# --- Canonical Schema ---
+# Every actor returns its own item shape, so the raw frames are wide, object-dtype and named
+# differently per platform ('tweet_text' vs 'post_text', 'id' vs 'comment_id', ...). The
+# frames returned by PlatformScraper.scrape are mapped onto one fixed set of columns instead,
+# with compact dtypes: categorical platform/handle, Arrow-backed strings, UTC timestamps and
+# nullable int64 counts. Each platform describes where its actors keep every canonical column
+# with a SchemaMapper. List fields of posts (media, mentions, hashtags) are returned as child
+# tables, one row per element, keyed by post_id. Files on disk keep the actors' own columns.
+
+CATEGORY = "category"
+STRING = "string[pyarrow]"
+TIMESTAMP = "datetime64[ns, UTC]"
+COUNT = "Int64"  # int64 with missing values: a count the actor did not report is not a zero
+
+POST_SCHEMA: dict[str, str] = {
+    "platform": CATEGORY,
+    "handle": CATEGORY,
+    "post_id": STRING,
+    "post_url": STRING,
+    "text": STRING,
+    "created_at": TIMESTAMP,
+    "author": STRING,
+    "likes": COUNT,
+    "comments": COUNT,
+    "shares": COUNT,
+    "views": COUNT,
+}
+COMMENT_SCHEMA: dict[str, str] = {
+    "platform": CATEGORY,
+    "handle": CATEGORY,
+    "comment_id": STRING,
+    "post_url": STRING,
+    "text": STRING,
+    "created_at": TIMESTAMP,
+    "author": STRING,
+    "likes": COUNT,
+    "replies": COUNT,
+    # Attributes of the post the comment belongs to, see enrichment.py
+    "post_text": STRING,
+    "post_date": TIMESTAMP,
+    "post_likes": COUNT,
+    "post_comments": COUNT,
+    "post_shares": COUNT,
+}
+SCHEMAS = {"posts": POST_SCHEMA, "comments": COMMENT_SCHEMA}
+ID_COLUMNS = {"posts": "post_id", "comments": "comment_id"}
+# Leading columns of every child table, followed by the element's own columns
+CHILD_KEY_SCHEMA: dict[str, str] = {"platform": CATEGORY, "handle": CATEGORY, "post_id": STRING, "position": "int64"}
+
+
+@dataclass(frozen=True)
+class SchemaMapper:
+    """
+    Where one platform's actors keep each canonical column. Every column lists candidate
+    source columns, the first one present in a frame wins; "a.b" reads key "b" of the
+    dicts in column "a" (or of the JSON objects, as stored files keep nested values).
+    Columns without a source are left empty. `children` names the list columns of posts
+    that become child tables.
+    """
+
+    posts: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    comments: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    children: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+
+def _loads(value):
+    if isinstance(value, str) and value.startswith("{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _source(df: pd.DataFrame, candidates: tuple[str, ...]) -> pd.Series | None:
+    for source in candidates:
+        if source in df.columns:
+            return df[source]
+        column, _, key = source.partition(".")
+        if key and column in df.columns and df[column].dtype == object:
+            return df[column].map(_loads).str.get(key)
+    return None
+
+
+def _as_timestamps(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert("UTC").astype(TIMESTAMP)
+    if pd.api.types.is_datetime64_dtype(values.dtype):
+        return values.dt.tz_localize("UTC").astype(TIMESTAMP)
+    parsed, _ = parse_timestamps(values) # Strings and epoch seconds / milliseconds
+    if values.dtype != object:
+        return parsed
+    # Values that were already parsed (e.g. Timestamps in an object column) are not strings
+    rest = parsed.isna().to_numpy() & values.notna().to_numpy()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest], utc=True, errors="coerce")
+    return parsed
+
+
+def _as_counts(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values, errors="coerce").round().astype(COUNT)
+
+
+CONVERTERS = {
+    STRING: lambda values: values.astype(STRING),
+    TIMESTAMP: _as_timestamps,
+    COUNT: _as_counts,
+    CATEGORY: lambda values: values.astype(CATEGORY),
+}
+
+
+def empty_frame(kind: str) -> pd.DataFrame:
+    """An empty 'posts' or 'comments' frame with the canonical columns and dtypes."""
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in SCHEMAS[kind].items()})
+
+
+def to_canonical(df: pd.DataFrame, mapper: SchemaMapper, kind: str, platform: str, handle: str) -> pd.DataFrame:
+    """
+    Maps the raw posts or comments of one handle onto the canonical schema.
+
+    Args:
+        df: The frame as returned by the platform's scraper.
+        mapper: The platform's SchemaMapper.
+        kind: "posts" or "comments".
+        platform: Stored in the 'platform' column.
+        handle: Stored in the 'handle' column.
+
+    Returns:
+        A frame with exactly the columns of POST_SCHEMA / COMMENT_SCHEMA, in that order.
+    """
+    if df.empty:
+        return empty_frame(kind)
+
+    sources = getattr(mapper, kind)
+    columns = {}
+    for column, dtype in SCHEMAS[kind].items():
+        if column == "platform":
+            values = pd.Series(platform, index=df.index)
+        elif column == "handle":
+            values = pd.Series(handle, index=df.index)
+        else:
+            values = _source(df, sources.get(column, ()))
+            if values is None:
+                columns[column] = pd.Series(pd.NA if dtype != TIMESTAMP else pd.NaT, index=df.index, dtype=dtype)
+                continue
+        columns[column] = CONVERTERS[dtype](values)
+    return pd.DataFrame(columns).reset_index(drop=True)
+
+
+def concat_canonical(frames: list[pd.DataFrame], kind: str) -> pd.DataFrame:
+    """Concatenates canonical frames, keeping the categorical columns categorical."""
+    df = concat_frames(frames)
+    if df.empty:
+        return empty_frame(kind)
+    for column, dtype in SCHEMAS[kind].items():
+        if dtype == CATEGORY and df[column].dtype != CATEGORY:
+            df[column] = df[column].astype(CATEGORY) # Frames with different categories concatenate to object
+    return df
+
+
+def _empty_child_table() -> pd.DataFrame:
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in CHILD_KEY_SCHEMA.items()})
+
+
+def to_child_tables(df: pd.DataFrame, mapper: SchemaMapper, platform: str, handle: str) -> dict[str, pd.DataFrame]:
+    """
+    Splits the list columns named in `mapper.children` out of the raw posts of one handle.
+    Returns {child name: table}; posts without the list contribute no rows.
+    """
+    tables = {}
+    post_ids = _source(df, mapper.posts.get("post_id", ())) if not df.empty else None
+    for name, candidates in mapper.children.items():
+        source = next((c for c in candidates if c in df.columns), None)
+        if source is None or post_ids is None:
+            tables[name] = _empty_child_table()
+            continue
+        parents = pd.DataFrame({"post_id": post_ids.astype(STRING).to_numpy(), source: df[source].to_numpy()})
+        table = child_table(parents, source, key="post_id")
+        if table.empty:
+            tables[name] = _empty_child_table()
+            continue
+        table.insert(0, "handle", pd.Series(handle, index=table.index, dtype=CATEGORY))
+        table.insert(0, "platform", pd.Series(platform, index=table.index, dtype=CATEGORY))
+        tables[name] = table.astype({"post_id": STRING})
+    return tables
+
+
+def concat_child_tables(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates the child tables of several handles; elements of a post seen twice are kept once."""
+    df = concat_frames(frames)
+    if df.empty:
+        return _empty_child_table()
+    for column, dtype in CHILD_KEY_SCHEMA.items():
+        if dtype == CATEGORY and df[column].dtype != CATEGORY:
+            df[column] = df[column].astype(CATEGORY)
+    duplicated = df.duplicated(subset=["post_id", "position"]) & df["post_id"].notna()
+    return df[~duplicated.to_numpy()].reset_index(drop=True) if duplicated.any() else df
@@ -0,0 +1,182 @@
+import io
+import json
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .flatten import _list_dtype, nested_to_text
+from .postprocess import offload
+
+# --- Storage Backends ---
+# Scrapers hand a DataFrame and a path *stem* (no suffix) to a backend, the backend
+# picks the suffix and the on-disk format. Parquet is the default, Excel is kept for
+# exports and for reading files written by older versions of the scrapers.
+# Large frames are serialized in the post-processing pool (see postprocess.py).
+
+DEFAULT_STORAGE_FORMAT = "parquet"
+
+
+def _is_nested(value) -> bool:
+    return isinstance(value, (dict, list, tuple))
+
+
+def _prepare_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """Makes object columns Arrow-friendly: nested values become JSON strings, mixed scalars become str."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        series = df[col]
+        if series.map(_is_nested).any():
+            series = series.map(lambda v: json.dumps(v, default=str) if _is_nested(v) else v)
+        try:
+            pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            series = series.map(lambda v: v if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+        df[col] = series
+    return df
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Converts a DataFrame to an Arrow table the way the Parquet backend stores it."""
+    return pa.Table.from_pandas(_prepare_for_parquet(df), preserve_index=False)
+
+
+def _write_parquet(df: pd.DataFrame, path: Path, compression: str) -> Path:
+    pq.write_table(to_arrow(df), path, compression=compression)
+    return path
+
+
+def _for_excel(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Excel has no time zones or lists: tz-aware columns (parsed dates are UTC) are written as
+    naive UTC, typed list columns (see flatten.py) as text.
+    """
+    tz_columns = [col for col in df.columns if isinstance(df[col].dtype, pd.DatetimeTZDtype)]
+    list_columns = [col for col in df.columns if isinstance(df[col].dtype, pd.ArrowDtype) and pa.types.is_nested(df[col].dtype.pyarrow_dtype)]
+    if not tz_columns and not list_columns:
+        return df
+    df = df.copy(deep=False)
+    for col in tz_columns:
+        df[col] = df[col].dt.tz_convert("UTC").dt.tz_localize(None)
+    for col in list_columns:
+        df[col] = nested_to_text(df[col])
+    return df
+
+
+def _write_excel(df: pd.DataFrame, path: Path) -> Path:
+    _for_excel(df).to_excel(path, index=False)
+    return path
+
+
+def _excel_bytes(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    _for_excel(df).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+class StorageBackend:
+    """Base class for DataFrame storage formats."""
+
+    name = ""
+    suffix = ""
+
+    def path_for(self, stem: Path) -> Path:
+        """Returns the full file path for a stem (handles may contain dots, so no with_suffix)."""
+        return Path(f"{stem}{self.suffix}")
+
+    def write(self, df: pd.DataFrame, stem: Path) -> Path:
+        raise NotImplementedError
+
+    def read(self, path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class ParquetStorage(StorageBackend):
+    """Columnar, compressed storage. Default backend for scraped data."""
+
+    name = "parquet"
+    suffix = ".parquet"
+
+    def __init__(self, compression: str = "zstd"):
+        self.compression = compression
+
+    def write(self, df: pd.DataFrame, stem: Path) -> Path:
+        path = self.path_for(stem)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return offload(_write_parquet, df, path, self.compression)
+
+    def read(self, path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+        if columns is not None:
+            # Only project columns the file actually has, older files may lack some
+            available = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in available]
+        # Not hive-partitioned: a comment part under date=YYYY-MM-DD/ must not gain (or clash on) a 'date' column
+        # List columns come back typed, as flatten_items builds them
+        return pq.read_table(path, columns=columns, partitioning=None).to_pandas(types_mapper=_list_dtype)
+
+
+class ExcelStorage(StorageBackend):
+    """Excel storage through openpyxl. Slow for large frames, use for exports."""
+
+    name = "excel"
+    suffix = ".xlsx"
+
+    def write(self, df: pd.DataFrame, stem: Path) -> Path:
+        path = self.path_for(stem)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return offload(_write_excel, df, path)
+
+    def read(self, path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+        df = pd.read_excel(path)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+
+STORAGE_BACKENDS = {
+    ParquetStorage.name: ParquetStorage,
+    ExcelStorage.name: ExcelStorage,
+}
+KNOWN_SUFFIXES = tuple(backend.suffix for backend in STORAGE_BACKENDS.values())
+
+
+def get_storage(storage_format: str = DEFAULT_STORAGE_FORMAT) -> StorageBackend:
+    """Returns a storage backend instance for the given format name ('parquet' or 'excel')."""
+    backend = STORAGE_BACKENDS.get(storage_format.lower())
+    if backend is None:
+        raise ValueError(f"Unknown storage format '{storage_format}'. Expected one of {list(STORAGE_BACKENDS)}.")
+    return backend()
+
+
+def read_frame(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Reads a stored DataFrame, picking the backend from the file suffix."""
+    path = Path(path)
+    for backend in STORAGE_BACKENDS.values():
+        if path.suffix == backend.suffix:
+            return backend().read(path, columns=columns)
+    raise ValueError(f"Unsupported storage file: {path}")
+
+
+def find_files(directory: Path, pattern: str) -> list[Path]:
+    """Globs `pattern` + every known storage suffix in a directory."""
+    files = []
+    for suffix in KNOWN_SUFFIXES:
+        files.extend(directory.glob(f"{pattern}{suffix}"))
+    return files
+
+
+def find_file(stem: Path) -> Path | None:
+    """Returns the first existing file for a stem, preferring the default format."""
+    for suffix in KNOWN_SUFFIXES:
+        candidate = Path(f"{stem}{suffix}")
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def export_excel_bytes(df: pd.DataFrame) -> bytes:
+    """Serializes a DataFrame to an in-memory .xlsx file (for downloads)."""
+    return offload(_excel_bytes, df)
@@ -0,0 +1,121 @@
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# --- Vectorized Timestamp Parsing ---
+# Actor timestamps are parsed a whole column at a time. Each format is tried with
+# pd.to_datetime(format=...) on the values still unparsed, so the common case is a single
+# vectorized pass and the fallbacks only ever see the residue. Numbers are epoch seconds or
+# milliseconds (e.g. LinkedIn's posted_at.timestamp). Results are tz-aware UTC; values
+# without an offset are taken to be UTC. Failures are counted in a report instead of being
+# printed row by row.
+
+TWITTER_DATE_FORMAT = "%a %b %d %H:%M:%S %z %Y"  # e.g. "Wed Jan 03 10:00:00 +0000 2024"
+ISO_FORMAT = "ISO8601"
+DEFAULT_FORMATS = (TWITTER_DATE_FORMAT, ISO_FORMAT)
+
+# Twitter-style dates with a malformed or missing offset: the offset is dropped, the rest parsed as UTC
+_LOOSE_TWITTER_PATTERN = r"^\w{3} (?P<month>\w{3}) (?P<day>\d{1,2}) (?P<time>\d{2}:\d{2}:\d{2}) \+?\d{4} (?P<year>\d{4})"
+_LOOSE_TWITTER_FORMAT = "%Y %b %d %H:%M:%S"
+
+EPOCH_MS_THRESHOLD = 10 ** 11  # Epoch numbers above this are milliseconds (10**11 seconds is the year 5138)
+_NUMBER_TYPES = [int, float, np.int64, np.int32, np.float64, np.float32]
+
+MAX_FAILED_EXAMPLES = 3
+
+
+@dataclass
+class TimestampParseReport:
+    """How a column of timestamps was parsed."""
+
+    total: int = 0
+    parsed: int = 0
+    missing: int = 0  # Nulls and values that are neither strings nor numbers
+    by_format: dict[str, int] = field(default_factory=dict)  # Format -> values it parsed
+    failed_examples: list[str] = field(default_factory=list)
+
+    @property
+    def failed(self) -> int:
+        """Strings that matched no format and numbers out of range."""
+        return self.total - self.parsed - self.missing
+
+    def describe(self, column: str) -> str:
+        """One-line summary for logs."""
+        message = f"Parsed {self.parsed} of {self.total} '{column}' values"
+        if self.missing:
+            message += f", {self.missing} missing"
+        if self.failed:
+            message += f", {self.failed} unparseable (e.g. {', '.join(repr(v) for v in self.failed_examples)})"
+        return message
+
+
+def _parse_loose_twitter(values: pd.Series) -> pd.Series:
+    parts = values.str.extract(_LOOSE_TWITTER_PATTERN)
+    joined = parts["year"] + " " + parts["month"] + " " + parts["day"] + " " + parts["time"]
+    return pd.to_datetime(joined, format=_LOOSE_TWITTER_FORMAT, errors="coerce", utc=True)
+
+
+def _parse_epoch(values: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(values, errors="coerce")
+    millis = numbers.where(numbers.abs() > EPOCH_MS_THRESHOLD, numbers * 1000)
+    return pd.to_datetime(millis, unit="ms", errors="coerce", utc=True)
+
+
+def parse_timestamps(values: pd.Series, formats: Sequence[str] = DEFAULT_FORMATS, loose_twitter: bool = True) -> tuple[pd.Series, TimestampParseReport]:
+    """
+    Parses a column of timestamp strings and epoch numbers.
+
+    Args:
+        values: The raw column.
+        formats: strptime formats (or "ISO8601") tried in order, each on the values the
+                 previous ones could not parse.
+        loose_twitter: Finally try Twitter-style dates with a malformed offset.
+
+    Returns:
+        (parsed, report): `parsed` is datetime64[ns, UTC] with the index of `values`,
+        NaT where nothing matched.
+    """
+    raw = values.to_numpy(dtype=object)
+    no_values = np.zeros(len(values), dtype=bool)
+    if pd.api.types.is_bool_dtype(values.dtype):
+        pending, numbers = no_values, no_values.copy()
+    elif pd.api.types.is_numeric_dtype(values.dtype):
+        pending, numbers = no_values, values.notna().to_numpy()
+    elif values.dtype != object and pd.api.types.is_string_dtype(values.dtype):
+        pending, numbers = values.notna().to_numpy(), no_values
+    else:
+        kinds = values.map(type)
+        pending = kinds.eq(str).to_numpy()
+        numbers = (kinds.isin(_NUMBER_TYPES) & values.notna()).to_numpy()
+    report = TimestampParseReport(total=len(values), missing=int(len(values) - pending.sum() - numbers.sum()))
+
+    # Worked on positionally, so a duplicated index (e.g. concatenated chunks) cannot misalign results
+    parsed = np.full(len(values), np.datetime64("NaT", "ns"))
+    attempts = [("epoch", _parse_epoch, numbers)]
+    attempts += [(fmt, lambda v, fmt=fmt: pd.to_datetime(v, format=fmt, errors="coerce", utc=True), pending) for fmt in formats]
+    if loose_twitter:
+        attempts.append(("loose twitter", _parse_loose_twitter, pending))
+    for name, parse, todo in attempts:
+        positions = np.flatnonzero(todo)
+        if not len(positions):
+            continue
+        result = parse(pd.Series(raw[positions], dtype=object))
+        hit = result.notna().to_numpy()
+        if hit.any():
+            parsed[positions[hit]] = result.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")[hit]
+            todo[positions[hit]] = False
+            report.by_format[name] = int(hit.sum())
+
+    report.parsed = int(sum(report.by_format.values()))
+    report.failed_examples = [str(v) for v in raw[pending | numbers][:MAX_FAILED_EXAMPLES]]
+    return pd.Series(parsed, index=values.index).dt.tz_localize("UTC"), report
+
+
+def parse_timestamp(value, formats: Sequence[str] = DEFAULT_FORMATS) -> pd.Timestamp | None:
+    """Parses one timestamp string or epoch number the same way as parse_timestamps. Returns None if it cannot be parsed."""
+    if not isinstance(value, str) and type(value) not in _NUMBER_TYPES:
+        return None
+    parsed, _ = parse_timestamps(pd.Series([value], dtype=object), formats)
+    return None if pd.isna(parsed.iat[0]) else parsed.iat[0]
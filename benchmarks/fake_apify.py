@@ -0,0 +1,461 @@
+import datetime
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from apify_actors import facebook_scraper, instagram_scraper, linkedin_scraper, twitter_scraper
+
+# --- Offline Apify Stand-in ---
+# A local HTTP server answering the part of the Apify API that `apify_client` uses here:
+#   POST /v2/acts/{actorId}/runs          start a run (the JSON body is the run input)
+#   GET  /v2/actor-runs/{runId}           run status (honours ?waitForFinish=)
+#   POST /v2/actor-runs/{runId}/abort
+#   GET  /v2/datasets/{datasetId}         dataset info
+#   GET  /v2/datasets/{datasetId}/items   dataset items (offset/limit/fields/omit, pagination headers)
+# Each known actor has a generator producing items shaped like the real actor's output for the
+# run input, so the scrapers run end to end. Run duration, request latency, item counts, page
+# size and injected failures are set through FakeApifyConfig. Nothing leaves the machine.
+
+DEFAULT_HOST = "127.0.0.1"
+MAX_WAIT_FOR_FINISH = 60.0  # Seconds, like the real API
+_BASE_DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@dataclass
+class FakeApifyConfig:
+    """How the fake API behaves."""
+
+    queue_latency: float = 0.0  # Seconds a run stays READY
+    run_latency: float = 0.5  # Seconds a run stays RUNNING
+    request_latency: float = 0.0  # Seconds added to every HTTP response
+    posts_per_handle: int = 50  # Capped by the run input's own limits
+    comments_per_post: int = 20  # Capped by the run input's own limits
+    max_page_size: int = 1000  # Largest `limit` a dataset items request is served
+    error_rate: float = 0.0  # Fraction of requests answered with HTTP 500
+    throttle_rate: float = 0.0  # Fraction of requests answered with HTTP 429
+    failed_run_rate: float = 0.0  # Fraction of runs that end FAILED instead of SUCCEEDED
+    payload_bytes: int = 512  # Size of the heavy nested field each item carries (media, raw HTML, ...)
+    seed: int = 0
+
+
+@dataclass
+class FakeRun:
+    id: str
+    actor_id: str
+    dataset_id: str
+    created: float  # time.monotonic()
+    fails: bool
+    aborted: bool = False
+    read_at: float | None = None  # When the last page of its dataset was served
+
+    def status(self, config: FakeApifyConfig) -> str:
+        if self.aborted:
+            return "ABORTED"
+        elapsed = time.monotonic() - self.created
+        if elapsed < config.queue_latency:
+            return "READY"
+        if elapsed < config.queue_latency + config.run_latency:
+            return "RUNNING"
+        return "FAILED" if self.fails else "SUCCEEDED"
+
+
+@dataclass
+class FakeApifyStats:
+    """What the server has seen since the last reset()."""
+
+    requests: int = 0
+    runs_started: int = 0
+    items_served: int = 0
+    injected_errors: int = 0
+    injected_throttles: int = 0
+    run_latencies: list[float] = field(default_factory=list)  # Run start to last dataset page served
+
+
+# --- Item generators (run input -> items) ---
+
+def _twitter_date(i: int) -> str:
+    return (_BASE_DATE + datetime.timedelta(hours=i)).strftime("%a %b %d %H:%M:%S %z %Y")
+
+
+def _iso_date(i: int) -> str:
+    return (_BASE_DATE + datetime.timedelta(hours=i)).isoformat().replace("+00:00", "Z")
+
+
+def _payload(config: FakeApifyConfig) -> list[dict]:
+    return [{"type": "photo", "url": "https://example.com/" + "m" * max(0, config.payload_bytes - 40)}]
+
+
+def _source_number(source: str) -> int:
+    """Stable number per handle/profile, so IDs stay unique across runs."""
+    return zlib.crc32(source.encode("utf-8")) % 10 ** 6
+
+
+def _capped(limit, default: int) -> int:
+    """Items per source: the configured count, capped by the run input's limit when it sets one."""
+    return max(0, min(default, int(limit))) if limit else default
+
+
+def _twitter_posts(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    handles = run_input.get("twitterHandles") or []
+    per_handle = _capped((run_input.get("maxItems") or 0) // max(1, len(handles)), config.posts_per_handle) # maxItems covers the whole run
+    items = []
+    for handle in handles:
+        for i in range(per_handle):
+            tweet_id = str(10 ** 17 + _source_number(handle) * 10 ** 5 + i)
+            items.append({
+                "type": "tweet", "id": tweet_id, "tweetId": tweet_id,
+                "url": f"https://x.com/{handle}/status/{tweet_id}", "twitterUrl": f"https://twitter.com/{handle}/status/{tweet_id}",
+                "text": f"Tweet {i} from {handle}", "createdAt": _twitter_date(i), "lang": "en",
+                "retweetCount": i % 7, "replyCount": config.comments_per_post, "likeCount": i * 3, "quoteCount": 0,
+                "viewCount": i * 100, "bookmarkCount": 0, "isReply": False, "isRetweet": False, "isQuote": False,
+                "conversationId": tweet_id, "author": {"userName": handle, "name": handle.title(), "followers": 1000},
+                "extendedEntities": {"media": _payload(config)},
+            })
+    return items
+
+
+def _twitter_replies(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    post_urls = run_input.get("postUrls") or []
+    per_post = _capped((run_input.get("resultsLimit") or 0) // max(1, len(post_urls)), config.comments_per_post) # resultsLimit covers the whole run
+    items = []
+    for post_url in post_urls:
+        status_id = post_url.rstrip("/").rsplit("/", 1)[-1]
+        for i in range(per_post):
+            reply_id = f"{status_id}{i:04d}"
+            items.append({
+                "type": "tweet", "id": reply_id, "tweetId": reply_id, "url": f"https://x.com/replier{i}/status/{reply_id}",
+                "text": f"Reply {i}", "createdAt": _twitter_date(i), "lang": "en", "replyCount": 0, "likeCount": i,
+                "isReply": True, "conversationId": status_id, "inReplyToId": status_id,
+                "author": {"userName": f"replier{i}"}, "extendedEntities": {"media": _payload(config)},
+            })
+    return items
+
+
+def _instagram(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    urls = run_input.get("directUrls") or []
+    items = []
+    if run_input.get("resultsType") == "comments":
+        per_post = _capped(run_input.get("resultsLimit"), config.comments_per_post)
+        for post_url in urls:
+            shortcode = post_url.rstrip("/").rsplit("/", 1)[-1]
+            for i in range(per_post):
+                items.append({
+                    "id": f"{shortcode}_{i}", "postUrl": post_url, "text": f"Comment {i}", "timestamp": _iso_date(i),
+                    "ownerUsername": f"commenter{i}", "likesCount": i, "repliesCount": 0,
+                    "ownerProfilePicUrl": _payload(config)[0]["url"],
+                })
+        return items
+    per_profile = _capped(run_input.get("resultsLimit"), config.posts_per_handle)
+    for profile_url in urls:
+        username = profile_url.rstrip("/").rsplit("/", 1)[-1]
+        for i in range(per_profile):
+            shortcode = f"C{_source_number(username):06d}x{i:05d}"
+            items.append({
+                "inputUrl": profile_url, "id": str(3 * 10 ** 18 + _source_number(username) * 10 ** 5 + i), "type": "Image", "shortCode": shortcode,
+                "url": f"https://www.instagram.com/p/{shortcode}/", "caption": f"Post {i} by {username}",
+                "hashtags": ["tag"], "mentions": [], "commentsCount": config.comments_per_post, "likesCount": i * 5,
+                "timestamp": _iso_date(i), "ownerUsername": username, "ownerFullName": username.title(),
+                "images": [p["url"] for p in _payload(config)], "latestComments": _payload(config),
+            })
+    return items
+
+
+def _facebook_posts(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    start_urls = [u["url"] for u in run_input.get("startUrls") or []]
+    per_page = _capped(run_input.get("resultsLimit"), config.posts_per_handle)
+    items = []
+    for page_url in start_urls:
+        page = page_url.rstrip("/").rsplit("/", 1)[-1]
+        for i in range(per_page):
+            post_id = str(10 ** 15 + _source_number(page) * 10 ** 5 + i)
+            items.append({
+                "facebookUrl": page_url, "pageName": page, "postId": post_id,
+                "url": f"https://www.facebook.com/{page}/posts/{post_id}", "time": _iso_date(i),
+                "timestamp": int((_BASE_DATE + datetime.timedelta(hours=i)).timestamp()), "text": f"Post {i} by {page}",
+                "likes": i * 2, "comments": config.comments_per_post, "shares": i % 3, "isVideo": False,
+                "media": _payload(config), "user": {"id": page, "name": page.title()},
+            })
+    return items
+
+
+def _facebook_comments(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    post_url = run_input.get("post_url") or ""
+    post_id = post_url.rstrip("/").rsplit("/", 1)[-1]
+    count = _capped(run_input.get("count"), config.comments_per_post)
+    return [
+        {
+            "id": f"{post_id}_{i}", "facebookUrl": post_url, "commentUrl": f"{post_url}?comment_id={i}",
+            "text": f"Comment {i}", "date": _iso_date(i), "profileName": f"Commenter {i}", "likesCount": i,
+            "profilePicture": _payload(config)[0]["url"], "feedbackId": "f" * 40,
+        }
+        for i in range(count)
+    ]
+
+
+def _linkedin_posts(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    urls = run_input.get("urls") or []
+    per_profile = _capped(run_input.get("limitPerSource"), config.posts_per_handle)
+    items = []
+    for profile_url in urls:
+        username = profile_url.rstrip("/").rsplit("/", 1)[-1]
+        for i in range(per_profile):
+            activity = str(7 * 10 ** 18 + _source_number(username) * 10 ** 5 + i)
+            items.append({
+                "inputUrl": profile_url, "url": f"https://www.linkedin.com/posts/{username}_activity-{activity}",
+                "text": f"Post {i} by {username}", "timestamp": _twitter_date(i), "numComments": config.comments_per_post,
+                "numLikes": i * 4, "numShares": i % 5, "authorProfileUrl": profile_url, "authorName": username.title(),
+                "images": [p["url"] for p in _payload(config)],
+            })
+    return items
+
+
+def _linkedin_comments(run_input: dict, config: FakeApifyConfig) -> list[dict]:
+    post_urls = run_input.get("postIds") or []
+    per_post = _capped(run_input.get("limit"), config.comments_per_post)
+    items = []
+    for post_url in post_urls:
+        for i in range(per_post):
+            items.append({
+                "comment_id": f"{post_url.rsplit('-', 1)[-1]}_{i}", "post_input": post_url, "text": f"Comment {i}",
+                "posted_at": {"timestamp": int((_BASE_DATE + datetime.timedelta(hours=i)).timestamp() * 1000)},
+                "author": {"name": f"Commenter {i}", "profile_picture": _payload(config)[0]["url"]},
+            })
+    return items
+
+
+ITEM_GENERATORS = {
+    twitter_scraper.POSTS_ACTOR_ID: _twitter_posts,
+    twitter_scraper.COMMENTS_ACTOR_ID: _twitter_replies,
+    instagram_scraper.APIFY_ACTOR_ID: _instagram,
+    facebook_scraper.POSTS_ACTOR_ID: _facebook_posts,
+    facebook_scraper.COMMENTS_ACTOR_ID: _facebook_comments,
+    linkedin_scraper.POSTS_ACTOR_ID: _linkedin_posts,
+    linkedin_scraper.COMMENTS_ACTOR_ID: _linkedin_comments,
+}
+
+
+def _project(item: dict, fields: list[str], omit: list[str]) -> dict:
+    if fields:
+        item = {k: item[k] for k in fields if k in item}
+    if omit:
+        item = {k: v for k, v in item.items() if k not in omit}
+    return item
+
+
+class FakeApifyServer:
+    """
+    The stand-in API, served from a background thread. Point a client at `api_url`:
+    `ApifyClient("any-token", api_url=server.api_url)`.
+    """
+
+    def __init__(self, config: FakeApifyConfig | None = None, host: str = DEFAULT_HOST, port: int = 0):
+        """
+        Args:
+            config: Latencies, item counts and failure rates; defaults to FakeApifyConfig().
+            host: Interface to listen on.
+            port: Port to listen on; 0 picks a free one.
+        """
+        self.config = config or FakeApifyConfig()
+        self.stats = FakeApifyStats()
+        self.runs: dict[str, FakeRun] = {}
+        self.datasets: dict[str, list[dict]] = {}
+        self._dataset_runs: dict[str, FakeRun] = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeApifyServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-apify", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeApifyServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self, config: FakeApifyConfig | None = None):
+        """Clears runs, datasets and stats, optionally switching to a new config."""
+        with self._lock:
+            if config is not None:
+                self.config = config
+                self._random = random.Random(config.seed)
+            self.stats = FakeApifyStats()
+            self.runs.clear()
+            self.datasets.clear()
+            self._dataset_runs.clear()
+
+    # --- API operations (called from the request handler threads) ---
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def start_run(self, actor_id: str, run_input: dict) -> FakeRun:
+        generator = ITEM_GENERATORS.get(actor_id)
+        items = generator(run_input, self.config) if generator is not None else []
+        n = next(self._ids)
+        run = FakeRun(id=f"fakeRun{n:08d}", actor_id=actor_id, dataset_id=f"fakeDataset{n:08d}", created=time.monotonic(), fails=self._roll() < self.config.failed_run_rate)
+        with self._lock:
+            self.runs[run.id] = run
+            self.datasets[run.dataset_id] = items
+            self._dataset_runs[run.dataset_id] = run
+            self.stats.runs_started += 1
+        return run
+
+    def run_object(self, run: FakeRun) -> dict:
+        status = run.status(self.config)
+        started_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=time.monotonic() - run.created)
+        return {
+            "id": run.id,
+            "actId": run.actor_id,
+            "status": status,
+            "startedAt": started_at.isoformat().replace("+00:00", "Z"),
+            "finishedAt": None if status in ("READY", "RUNNING") else datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z"),
+            "defaultDatasetId": run.dataset_id,
+            "stats": {"inputBodyLen": 0},
+        }
+
+    def wait_for_run(self, run: FakeRun, wait_secs: float):
+        deadline = time.monotonic() + min(wait_secs, MAX_WAIT_FOR_FINISH)
+        while run.status(self.config) in ("READY", "RUNNING") and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def read_items(self, dataset_id: str, offset: int, limit: int | None, fields: list[str], omit: list[str]) -> tuple[list[dict], int]:
+        items = self.datasets[dataset_id]
+        limit = self.config.max_page_size if limit is None else min(limit, self.config.max_page_size)
+        page = [_project(item, fields, omit) for item in items[offset:offset + limit]]
+        with self._lock:
+            self.stats.items_served += len(page)
+            if offset + len(page) >= len(items):
+                run = self._dataset_runs[dataset_id]
+                if run.read_at is None:
+                    run.read_at = time.monotonic()
+                    self.stats.run_latencies.append(run.read_at - run.created)
+        return page, len(items)
+
+
+def _make_handler(server: FakeApifyServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so httpx re-uses connections like with the real API
+
+        def log_message(self, format, *args):
+            pass # Far too noisy for benchmarks
+
+        def _send(self, status: int, body, headers: dict | None = None):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, error_type: str, message: str):
+            self._send(status, {"error": {"type": error_type, "message": message}})
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length) if length else b""
+            if self.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            return json.loads(data) if data else {}
+
+        def _injected_failure(self) -> bool:
+            config = server.config
+            with server._lock:
+                server.stats.requests += 1
+            if config.request_latency:
+                time.sleep(config.request_latency)
+            roll = server._roll()
+            if roll < config.throttle_rate:
+                with server._lock:
+                    server.stats.injected_throttles += 1
+                self._error(429, "rate-limit-exceeded", "You have exceeded the rate limit (injected by the fake API).")
+                return True
+            if roll < config.throttle_rate + config.error_rate:
+                with server._lock:
+                    server.stats.injected_errors += 1
+                self._error(500, "internal-server-error", "Internal server error (injected by the fake API).")
+                return True
+            return False
+
+        def _route(self, method: str):
+            url = urlsplit(self.path)
+            parts = [unquote(p) for p in url.path.strip("/").split("/")]
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            body = self._read_body() if method == "POST" else None
+            if self._injected_failure():
+                return
+            if parts[:1] != ["v2"]:
+                return self._error(404, "page-not-found", f"No route for {url.path}")
+            parts = parts[1:]
+
+            if method == "POST" and len(parts) == 3 and parts[0] == "acts" and parts[2] == "runs":
+                run = server.start_run(parts[1].replace("~", "/"), body)
+                if query.get("waitForFinish"):
+                    server.wait_for_run(run, float(query["waitForFinish"]))
+                return self._send(201, {"data": server.run_object(run)})
+
+            if parts[:1] == ["actor-runs"] and len(parts) >= 2:
+                run = server.runs.get(parts[1])
+                if run is None:
+                    return self._error(404, "record-not-found", f"Actor run {parts[1]} was not found")
+                if method == "POST" and parts[2:] == ["abort"]:
+                    run.aborted = True
+                elif method == "GET" and query.get("waitForFinish"):
+                    server.wait_for_run(run, float(query["waitForFinish"]))
+                return self._send(200, {"data": server.run_object(run)})
+
+            if method == "GET" and parts[:1] == ["datasets"] and len(parts) >= 2:
+                if parts[1] not in server.datasets:
+                    return self._error(404, "record-not-found", f"Dataset {parts[1]} was not found")
+                if parts[2:] == []:
+                    count = len(server.datasets[parts[1]])
+                    return self._send(200, {"data": {"id": parts[1], "itemCount": count, "cleanItemCount": count}})
+                if parts[2:] == ["items"]:
+                    offset = int(query.get("offset") or 0)
+                    limit = int(query["limit"]) if query.get("limit") else None
+                    fields = [f for f in (query.get("fields") or "").split(",") if f]
+                    omit = [f for f in (query.get("omit") or "").split(",") if f]
+                    page, total = server.read_items(parts[1], offset, limit, fields, omit)
+                    return self._send(200, page, headers={
+                        "x-apify-pagination-total": total,
+                        "x-apify-pagination-offset": offset,
+                        "x-apify-pagination-count": len(page),
+                        "x-apify-pagination-limit": limit if limit is not None else server.config.max_page_size,
+                        "x-apify-pagination-desc": "false",
+                    })
+
+            return self._error(404, "page-not-found", f"No route for {method} {url.path}")
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+    return Handler
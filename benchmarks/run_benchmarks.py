@@ -0,0 +1,226 @@
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+import numpy as np
+
+from benchmarks.fake_apify import FakeApifyConfig, FakeApifyServer
+
+# --- End-to-End Scrape Benchmarks ---
+# Drives PlatformScraper.scrape / scrape_all against the offline Apify stand-in and reports,
+# per scenario: wall time, throughput (items and actor runs per second), p50/p99 actor run
+# latency (run start until its dataset is fully read) and peak memory.
+# Each scenario runs in a fresh process, in a throwaway working directory, so peak RSS only
+# covers the scraper (not the fake server) and no state (indexes, journals, caches) leaks
+# between scenarios.
+#
+#   python -m benchmarks.run_benchmarks --handles 10 --posts 50 --comments 20
+#   python -m benchmarks.run_benchmarks --json baseline.json
+#   python -m benchmarks.run_benchmarks --compare baseline.json  # exits 1 on a regression
+
+PLATFORMS = ["Facebook", "Instagram", "Twitter", "LinkedIn"]
+BENCH_START = datetime.datetime(2024, 1, 1)  # The fake actors date their items from here
+BENCH_END = datetime.datetime(2025, 1, 1)
+DEFAULT_TOLERANCE = 0.2
+
+# Metric -> True if higher is better; checked by --compare
+COMPARED_METRICS = {
+    "items_per_sec": True,
+    "runs_per_sec": True,
+    "run_p50_s": False,
+    "run_p99_s": False,
+    "peak_rss_mb": False,
+}
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KiB elsewhere
+
+
+def _handles(platform: str, count: int) -> list[str]:
+    return [f"bench_{platform.lower()}_{i}" for i in range(count)]
+
+
+def _run_scenario(api_url: str, platforms: list[str], handle_count: int, scrape_kwargs: dict, verbose: bool) -> dict:
+    """Runs one scrape in this (fresh) process. Returns its client-side metrics."""
+    from apify_actors import PlatformScraper
+
+    workdir = tempfile.mkdtemp(prefix="apify-bench-")
+    os.chdir(workdir) # Scraped files, indexes and journals all go under ./scraped_data
+    try:
+        with open(os.devnull, "w") as devnull:
+            quiet = contextlib.ExitStack()
+            if not verbose:
+                quiet.enter_context(contextlib.redirect_stdout(devnull))
+                quiet.enter_context(contextlib.redirect_stderr(devnull))
+            with quiet:
+                scraper = PlatformScraper("benchmark-token", use_result_cache=False, api_url=api_url)
+                started = time.perf_counter()
+                if len(platforms) == 1:
+                    results = {platforms[0]: scraper.scrape(platforms[0], _handles(platforms[0], handle_count), **scrape_kwargs)}
+                else:
+                    results = scraper.scrape_all({p: _handles(p, handle_count) for p in platforms}, **scrape_kwargs)
+                wall = time.perf_counter() - started
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "wall_s": wall,
+        "posts": sum(len(r["posts"]) for r in results.values()),
+        "comments": sum(len(r["comments"]) for r in results.values()),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_benchmark(server: FakeApifyServer, config: FakeApifyConfig, name: str, platforms: list[str], handle_count: int, scrape_kwargs: dict, verbose: bool = False) -> dict:
+    """Runs one scenario against `server` in a child process and combines client and server metrics."""
+    server.reset(config)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        result = pool.submit(_run_scenario, server.api_url, platforms, handle_count, scrape_kwargs, verbose).result()
+
+    stats = server.stats
+    latencies = np.array(stats.run_latencies) if stats.run_latencies else None
+    wall = result["wall_s"]
+    return {
+        "scenario": name,
+        **result,
+        "items_per_sec": (result["posts"] + result["comments"]) / wall if wall else 0.0,
+        "runs": stats.runs_started,
+        "runs_per_sec": stats.runs_started / wall if wall else 0.0,
+        "run_p50_s": float(np.percentile(latencies, 50)) if latencies is not None else None,
+        "run_p99_s": float(np.percentile(latencies, 99)) if latencies is not None else None,
+        "requests": stats.requests,
+        "items_served": stats.items_served,
+        "injected_failures": stats.injected_errors + stats.injected_throttles,
+    }
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def print_report(rows: list[dict]):
+    columns = ["scenario", "wall_s", "posts", "comments", "items_per_sec", "runs", "runs_per_sec", "run_p50_s", "run_p99_s", "peak_rss_mb", "requests", "injected_failures"]
+    table = [columns] + [[_format(row.get(col)) for col in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for line in table:
+        print("  ".join(cell.rjust(width) if i else cell.ljust(width) for i, (cell, width) in enumerate(zip(line, widths))))
+
+
+def compare(rows: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Returns a message for every metric that got worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for row in rows:
+        base = baseline.get(row["scenario"])
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            now, before = row.get(metric), base.get(metric)
+            if now is None or not before:
+                continue
+            change = (now - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{row['scenario']}: {metric} {_format(before)} -> {_format(now)} ({change:+.0%})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the scrape pipeline against an offline Apify stand-in.")
+    parser.add_argument("--platforms", nargs="+", choices=PLATFORMS, default=PLATFORMS)
+    parser.add_argument("--handles", type=int, default=5, help="Handles per platform")
+    parser.add_argument("--posts", type=int, default=50, help="Posts per handle (max_posts)")
+    parser.add_argument("--comments", type=int, default=20, help="Comments per post (max_comments)")
+    parser.add_argument("--no-comments", action="store_true", help="Scrape posts only")
+    parser.add_argument("--batch-posts", action="store_true", help="Fetch posts for groups of handles per actor run")
+    parser.add_argument("--pipeline", action="store_true", help="Start comment runs while each posts dataset is still being read")
+    parser.add_argument("--scrape-all", action="store_true", help="Also run one scrape_all scenario over every selected platform")
+    parser.add_argument("--queue-latency", type=float, default=0.0, help="Seconds each fake run stays READY")
+    parser.add_argument("--run-latency", type=float, default=0.5, help="Seconds each fake run stays RUNNING")
+    parser.add_argument("--request-latency", type=float, default=0.0, help="Seconds added to every fake API response")
+    parser.add_argument("--page-size", type=int, default=1000, help="Largest dataset page the fake API serves")
+    parser.add_argument("--payload-bytes", type=int, default=512, help="Size of the heavy nested field in each item")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--failed-run-rate", type=float, default=0.0, help="Fraction of runs that end FAILED")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON (usable as a --compare baseline)")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a baseline written with --json")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown before --compare fails")
+    parser.add_argument("--verbose", action="store_true", help="Show the scraper's own output")
+    args = parser.parse_args(argv)
+
+    config = FakeApifyConfig(
+        queue_latency=args.queue_latency,
+        run_latency=args.run_latency,
+        request_latency=args.request_latency,
+        posts_per_handle=args.posts,
+        comments_per_post=args.comments,
+        max_page_size=args.page_size,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        failed_run_rate=args.failed_run_rate,
+        payload_bytes=args.payload_bytes,
+        seed=args.seed,
+    )
+    scrape_kwargs = {
+        "start": BENCH_START,
+        "end": BENCH_END,
+        "max_posts": args.posts,
+        "max_comments": args.comments,
+        "scrape_comments": not args.no_comments,
+        "batch_posts": args.batch_posts,
+        "pipeline": args.pipeline,
+    }
+    scenarios = [(platform, [platform]) for platform in args.platforms]
+    if args.scrape_all:
+        scenarios.append(("scrape_all", list(args.platforms)))
+
+    print(f"Fake API: {asdict(config)}")
+    print(f"{args.handles} handles per platform, scrape_comments={not args.no_comments}, batch_posts={args.batch_posts}, pipeline={args.pipeline}\n")
+    rows = []
+    with FakeApifyServer(config) as server:
+        for name, platforms in scenarios:
+            print(f"Running {name}...", flush=True)
+            rows.append(run_benchmark(server, config, name, platforms, args.handles, scrape_kwargs, args.verbose))
+    print()
+    print_report(rows)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({row["scenario"]: row for row in rows}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(rows, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%} against {args.compare}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@ from io import BytesIO
 from components.auth import get_local_storage
 import time
 from apify_actors import PlatformScraper
+from apify_actors.storage import export_excel_bytes
 
 
 localS = get_local_storage()
@@ -33,10 +34,24 @@ def render_scraper_ui(platform):
 
     st.markdown(f'<h2 class="sub-header">{platform} Data Scraper</h2>', unsafe_allow_html=True)
     is_scrape_user_comments = st.toggle("Scrape Comments", value=True, key=f"scrape_user_comments_{platform}")
+    is_incremental = st.toggle(
+        "Only New Posts",
+        value=False,
+        help="Skip posts already scraped in earlier runs for each username",
+        key=f"incremental_{platform}"
+    )
+    is_full_raw = st.toggle(
+        "Keep All Fields",
+        value=False,
+        help="Download the full actor items (media, nested objects) instead of the columns used for analysis",
+        key=f"full_raw_{platform}"
+    )
 
     # Initialize session state for scraped data if not present
     if "scraped_data" not in st.session_state:
         st.session_state.scraped_data = {}
+    if "scraped_data_kind" not in st.session_state:
+        st.session_state.scraped_data_kind = {} # What scraped_data holds per platform: "posts" or "comments"
     if "scraping" not in st.session_state:
         st.session_state.scraping = False
     if "scraping_platform" not in st.session_state:
@@ -230,6 +245,8 @@ def render_scraper_ui(platform):
                         max_comments=max_comments,
                         handles=user_handles_to_scrape[platform],
                         scrape_comments=is_scrape_user_comments,
+                        incremental=is_incremental,
+                        full_raw=is_full_raw,
                     )
                     
                     if scraped_df_dict is None:
@@ -247,13 +264,22 @@ def render_scraper_ui(platform):
                         
                         
                         scraped_df = scraped_df_dict['posts']
+                        data_kind = "posts"
                         
                         if is_scrape_user_comments:
-                            scraped_df = scraped_df_dict['comments']
+                            # scrape() only returns the comments fetched by this run. Show every comment stored
+                            # for the handles, so posts skipped as already scraped keep their comments.
+                            new_comment_count = len(scraped_df_dict['comments'])
+                            scraped_df = platform_scraper.load_comments(platform, user_handles_to_scrape[platform])
+                            data_kind = "comments"
+                        st.session_state.scraped_data_kind[platform] = data_kind
 
                         if scraped_df is not None and not scraped_df.empty:
                             st.session_state.scraped_data[platform] = scraped_df
-                            st.success(f"Scraped {len(scraped_df)} records for {platform}.")
+                            if is_scrape_user_comments:
+                                st.success(f"Scraped {new_comment_count} new comments for {platform}, showing all {len(scraped_df)} stored comments.")
+                            else:
+                                st.success(f"Scraped {len(scraped_df)} records for {platform}.")
                         elif scraped_df is not None and scraped_df.empty:
                             st.info(f"Scraping finished, but no data matched the criteria for {platform}.")
                             # Store empty df to indicate scraping happened but found nothing
@@ -287,8 +313,10 @@ def render_scraper_ui(platform):
     # Display scraped data if available
     if platform in st.session_state.scraped_data:
         scraped_df = st.session_state.scraped_data[platform]
+        data_kind = st.session_state.scraped_data_kind.get(platform, "data")
         if not scraped_df.empty:
-            with st.expander(f"{platform} Scraped Data ({len(scraped_df)} rows)", expanded=True):
+            data_label = "Stored Comments" if data_kind == "comments" else "Scraped Data"
+            with st.expander(f"{platform} {data_label} ({len(scraped_df)} rows)", expanded=True):
                 st.dataframe(scraped_df)
 
                 # Prepare download
@@ -296,18 +324,18 @@ def render_scraper_ui(platform):
                     if output_format == "CSV":
                         data = scraped_df.to_csv(index=False).encode('utf-8')
                         mime = 'text/csv'
-                        filename = f"{platform}_data_{datetime.now():%Y%m%d_%H%M}.csv"
+                        filename = f"{platform}_{data_kind}_{datetime.now():%Y%m%d_%H%M}.csv"
                     elif output_format == "JSON":
                         data = scraped_df.to_json(orient='records', indent=2).encode('utf-8')
                         mime = 'application/json'
-                        filename = f"{platform}_data_{datetime.now():%Y%m%d_%H%M}.json"
+                        filename = f"{platform}_{data_kind}_{datetime.now():%Y%m%d_%H%M}.json"
                     elif output_format == "Excel":
-                        data = scraped_df.to_excel(index=False).encode('utf-8')
+                        data = export_excel_bytes(scraped_df)
                         mime = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        filename = f"{platform}_data_{datetime.now():%Y%m%d_%H%M}.xlsx"
+                        filename = f"{platform}_{data_kind}_{datetime.now():%Y%m%d_%H%M}.xlsx"
 
                     st.download_button(
-                        label=f"Download {platform} data as {output_format}",
+                        label=f"Download {platform} {data_kind} as {output_format}",
                         data=data,
                         file_name=filename,
                         mime=mime,
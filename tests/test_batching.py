@@ -0,0 +1,46 @@
+import asyncio
+
+import pandas as pd
+
+from apify_actors.batching import drop_unresolved, rerun_per_post, split_by_parent
+
+
+def test_split_by_parent_counts_unattributed_items():
+    df = pd.DataFrame({"postUrl": [
+        "https://www.instagram.com/p/AAA/", "https://www.instagram.com/p/AAA/?x=1", "https://www.instagram.com/p/ZZZ/", None,
+    ]})
+
+    by_post, unattributed_count = split_by_parent(df, ["https://instagram.com/p/AAA", "https://instagram.com/p/BBB"], ["postUrl"])
+
+    assert len(by_post["https://instagram.com/p/AAA"]) == 2
+    assert by_post["https://instagram.com/p/BBB"].empty
+    assert unattributed_count == 2
+
+
+def test_single_post_batch_owns_items_without_parent():
+    df = pd.DataFrame({"postUrl": [None, None], "text": ["a", "b"]})
+
+    by_post, unattributed_count = split_by_parent(df, ["https://x.com/bob/status/1"], ["postUrl"])
+
+    assert len(by_post["https://x.com/bob/status/1"]) == 2
+    assert unattributed_count == 0
+
+
+def test_posts_without_items_are_dropped_only_when_items_went_unattributed():
+    by_post = {"a": pd.DataFrame({"id": [1]}), "b": pd.DataFrame()}
+
+    assert set(drop_unresolved(by_post, 0)) == {"a", "b"}
+    assert set(drop_unresolved(by_post, 1)) == {"a"}
+
+
+def test_dropped_posts_are_rerun_one_per_run():
+    runs = []
+
+    async def run_one(batch):
+        runs.append(batch)
+        return {batch[0]: pd.DataFrame({"id": [7]})}
+
+    by_post = asyncio.run(rerun_per_post({"a": pd.DataFrame({"id": [1]})}, ["a", "b", "c"], run_one))
+
+    assert runs == [["b"], ["c"]]
+    assert set(by_post) == {"a", "b", "c"}
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+from apify_actors.concurrency import AIMDController, is_throttle_error
+
+
+def _saturated(controller: AIMDController):
+    """Takes every slot, so successes count as the limit being used."""
+    while controller.has_room():
+        controller.acquire()
+
+
+def test_limit_grows_by_about_one_per_limit_successes():
+    controller = AIMDController(initial_limit=4, max_limit=10)
+    _saturated(controller)
+
+    for _ in range(3):
+        controller.on_success(latency=0.0)
+    assert controller.limit == 4 # Each success adds 1/limit
+
+    for _ in range(2):
+        controller.on_success(latency=0.0)
+    assert controller.limit == 5
+    assert [change.reason for change in controller.history] == ["start", "increase"]
+
+
+def test_limit_does_not_grow_while_demand_is_below_it():
+    controller = AIMDController(initial_limit=4)
+    controller.acquire()
+
+    for _ in range(20):
+        controller.on_success(latency=0.0)
+
+    assert controller.limit == 4
+
+
+def test_limit_never_grows_above_the_ceiling():
+    controller = AIMDController(initial_limit=3, max_limit=3)
+    _saturated(controller)
+
+    for _ in range(20):
+        controller.on_success(latency=0.0)
+
+    assert controller.limit == 3
+
+
+def test_throttle_halves_the_limit_once_per_cooldown():
+    controller = AIMDController(initial_limit=16, cooldown=60.0)
+
+    controller.on_throttle()
+    controller.on_throttle()
+
+    assert controller.limit == 8
+    assert controller.history[-1].reason == "throttle"
+
+
+def test_limit_never_drops_below_the_floor():
+    controller = AIMDController(initial_limit=3, min_limit=2, cooldown=0.0)
+
+    for _ in range(5):
+        controller.on_throttle()
+
+    assert controller.limit == 2
+
+
+def test_error_rate_above_threshold_decreases_once_the_window_is_full():
+    controller = AIMDController(initial_limit=10, window=4, error_threshold=0.5, cooldown=0.0)
+
+    controller.on_success(latency=0.0)
+    controller.on_error()
+    controller.on_error()
+    assert controller.limit == 10 # Window not full yet
+
+    controller.on_error()
+    assert controller.limit == 5
+    assert controller.history[-1].reason == "errors"
+    assert controller.error_rate() == 0.0 # Outcomes start over after a decrease
+
+
+def test_slow_start_counts_as_overload():
+    controller = AIMDController(initial_limit=10, latency_target=30.0)
+
+    controller.on_success(latency=45.0)
+
+    assert controller.limit == 5
+    assert controller.history[-1].reason == "latency"
+
+
+def test_lowering_the_ceiling_cuts_the_limit():
+    controller = AIMDController(initial_limit=10)
+
+    controller.set_max_limit(4)
+
+    assert controller.limit == 4
+    assert controller.history[-1].reason == "budget"
+
+
+def test_slots_are_counted_against_the_limit():
+    controller = AIMDController(initial_limit=2)
+
+    controller.acquire()
+    controller.acquire()
+    assert not controller.has_room()
+
+    controller.release()
+    assert controller.has_room()
+    assert controller.in_flight == 1
+
+
+def test_throttle_errors_are_recognized():
+    assert is_throttle_error(SimpleNamespace(status_code=429))
+    assert is_throttle_error(SimpleNamespace(type="max-concurrent-actor-runs-exceeded"))
+    assert is_throttle_error(Exception("Too Many Requests"))
+    assert not is_throttle_error(Exception("Actor not found"))
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from apify_actors.engine import AsyncActorEngine, RunManager
+
+
+def test_bounded_coroutines_hold_their_slot_until_they_finish():
+    engine = AsyncActorEngine(async_client=None)
+    running, peak = 0, 0
+
+    async def comment_run():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02) # Stands in for a run executing on Apify
+        running -= 1
+
+    futures = engine.submit_bounded((comment_run() for _ in range(6)), limit=2)
+    for future in futures:
+        future.result(timeout=10)
+
+    assert peak == 2
+
+
+class _FakeRuns:
+    """The run endpoints of ApifyClientAsync, for runs whose status the test moves along."""
+
+    def __init__(self):
+        self.runs = {}
+
+    def run(self, run_id):
+        runs = self.runs
+
+        class _Run:
+            async def get(self):
+                run = runs.get(run_id)
+                return dict(run) if run is not None else None
+
+        return _Run()
+
+
+def _running_run(client: _FakeRuns, run_id: str) -> dict:
+    client.runs[run_id] = {"id": run_id, "defaultDatasetId": f"dataset-{run_id}", "status": "RUNNING"}
+    return client.runs[run_id]
+
+
+def test_every_waiter_of_a_reattached_run_gets_its_result():
+    async def scenario():
+        client = _FakeRuns()
+        _running_run(client, "r1")
+        runs = RunManager(client, min_poll_interval=0.01, max_poll_interval=0.02)
+
+        first = await runs.attach("actor", "r1")
+        second = await runs.attach("actor", "r1") # Already tracked: the same record
+        waits = [asyncio.create_task(runs.wait("r1")) for _ in (first, second)]
+        await asyncio.sleep(0.03)
+        client.runs["r1"]["status"] = "SUCCEEDED"
+        results = await asyncio.wait_for(asyncio.gather(*waits), timeout=5)
+        return first is second, results, runs
+
+    same_record, results, runs = asyncio.run(scenario())
+
+    assert same_record
+    assert [run["status"] for run in results] == ["SUCCEEDED", "SUCCEEDED"]
+    assert runs.table == {} and runs._waiters == {}
+
+
+def test_cancelled_waiter_leaves_the_others_waiting():
+    async def scenario():
+        client = _FakeRuns()
+        _running_run(client, "r1")
+        runs = RunManager(client, min_poll_interval=0.01, max_poll_interval=0.02)
+        await runs.attach("actor", "r1")
+
+        cancelled = asyncio.create_task(runs.wait("r1"))
+        waiting = asyncio.create_task(runs.wait("r1"))
+        await asyncio.sleep(0.03)
+        cancelled.cancel()
+        await asyncio.sleep(0.03)
+        still_tracked = "r1" in runs.table
+        client.runs["r1"]["status"] = "SUCCEEDED"
+        return still_tracked, await asyncio.wait_for(waiting, timeout=5)
+
+    still_tracked, run = asyncio.run(scenario())
+
+    assert still_tracked
+    assert run["status"] == "SUCCEEDED"
+
+
+def test_waiting_on_an_untracked_run_raises_lookup_error():
+    async def scenario():
+        runs = RunManager(_FakeRuns())
+        with pytest.raises(LookupError):
+            await runs.wait("unknown")
+
+    asyncio.run(scenario())
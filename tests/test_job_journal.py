@@ -0,0 +1,93 @@
+import time
+
+import pandas as pd
+
+from apify_actors.catalog import DataCatalog
+from apify_actors.job_journal import JobJournal
+from apify_actors.storage import get_storage
+
+PARAMS = {"platform": "Twitter", "handles": ["bob", "alice"], "max_posts": 10}
+
+
+def _write(catalog: DataCatalog, df: pd.DataFrame, name: str, kind: str):
+    path = get_storage().write(df, catalog.root / "twitter" / kind / name)
+    catalog.register(path, "twitter", "bob", kind, df)
+
+
+def test_identical_unfinished_job_is_resumed(tmp_path):
+    journal = JobJournal(tmp_path / "jobs.sqlite")
+
+    job_id, resumed = journal.start_job(PARAMS)
+    assert not resumed
+    assert journal.start_job(dict(reversed(PARAMS.items()))) == (job_id, True) # Key order does not matter
+    assert journal.start_job({**PARAMS, "max_posts": 20})[0] != job_id
+
+
+def test_finished_job_starts_over(tmp_path):
+    journal = JobJournal(tmp_path / "jobs.sqlite")
+    job_id, _ = journal.start_job(PARAMS)
+    journal.complete_handle(job_id, "bob", pd.DataFrame({"tweetId": ["1"]}), None, "tweetId", "id")
+
+    journal.finish_job(job_id)
+
+    new_job_id, resumed = journal.start_job(PARAMS)
+    assert not resumed and new_job_id != job_id
+    assert journal.completed_handles(job_id) == {}
+
+
+def test_expired_job_is_pruned_instead_of_resumed(tmp_path):
+    job_id, _ = JobJournal(tmp_path / "jobs.sqlite").start_job(PARAMS)
+    time.sleep(0.01)
+
+    journal = JobJournal(tmp_path / "jobs.sqlite", max_resume_age=0)
+    new_job_id, resumed = journal.start_job(PARAMS)
+
+    assert not resumed and new_job_id != job_id
+
+
+def test_completed_handle_is_read_back_from_files_written_during_the_job(tmp_path):
+    catalog = DataCatalog(tmp_path / "catalog.sqlite")
+    journal = JobJournal(tmp_path / "jobs.sqlite")
+    _write(catalog, pd.DataFrame({"tweetId": ["0"], "text": ["older scrape"]}), "before", "posts")
+    time.sleep(0.01)
+
+    job_id, _ = journal.start_job(PARAMS)
+    posts = pd.DataFrame({"tweetId": ["1", "2"], "text": ["a", "b"]})
+    _write(catalog, pd.concat([posts, pd.DataFrame({"tweetId": ["3"], "text": ["other job"]})]), "during", "posts")
+    journal.complete_handle(job_id, "bob", posts, pd.DataFrame(), "tweetId", "id")
+
+    # The scrape is restarted: bob is done and comes back from his files
+    job_id, resumed = journal.start_job(PARAMS)
+    rows = journal.completed_handles(job_id)
+    assert resumed and set(rows) == {"bob"}
+    posts_df, comments_df = journal.load_handle(rows["bob"], catalog, "twitter", "tweetId", "id")
+    assert posts_df["tweetId"].tolist() == ["1", "2"]
+    assert comments_df.empty
+
+
+def test_handle_without_key_column_reads_every_row_written_during_the_job(tmp_path):
+    catalog = DataCatalog(tmp_path / "catalog.sqlite")
+    journal = JobJournal(tmp_path / "jobs.sqlite")
+    job_id, _ = journal.start_job(PARAMS)
+    comments = pd.DataFrame({"text": ["x", "y"]})
+    _write(catalog, comments, "part-00000", "comments")
+
+    journal.complete_handle(job_id, "bob", pd.DataFrame(), comments, "tweetId", "id")
+    posts_df, comments_df = journal.load_handle(journal.completed_handles(job_id)["bob"], catalog, "twitter", "tweetId", "id")
+
+    assert posts_df.empty
+    assert comments_df["text"].tolist() == ["x", "y"]
+
+
+def test_started_and_finished_runs_are_recorded_per_call(tmp_path):
+    journal = JobJournal(tmp_path / "jobs.sqlite")
+    job_id, _ = journal.start_job(PARAMS)
+
+    journal.record_run(job_id, "call-1", "actor", "run-1", "dataset-1", "RUNNING")
+    started = journal.get_run(job_id, "call-1")
+    journal.record_run(job_id, "call-1", "actor", "run-1", "dataset-1", "SUCCEEDED", {"id": "run-1", "status": "SUCCEEDED"})
+    finished = journal.get_run(job_id, "call-1")
+
+    assert (started.run_id, started.status, started.run) == ("run-1", "RUNNING", None) # Re-attached to on resume
+    assert (finished.status, finished.run) == ("SUCCEEDED", {"id": "run-1", "status": "SUCCEEDED"}) # Re-used on resume
+    assert journal.get_run(job_id, "call-2") is None
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from apify_actors.post_index import ScrapedPostIndex, reported_comment_counts
+
+
+def test_posts_with_fetched_comments_are_skipped(tmp_path):
+    index = ScrapedPostIndex(tmp_path / "index.sqlite")
+    index.mark_scraped("twitter", "bob", {"p1": 3})
+
+    assert index.scraped_keys("twitter", "bob", ["p1", "p2"]) == {"p1"}
+    assert index.scraped_keys("twitter", "alice", ["p1"]) == set()
+
+
+def test_post_checked_with_no_comments_is_rechecked_once_it_reports_more(tmp_path):
+    index = ScrapedPostIndex(tmp_path / "index.sqlite")
+    index.mark_scraped("facebook", "bob", {"p1": 0, "p2": 0}, reported_counts={"p1": 0, "p2": 5})
+
+    # p2 reported 5 comments but none came back: skipped while it still reports 5
+    assert index.scraped_keys("facebook", "bob", ["p1", "p2"], {"p1": 0, "p2": 5}) == {"p1", "p2"}
+    assert index.scraped_keys("facebook", "bob", ["p1", "p2"], {"p1": 4, "p2": 5}) == {"p2"}
+
+
+def test_post_checked_with_no_comments_and_no_reported_count_is_rechecked(tmp_path):
+    index = ScrapedPostIndex(tmp_path / "index.sqlite")
+    index.mark_scraped("facebook", "bob", {"p1": 0})
+
+    assert index.scraped_keys("facebook", "bob", ["p1"], {"p1": 0}) == set()
+
+
+def test_reported_comment_counts_follows_the_key_index():
+    df = pd.DataFrame({"url": ["a", None, "c"], "comments": [1, 2, None]})
+
+    assert reported_comment_counts(df["url"].dropna(), df, "comments") == {"a": 1}
+    assert reported_comment_counts(df["url"].dropna(), df, "missing") == {}
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pandas as pd
+
+from apify_actors import postprocess
+
+# --- Post-Processing Pool ---
+# The pool uses "spawn", so every worker imports apify_actors from scratch. These tests run a
+# real worker from a script with a guarded __main__ (as the app and the benchmarks do), in a
+# fresh interpreter with the repository's own `components` package importable, and check
+# that the work ran in the pool rather than falling back inline. Calls that cannot be sent
+# to the pool are checked in-process: they never start a worker.
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+SCRIPT = textwrap.dedent(
+    """
+    import sys
+
+    import pandas as pd
+
+    from apify_actors import postprocess
+    from apify_actors.storage import _write_parquet
+
+
+    def missing_column(df):
+        return df.no_such_column # Raises AttributeError in the worker
+
+
+    def main(path):
+        postprocess.configure_postprocess(1)
+        df = pd.DataFrame({"id": range(10), "text": ["post"] * 10})
+        postprocess.offload(_write_parquet, df, path, "zstd", min_rows=1)
+        try:
+            postprocess.offload(missing_column, df, min_rows=1)
+        except AttributeError as e:
+            print("raised:", type(e).__name__)
+        print("pool alive:", postprocess._pool is not None)
+        postprocess.shutdown_postprocess()
+
+
+    if __name__ == "__main__":
+        main(sys.argv[1])
+    """
+)
+
+
+def test_spawned_worker_imports_apify_actors(tmp_path):
+    script = tmp_path / "run_pool.py"
+    script.write_text(SCRIPT)
+    out_path = tmp_path / "posts.parquet"
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    env.pop("POSTPROCESS_WORKERS", None)
+
+    result = subprocess.run(
+        [sys.executable, str(script), str(out_path)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300,
+    )
+
+    output = result.stdout + result.stderr
+    assert result.returncode == 0, output
+    assert "Warning" not in output, output # A failed pool falls back inline with a warning
+    assert "pool alive: True" in result.stdout, output
+    assert "raised: AttributeError" in result.stdout, output # fn's own errors are not mistaken for pickling errors
+    assert len(pd.read_parquet(out_path)) == 10
+
+
+def test_call_that_cannot_be_pickled_runs_inline(capsys):
+    workers = postprocess._workers
+    postprocess.configure_postprocess(1)
+    try:
+        df = pd.DataFrame({"id": range(10)})
+        assert postprocess.offload(lambda frame: len(frame), df, min_rows=1) == 10
+    finally:
+        postprocess.configure_postprocess(workers)
+
+    assert "Processing inline" in capsys.readouterr().out
@@ -0,0 +1,117 @@
+import asyncio
+
+from apify_actors.concurrency import AIMDController
+from apify_actors.scheduler import RunScheduler, run_budget, run_tenant
+
+
+def _scheduler(limit: int) -> RunScheduler:
+    return RunScheduler(AIMDController(initial_limit=limit, max_limit=limit))
+
+
+async def _grant_order(scheduler: RunScheduler, runs: list[tuple[str, str, str]]) -> list[str]:
+    """Queues (session, tenant, name) runs behind a held slot and returns the order they are granted in."""
+    order = []
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("actor"):
+            await release.wait()
+
+    async def run(name):
+        async with scheduler.slot("actor"):
+            order.append(name)
+
+    tasks = [asyncio.create_task(blocker())]
+    await asyncio.sleep(0)
+    for session, tenant, name in runs:
+        with run_tenant(session, tenant):
+            tasks.append(asyncio.create_task(run(name)))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_waiting_runs_are_granted_round_robin_between_sessions():
+    runs = [("a", "h", f"a{i}") for i in range(1, 5)] + [("b", "h", f"b{i}") for i in range(1, 3)]
+
+    order = asyncio.run(_grant_order(_scheduler(1), runs))
+
+    assert order == ["a1", "b1", "a2", "b2", "a3", "a4"]
+
+
+def test_handles_of_one_session_take_turns():
+    runs = [("s", "big", f"big{i}") for i in range(1, 4)] + [("s", "small", "small1")]
+
+    order = asyncio.run(_grant_order(_scheduler(1), runs))
+
+    assert order == ["big1", "small1", "big2", "big3"]
+
+
+async def _peak_in_flight(scheduler: RunScheduler, groups: dict[str, tuple[str, int, int | None]]) -> dict[str, int]:
+    """Runs `count` runs of `actor_id` per group, inside a run_budget of `budget`, and returns each group's peak."""
+    running = {name: 0 for name in groups}
+    peak = dict(running)
+
+    async def run(name, actor_id):
+        async with scheduler.slot(actor_id):
+            running[name] += 1
+            peak[name] = max(peak[name], running[name])
+            await asyncio.sleep(0.01)
+            running[name] -= 1
+
+    tasks = []
+    for name, (actor_id, count, budget) in groups.items():
+        with run_budget(budget):
+            tasks += [asyncio.create_task(run(name, actor_id)) for _ in range(count)]
+    await asyncio.gather(*tasks)
+    return peak
+
+
+def test_run_budget_caps_only_the_runs_inside_it():
+    scheduler = _scheduler(10)
+
+    peak = asyncio.run(_peak_in_flight(scheduler, {"capped": ("x", 10, 2), "free": ("x", 10, None)}))
+
+    assert peak == {"capped": 2, "free": 8}
+    assert scheduler.controller.in_flight == 0
+
+
+def test_actor_limit_caps_one_actor():
+    scheduler = _scheduler(10)
+    asyncio.run(scheduler.set_actor_limit("slow", 1))
+
+    peak = asyncio.run(_peak_in_flight(scheduler, {"slow": ("slow", 4, None), "fast": ("fast", 4, None)}))
+
+    assert peak == {"slow": 1, "fast": 4}
+    assert scheduler.running == {"slow": 0, "fast": 0}
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = _scheduler(1)
+        release = asyncio.Event()
+
+        async def run():
+            async with scheduler.slot("actor"):
+                await release.wait()
+
+        holder = asyncio.create_task(run())
+        waiting = asyncio.create_task(run())
+        await asyncio.sleep(0)
+        assert scheduler.queued() == {"default": 1}
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        release.set()
+        await holder
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.queued() == {}
+    assert scheduler.controller.in_flight == 0
+
+
+def test_run_budget_without_limit_is_uncapped():
+    with run_budget(None) as budget:
+        assert budget is None
@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+
+from apify_actors import FACEBOOK_SCHEMA, INSTAGRAM_SCHEMA, LINKEDIN_SCHEMA, TWITTER_SCHEMA
+from apify_actors.schema import (
+    COMMENT_SCHEMA, POST_SCHEMA, concat_canonical, empty_frame, to_canonical, to_child_tables,
+)
+
+CREATED = pd.Timestamp("2024-01-03 10:00", tz="UTC")
+
+
+def _wrong_dtypes(df: pd.DataFrame, schema: dict[str, str]) -> dict[str, str]:
+    """Columns whose dtype differs from the schema (categoricals compare without their categories)."""
+    wrong = {}
+    for column, dtype in schema.items():
+        actual = df[column].dtype
+        if dtype == "category":
+            matches = isinstance(actual, pd.CategoricalDtype)
+        else:
+            matches = actual == pd.api.types.pandas_dtype(dtype)
+        if not matches:
+            wrong[column] = str(actual)
+    return wrong
+
+# One raw post per platform, shaped like its actor's (projected) items
+RAW_POSTS = {
+    "facebook": (FACEBOOK_SCHEMA, {
+        "postId": "123", "url": "https://www.facebook.com/page/posts/123", "text": "Hello", "time": "2024-01-03T10:00:00.000Z",
+        "pageName": "Page", "likes": 10, "comments": 2, "shares": 1, "viewsCount": None,
+    }),
+    "instagram": (INSTAGRAM_SCHEMA, {
+        "shortCode": "ABC", "url": "https://www.instagram.com/p/ABC/", "caption": "Hello", "timestamp": "2024-01-03T10:00:00.000Z",
+        "ownerUsername": "bob", "likesCount": 10, "commentsCount": 2, "videoViewCount": 100.0,
+    }),
+    "twitter": (TWITTER_SCHEMA, {
+        "tweetId": "987", "url": "https://x.com/bob/status/987", "text": "Hello", "createdAt": "Wed Jan 03 10:00:00 +0000 2024",
+        "author": {"userName": "bob"}, "likeCount": 10, "replyCount": 2, "retweetCount": 1, "viewCount": 100,
+    }),
+    "linkedin": (LINKEDIN_SCHEMA, {
+        "url": "https://www.linkedin.com/posts/bob_activity-1", "text": "Hello", "timestamp": "Wed Jan 03 10:00:00 +0000 2024",
+        "authorName": "Bob", "numLikes": 10, "numComments": 2, "numShares": 1,
+    }),
+}
+
+
+@pytest.mark.parametrize("platform", sorted(RAW_POSTS))
+def test_posts_map_onto_the_canonical_columns_and_dtypes(platform):
+    mapper, item = RAW_POSTS[platform]
+
+    df = to_canonical(pd.DataFrame([item]), mapper, "posts", platform, "bob")
+
+    assert list(df.columns) == list(POST_SCHEMA)
+    assert _wrong_dtypes(df, POST_SCHEMA) == {}
+    row = df.iloc[0]
+    assert (row["platform"], row["handle"], row["text"]) == (platform, "bob", "Hello")
+    assert row["created_at"] == CREATED
+    assert (row["likes"], row["comments"]) == (10, 2)
+
+
+def test_counts_the_actor_did_not_report_stay_missing():
+    mapper, item = RAW_POSTS["instagram"] # Instagram reports no shares
+
+    row = to_canonical(pd.DataFrame([item]), mapper, "posts", "instagram", "bob").iloc[0]
+
+    assert pd.isna(row["shares"])
+    assert row["views"] == 100
+
+
+def test_linkedin_comment_dates_are_read_from_nested_epoch_milliseconds():
+    epoch_ms = int(CREATED.timestamp() * 1000)
+    raw = pd.DataFrame([
+        {"comment_id": "c1", "post_input": "https://www.linkedin.com/posts/bob_activity-1", "text": "Hi", "posted_at": {"timestamp": epoch_ms}, "author": {"name": "Ann"}},
+        {"comment_id": "c2", "post_input": "https://www.linkedin.com/posts/bob_activity-1", "text": "Yo", "posted_at": f'{{"timestamp": {epoch_ms}}}', "author": None},
+    ])
+
+    df = to_canonical(raw, LINKEDIN_SCHEMA, "comments", "linkedin", "bob")
+
+    assert list(df.columns) == list(COMMENT_SCHEMA)
+    assert _wrong_dtypes(df, COMMENT_SCHEMA) == {}
+    assert df["created_at"].tolist() == [CREATED, CREATED] # Dicts as read, JSON objects as stored
+    assert df["post_url"].tolist() == ["https://www.linkedin.com/posts/bob_activity-1"] * 2
+    assert df["author"].tolist()[0] == "Ann"
+
+
+def test_twitter_replies_stored_before_post_text_use_tweet_text():
+    raw = pd.DataFrame([{"id": "r1", "post_url": "https://x.com/bob/status/987", "text": "Reply", "tweet_text": "Hello"}])
+
+    df = to_canonical(raw, TWITTER_SCHEMA, "comments", "twitter", "bob")
+
+    assert df["post_text"].tolist() == ["Hello"]
+
+
+def test_empty_frames_keep_the_schema():
+    df = to_canonical(pd.DataFrame(), FACEBOOK_SCHEMA, "comments", "facebook", "bob")
+
+    assert df.empty
+    assert _wrong_dtypes(df, COMMENT_SCHEMA) == {}
+    assert _wrong_dtypes(empty_frame("posts"), POST_SCHEMA) == {}
+
+
+def test_frames_of_several_handles_stay_categorical():
+    mapper, item = RAW_POSTS["facebook"]
+    frames = [to_canonical(pd.DataFrame([item]), mapper, "posts", "facebook", handle) for handle in ("a", "b")]
+
+    df = concat_canonical(frames, "posts")
+
+    assert df["handle"].dtype == "category"
+    assert df["handle"].tolist() == ["a", "b"]
+
+
+def test_list_fields_become_child_tables_keyed_by_post_id():
+    raw = pd.DataFrame([
+        {"shortCode": "ABC", "hashtags": ["x", "y"], "mentions": []},
+        {"shortCode": "DEF", "hashtags": None, "mentions": ["bob"]},
+    ])
+
+    tables = to_child_tables(raw, INSTAGRAM_SCHEMA, "instagram", "bob")
+
+    assert set(tables) == {"media", "hashtags", "mentions"}
+    assert tables["media"].empty # Not downloaded without full_raw
+    hashtags = tables["hashtags"]
+    assert list(hashtags.columns[:4]) == ["platform", "handle", "post_id", "position"]
+    assert list(zip(hashtags["post_id"], hashtags["position"])) == [("ABC", 0), ("ABC", 1)]
+    assert tables["mentions"]["post_id"].tolist() == ["DEF"]
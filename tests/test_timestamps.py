@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from apify_actors.timestamps import parse_timestamp, parse_timestamps
+
+UTC = "datetime64[ns, UTC]"
+
+
+def test_twitter_dates_are_parsed_with_their_offset():
+    values = pd.Series(["Wed Jan 03 10:00:00 +0000 2024", "Wed Jan 03 12:00:00 +0200 2024"])
+
+    parsed, report = parse_timestamps(values)
+
+    assert str(parsed.dtype) == UTC
+    assert parsed.tolist() == [pd.Timestamp("2024-01-03 10:00", tz="UTC")] * 2
+    assert report.by_format == {"%a %b %d %H:%M:%S %z %Y": 2}
+
+
+def test_twitter_dates_with_a_malformed_offset_are_parsed_as_utc():
+    parsed, report = parse_timestamps(pd.Series(["Wed Jan 03 10:00:00 0000 2024", "Wed Jan 03 10:00:00 +9999 2024"]))
+
+    assert parsed.tolist() == [pd.Timestamp("2024-01-03 10:00", tz="UTC")] * 2
+    assert report.by_format == {"loose twitter": 2}
+
+
+def test_iso_dates_with_an_offset():
+    parsed, report = parse_timestamps(pd.Series(["2024-01-03T10:00:00.000Z", "2024-01-03T12:00:00+02:00"]))
+
+    assert parsed.tolist() == [pd.Timestamp("2024-01-03 10:00", tz="UTC")] * 2
+    assert report.by_format == {"ISO8601": 2}
+
+
+def test_iso_dates_without_an_offset_are_utc():
+    parsed, _ = parse_timestamps(pd.Series(["2024-01-03 10:00:00", "2024-01-03"]))
+
+    assert parsed.tolist() == [pd.Timestamp("2024-01-03 10:00", tz="UTC"), pd.Timestamp("2024-01-03", tz="UTC")]
+
+
+def test_linkedin_epoch_milliseconds_and_seconds():
+    epoch_ms = 1704276000000 # 2024-01-03 10:00 UTC
+    expected = pd.Timestamp("2024-01-03 10:00", tz="UTC")
+
+    numeric, report = parse_timestamps(pd.Series([epoch_ms, epoch_ms // 1000]))
+    mixed, _ = parse_timestamps(pd.Series([epoch_ms, "2024-01-03T10:00:00Z", None], dtype=object))
+
+    assert numeric.tolist() == [expected, expected]
+    assert report.by_format == {"epoch": 2}
+    assert mixed.iloc[:2].tolist() == [expected, expected]
+    assert pd.isna(mixed.iat[2])
+    assert parse_timestamp(np.int64(epoch_ms)) == expected
+
+
+def test_malformed_and_missing_values_are_reported_not_raised():
+    values = pd.Series(["not a date", None, "2024-13-45", {"nested": 1}, "2024-01-03"], index=[5, 5, 6, 7, 8], dtype=object)
+
+    parsed, report = parse_timestamps(values)
+
+    assert parsed.index.tolist() == [5, 5, 6, 7, 8] # Duplicated index kept and aligned
+    assert parsed.isna().tolist() == [True, True, True, True, False]
+    assert (report.total, report.parsed, report.missing, report.failed) == (5, 1, 2, 2)
+    assert report.failed_examples == ["not a date", "2024-13-45"]
+    assert "2 unparseable" in report.describe("createdAt")
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp(None) is None